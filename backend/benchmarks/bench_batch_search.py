@@ -0,0 +1,81 @@
+"""Throughput of batched BM25 search against one search call per query.
+
+Documents and queries are drawn from a Zipf-like vocabulary, so popular
+terms have long posting lists that a batch walks once instead of once per
+query. Both modes must return hits with the same scores.
+
+Run from the backend directory:
+
+    PYTHONPATH=src python benchmarks/bench_batch_search.py --docs 5000 --queries 2000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from ai_document_assistant.core.search import DocumentSearch
+
+
+def scores(batch):
+    """Rounded hit scores of each query; summation order may differ between modes."""
+    return [[round(hit["score"], 6) for hit in hits] for hits in batch]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--query-words", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [f"term{i}" for i in range(args.vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(args.vocabulary)]
+
+    def text(length: int) -> str:
+        return " ".join(rng.choices(vocabulary, weights, k=length))
+
+    queries = [text(args.query_words) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        search = DocumentSearch(Path(temp_dir))
+        start = time.perf_counter()
+        for i in range(args.docs):
+            search.index_document(
+                f"doc-{i}", text(args.words), {"filename": f"doc-{i}.txt"}
+            )
+        search.ensure_index()
+        print(f"Indexed {args.docs} documents in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        expected = [search.search(query, args.limit) for query in queries]
+        single_qps = len(queries) / (time.perf_counter() - start)
+        print(f"{'one by one':<14} {single_qps:9.1f} QPS")
+
+        for batch_size in args.batch_size:
+            start = time.perf_counter()
+            results = []
+            for offset in range(0, len(queries), batch_size):
+                results.extend(
+                    search.search_many(
+                        queries[offset : offset + batch_size], args.limit
+                    )
+                )
+            qps = len(queries) / (time.perf_counter() - start)
+            assert scores(results) == scores(expected)
+            print(
+                f"{'batch=' + str(batch_size):<14} {qps:9.1f} QPS  "
+                f"({qps / single_qps:.1f}x)"
+            )
+        search.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Throughput of the Chunker against LangChain's RecursiveCharacterTextSplitter.
+
+Three synthetic layouts of the same words are chunked: short paragraphs,
+wrapped lines with no blank lines (typical of PDF text), and one long
+paragraph. The recursive splitter falls back to ever finer separators on
+the last two, which is where it gets slow. Reports MB/s and chunk counts.
+
+Run from the backend directory:
+
+    PYTHONPATH=src python benchmarks/bench_chunking.py --words 200000
+"""
+
+import argparse
+import random
+import textwrap
+import time
+from typing import Callable
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from ai_document_assistant.data_processing.chunking import (
+    Chunker,
+    approximate_token_offsets,
+)
+
+VOCABULARY = (
+    "the pump seal failed after months of use. Replace the bearing! "
+    "Is the shaft aligned? "
+    "valve pressure flow housing coolant impeller inspection schedule"
+).split()
+
+
+def make_layouts(words: int, rng: random.Random) -> dict[str, str]:
+    flat = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    paragraphs, position = [], 0
+    tokens = flat.split(" ")
+    while position < len(tokens):
+        length = rng.randint(20, 150)
+        paragraphs.append(" ".join(tokens[position : position + length]))
+        position += length
+    return {
+        "paragraphs": "\n\n".join(paragraphs),
+        "lines": "\n".join(textwrap.wrap(flat, 80)),
+        "flat": flat,
+    }
+
+
+def measure(split: Callable[[str], list], text: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = split(text)
+        best = min(best, time.perf_counter() - start)
+    return len(text.encode("utf-8")) / 1e6 / best, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    layouts = make_layouts(args.words, random.Random(args.seed))
+    splitters = {
+        "recursive": RecursiveCharacterTextSplitter(
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            length_function=len,
+        ).split_text,
+        "chunker": Chunker(args.chunk_size, args.chunk_overlap).split,
+        "chunker tokens": Chunker(
+            args.chunk_size // 4,
+            args.chunk_overlap // 4,
+            token_offsets=approximate_token_offsets,
+        ).split,
+    }
+    for layout, text in layouts.items():
+        print(f"{layout} ({len(text) / 1e6:.1f} MB)")
+        baseline = None
+        for name, split in splitters.items():
+            throughput, chunks = measure(split, text, args.repeat)
+            baseline = baseline or throughput
+            print(
+                f"  {name:<16} {throughput:8.1f} MB/s  {chunks:6d} chunks  "
+                f"({throughput / baseline:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
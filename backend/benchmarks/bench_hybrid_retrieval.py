@@ -0,0 +1,213 @@
+"""Recall and latency of vector, lexical and hybrid retrieval on a synthetic corpus.
+
+Documents are built from a few topic vocabularies, and each one mentions a
+unique part number. Half the queries ask about a part number, the other
+half reuse words from a sentence of the target document. Embeddings come
+from a local feature-hashing model so the benchmark needs no API key; a
+small ``--dim`` makes it behave more like a dense model on rare tokens.
+
+Run from the backend directory:
+
+    PYTHONPATH=src python benchmarks/bench_hybrid_retrieval.py --docs 500
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+from ai_document_assistant.core.search import DocumentSearch
+from ai_document_assistant.llm.hybrid_retriever import HybridRetriever
+
+TOPICS = {
+    "pumps": "pump impeller seal pressure flow valve bearing housing shaft coolant",
+    "billing": "invoice payment refund credit account balance tax statement due charge",
+    "network": (
+        "router switch packet latency firewall subnet gateway bandwidth port cable"
+    ),
+    "contracts": (
+        "clause party termination liability warranty notice agreement breach term "
+        "renewal"
+    ),
+}
+FILLER = (
+    "the a of to and with for on is are be this that each when after before".split()
+)
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words feature hashing, normalized to unit length."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16)
+            vector[digest % self.dim] += 1.0 if digest & 1 << 64 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def make_corpus(
+    n_docs: int, sentences: int, rng: random.Random
+) -> list[tuple[str, str, str, str]]:
+    """Return (doc_id, text, part number, sample sentence) tuples."""
+    corpus = []
+    topics = list(TOPICS.items())
+    for i in range(n_docs):
+        _, vocabulary = topics[i % len(topics)]
+        words = vocabulary.split()
+        lines = [
+            " ".join(
+                rng.choice(words if rng.random() < 0.6 else FILLER) for _ in range(12)
+            ).capitalize()
+            + "."
+            for _ in range(sentences)
+        ]
+        part = f"PN-{rng.randrange(10000, 99999)}-{i}"
+        lines.insert(
+            rng.randrange(len(lines)), f"Part {part} must be inspected monthly."
+        )
+        corpus.append((f"doc-{i}", " ".join(lines), part, rng.choice(lines)))
+    return corpus
+
+
+def make_queries(
+    corpus, n_queries: int, rng: random.Random
+) -> list[tuple[str, str, str]]:
+    """Return (kind, query, relevant doc_id) tuples."""
+    queries = []
+    for i in range(n_queries):
+        doc_id, _, part, sentence = rng.choice(corpus)
+        if i % 2 == 0:
+            queries.append(("identifier", f"How often is {part} inspected?", doc_id))
+        else:
+            words = sentence.rstrip(".").split()
+            queries.append(
+                ("topical", " ".join(rng.sample(words, min(6, len(words)))), doc_id)
+            )
+    return queries
+
+
+def measure(
+    name: str, retrieve: Callable[[str], list], queries, k: int
+) -> dict[str, float]:
+    latencies = []
+    hits: dict[str, list[bool]] = {"identifier": [], "topical": []}
+    for kind, query, relevant in queries:
+        start = time.perf_counter()
+        documents = retrieve(query)
+        latencies.append(time.perf_counter() - start)
+        hits[kind].append(
+            any(doc.metadata.get("doc_id") == relevant for doc in documents[:k])
+        )
+    latencies.sort()
+    result = {
+        "recall_identifier": statistics.mean(hits["identifier"]),
+        "recall_topical": statistics.mean(hits["topical"]),
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p95_ms": 1000 * latencies[int(len(latencies) * 0.95) - 1],
+    }
+    print(
+        f"{name:<16} recall@{k} identifier={result['recall_identifier']:.3f} "
+        f"topical={result['recall_topical']:.3f}  "
+        f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = make_corpus(args.docs, args.sentences, rng)
+    queries = make_queries(corpus, args.queries, rng)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        search = DocumentSearch(Path(temp_dir) / "search")
+        vector_store = Chroma(
+            collection_name="bench",
+            embedding_function=HashingEmbeddings(args.dim),
+            persist_directory=str(Path(temp_dir) / "chroma"),
+        )
+        start = time.perf_counter()
+        chunks = []
+        for doc_id, text, _, _ in corpus:
+            search.index_document(doc_id, text, {"filename": f"{doc_id}.txt"})
+            chunks.extend(splitter.create_documents([text], [{"doc_id": doc_id}]))
+        vector_store.add_documents(chunks)
+        print(
+            f"Indexed {len(corpus)} documents, {len(chunks)} chunks "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        def hybrid(rerank: bool) -> HybridRetriever:
+            return HybridRetriever(
+                document_search=search,
+                get_vector_store=lambda: vector_store,
+                k=args.k,
+                fetch_k=args.fetch_k,
+                rerank=rerank,
+            )
+
+        fused, reranked = hybrid(False), hybrid(True)
+        loop = asyncio.new_event_loop()
+        measure(
+            "vector",
+            lambda q: vector_store.similarity_search(q, k=args.k),
+            queries,
+            args.k,
+        )
+        measure(
+            "vector (fetch_k)",
+            lambda q: vector_store.similarity_search(q, k=args.fetch_k),
+            queries,
+            args.fetch_k,
+        )
+        measure("lexical", fused.lexical_search, queries, args.k)
+        measure(
+            "hybrid",
+            lambda q: loop.run_until_complete(fused.ainvoke(q)),
+            queries,
+            args.k,
+        )
+        measure(
+            "hybrid+rerank",
+            lambda q: loop.run_until_complete(reranked.ainvoke(q)),
+            queries,
+            args.k,
+        )
+        loop.close()
+        search.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Start-up time of the API: imports, first /health answer and readiness.
+
+Each measurement runs in a fresh interpreter, so nothing is cached in
+sys.modules. The app is started through its lifespan, as uvicorn would,
+in a directory whose search index already holds ``--docs`` documents:
+/health answers while the index loads in the background, and readiness is
+when it reports the index and chat components loaded. Reports the median
+of ``--repeat`` runs.
+
+Run from the backend directory:
+
+    PYTHONPATH=src python benchmarks/bench_startup.py --docs 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from ai_document_assistant.core.search import DocumentSearch
+
+IMPORT_PACKAGE = """
+import time
+start = time.perf_counter()
+import ai_document_assistant
+print(time.perf_counter() - start)
+"""
+
+IMPORT_APP = """
+import time
+start = time.perf_counter()
+import ai_document_assistant.main
+print(time.perf_counter() - start)
+"""
+
+# Timed from interpreter start-up, as the process would be under a supervisor.
+SERVE = """
+import json, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from ai_document_assistant.main import app
+imported = time.perf_counter() - start
+with TestClient(app) as client:
+    client.get("/health")
+    first_health = time.perf_counter() - start
+    while not client.get("/health").json()["ready"]:
+        time.sleep(0.005)
+    ready = time.perf_counter() - start
+print(json.dumps({"import": imported, "first_health": first_health, "ready": ready}))
+"""
+
+WORDS = (
+    "pump seal valve bearing invoice refund router packet clause warranty shaft flow"
+).split()
+
+
+def populate(storage_dir: Path, docs: int, words: int, rng: random.Random):
+    search = DocumentSearch(storage_dir)
+    for i in range(docs):
+        text = " ".join(
+            rng.choice(WORDS) + str(rng.randint(0, 500)) for _ in range(words)
+        )
+        search.index_document(f"doc{i}", text, {"filename": f"doc{i}.txt"})
+    search.close()
+
+
+def run(code: str, cwd: Path) -> str:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(Path("src").resolve())]
+        + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cwd = Path(temp_dir)
+        populate(cwd / "storage", args.docs, args.words, random.Random(args.seed))
+
+        package = [float(run(IMPORT_PACKAGE, cwd)) for _ in range(args.repeat)]
+        app = [float(run(IMPORT_APP, cwd)) for _ in range(args.repeat)]
+        serve = [json.loads(run(SERVE, cwd)) for _ in range(args.repeat)]
+
+    print(f"index of {args.docs} documents, median of {args.repeat} runs")
+    rows = [
+        ("import ai_document_assistant", package),
+        ("import ai_document_assistant.main", app),
+        ("first /health answer", [result["first_health"] for result in serve]),
+        ("ready", [result["ready"] for result in serve]),
+    ]
+    for label, seconds in rows:
+        print(f"  {label:<33} {1000 * statistics.median(seconds):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""VectorStore add and search throughput with a local fake embedder.
+
+VectorStore belongs to the top-level package, which is imported as
+ai_document_assistant just like the backend, so run_suite.py runs this
+script in its own process with that package on the path. It can also be
+run by hand from the backend directory:
+
+    PYTHONPATH=../src python benchmarks/bench_vector_store.py --backend numpy-ivf
+
+One backend is measured per run, through the write-behind buffer and the
+embedding cache:
+
+- add: chunks added in batches of 100 and flushed, embedded on a cold cache
+- re-add: the same chunks added again, so every embedding is a cache hit and
+  every chunk replaces the stored one
+- search: one query at a time, and all queries through similarity_search_many
+
+The metrics are printed as JSON. With ``--trace`` the run is traced and the
+peak traced memory is reported too.
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from corpus import CorpusGenerator
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from ai_document_assistant.core.config import settings
+from ai_document_assistant.data_processing.chunking import Chunker
+from ai_document_assistant.data_processing.vector_backends import NumpyBackend
+from ai_document_assistant.data_processing.vector_store import VectorStore
+
+BACKENDS = ("chroma", "numpy", "numpy-ivf")
+BATCH = 100
+# Well below the default, so the benchmark corpus gets an IVF index
+ANN_MIN_ROWS = 256
+
+Metrics = dict[str, float]
+
+
+def percentiles(samples: list[float]) -> Metrics:
+    """Median and 95th percentile of latencies in seconds, as milliseconds."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return {"p50_ms": 1000 * statistics.median(ordered), "p95_ms": 1000 * p95}
+
+
+def max_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def make_chunks(generator: CorpusGenerator, documents: int, words: int):
+    chunker = Chunker(chunk_size=1000, chunk_overlap=200)
+    return chunker.split_documents(
+        [
+            Document(
+                page_content=generator.text(index, words, markdown=True),
+                metadata={"source": f"doc{index}.md"},
+            )
+            for index in range(documents)
+        ]
+    )
+
+
+def add_all(store: VectorStore, chunks: list[Document], ids: list[str]) -> float:
+    """Add chunks in batches and flush them; returns the elapsed seconds."""
+    start = time.perf_counter()
+    for offset in range(0, len(chunks), BATCH):
+        store.add_documents(
+            chunks[offset : offset + BATCH], ids=ids[offset : offset + BATCH]
+        )
+    store.flush()
+    return time.perf_counter() - start
+
+
+def bench(
+    backend: str,
+    documents: int,
+    words: int,
+    queries: int,
+    dim: int,
+    seed: int,
+) -> Metrics:
+    generator = CorpusGenerator(seed=seed)
+    chunks = make_chunks(generator, documents, words)
+    ids = [f"chunk{i}" for i in range(len(chunks))]
+    query_texts = generator.queries(queries)
+    metrics: Metrics = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        settings.DATA_DIR = Path(temp_dir) / "data"
+        settings.CACHE_DIR = Path(temp_dir) / "cache"
+        if backend == "numpy-ivf":
+            # Index even a small corpus rather than timing exact search twice
+            vector_backend = NumpyBackend(
+                settings.CACHE_DIR / "vectors",
+                ann=True,
+                ann_min_rows=min(ANN_MIN_ROWS, len(chunks)),
+            )
+        else:
+            vector_backend = backend
+        store = VectorStore(
+            embeddings=DeterministicFakeEmbedding(size=dim), backend=vector_backend
+        )
+
+        elapsed = add_all(store, chunks, ids)
+        if isinstance(store.backend, NumpyBackend) and store.backend.ann:
+            start = time.perf_counter()
+            store.backend.wait_for_index()
+            metrics["index_build_s"] = time.perf_counter() - start
+        metrics["add_chunks_per_s"] = len(chunks) / elapsed
+        metrics["readd_chunks_per_s"] = len(chunks) / add_all(store, chunks, ids)
+
+        latencies = []
+        for query in query_texts:
+            start = time.perf_counter()
+            store.similarity_search(query, k=4)
+            latencies.append(time.perf_counter() - start)
+        metrics.update(
+            {f"search_{key}": value for key, value in percentiles(latencies).items()}
+        )
+        metrics["search_qps"] = len(latencies) / sum(latencies)
+
+        # Fresh queries, so the query cache does not answer them
+        batch_queries = [f"{query} batch" for query in query_texts]
+        start = time.perf_counter()
+        for offset in range(0, len(batch_queries), 50):
+            store.similarity_search_many(batch_queries[offset : offset + 50], k=4)
+        metrics["batch_search_qps"] = len(batch_queries) / (time.perf_counter() - start)
+        store.close()
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy")
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--trace", action="store_true", help="report peak traced memory"
+    )
+    args = parser.parse_args()
+
+    if args.trace:
+        tracemalloc.start()
+    metrics = bench(
+        args.backend, args.docs, args.words, args.queries, args.dim, args.seed
+    )
+    if args.trace:
+        metrics["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    metrics["max_rss_mb"] = max_rss_mb()
+    print(json.dumps(metrics))
+
+
+if __name__ == "__main__":
+    main()
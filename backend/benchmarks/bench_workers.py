@@ -0,0 +1,139 @@
+"""Search throughput and memory of several worker processes over one index.
+
+Builds an index of ``--docs`` documents and publishes a snapshot, then
+starts ``--workers`` processes that each run ``--queries`` searches, in two
+modes. In "private" mode each process opens DocumentSearch and builds its
+own postings in memory, as every worker did before snapshots. In
+"snapshot" mode each one maps the published snapshot with SnapshotSearch.
+It reports the aggregate queries per second, and the memory of each worker
+as RSS and as PSS (pages shared between workers count once across them),
+read from /proc on Linux.
+
+Run from the backend directory:
+
+    PYTHONPATH=src python benchmarks/bench_workers.py --docs 5000 --workers 1 2 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from ai_document_assistant.core.search import DocumentSearch, SnapshotSearch
+
+
+def memory_mb() -> dict:
+    """RSS and PSS of this process in MB, where /proc/self/smaps_rollup exists."""
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    fields[name.lower() + "_mb"] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return fields
+
+
+def worker(mode: str, storage_dir: Path, queries, limit: int, start_barrier, results):
+    search = (
+        DocumentSearch(storage_dir)
+        if mode == "private"
+        else SnapshotSearch(storage_dir)
+    )
+    search.search(queries[0], limit)  # load the postings or map the snapshot
+    start_barrier.wait()
+    start = time.perf_counter()
+    for query in queries:
+        search.search(query, limit)
+    elapsed = time.perf_counter() - start
+    results.put({"elapsed": elapsed, **memory_mb()})
+
+
+def run(mode: str, storage_dir: Path, workers: int, queries, limit: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker, args=(mode, storage_dir, queries, limit, barrier, results)
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    reports = [results.get() for _ in processes]
+    wall = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    summary = {"qps": workers * len(queries) / wall}
+    for key in ("rss_mb", "pss_mb"):
+        if all(key in report for report in reports):
+            summary[key] = statistics.mean(report[key] for report in reports)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--query-words", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [f"term{i}" for i in range(args.vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(args.vocabulary)]
+    queries = [
+        " ".join(rng.choices(vocabulary[:5000], k=args.query_words))
+        for _ in range(args.queries)
+    ]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        storage_dir = Path(temp_dir)
+        search = DocumentSearch(storage_dir)
+        for i in range(args.docs):
+            text = " ".join(rng.choices(vocabulary, weights=weights, k=args.words))
+            search.index_document(f"doc{i}", text, {"filename": f"doc{i}.txt"})
+        start = time.perf_counter()
+        search.publish_snapshot()
+        publish_seconds = time.perf_counter() - start
+        snapshot_mb = (
+            sum(p.stat().st_size for p in search.snapshot_dir.glob("*.snap")) / 1e6
+        )
+        search.close()
+
+        print(
+            f"{args.docs} documents; snapshot of {snapshot_mb:.1f} MB "
+            f"published in {publish_seconds:.2f}s"
+        )
+        print(
+            f"{'mode':<10} {'workers':>7} {'queries/s':>10} {'RSS MB':>8} {'PSS MB':>8}"
+        )
+        report = {}
+        for mode in ("private", "snapshot"):
+            for workers in args.workers:
+                summary = run(mode, storage_dir, workers, queries, args.limit)
+                report[f"{mode}.{workers}"] = summary
+                rss = summary.get("rss_mb", float("nan"))
+                pss = summary.get("pss_mb", float("nan"))
+                print(
+                    f"{mode:<10} {workers:>7} {summary['qps']:>10.0f} "
+                    f"{rss:>8.1f} {pss:>8.1f}"
+                )
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
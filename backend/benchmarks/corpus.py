@@ -0,0 +1,129 @@
+"""Deterministic synthetic corpus of text, Markdown, PDF and DOCX documents.
+
+Words are made-up syllable strings drawn with Zipf-like frequencies, so
+the term statistics look like real prose to the BM25 index. The same seed
+and sizes always give the same text; PDF and DOCX files also carry the
+same text, though their container bytes may differ between runs.
+"""
+
+import random
+import textwrap
+from pathlib import Path
+
+from docx import Document as DocxDocument
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+FORMATS = ("txt", "md", "pdf", "docx")
+SYLLABLES = "ka lo mi ne ru sa ti vo pe da gu re fi so na be ko li ta mu".split()
+LINES_PER_PDF_PAGE = 50
+
+
+class CorpusGenerator:
+    """Generates documents made of titled sections of sentences."""
+
+    def __init__(self, seed: int = 0, vocabulary: int = 5000):
+        self.seed = seed
+        rng = random.Random(seed)
+        words = set()
+        while len(words) < vocabulary:
+            words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+        self.words = sorted(words)
+        rng.shuffle(self.words)
+        self.weights = [1 / (rank + 1) for rank in range(len(self.words))]
+
+    def _rng(self, index: int) -> random.Random:
+        # One stream per document, so a document does not depend on its neighbours.
+        return random.Random(f"{self.seed}-{index}")
+
+    def _sentence(self, rng: random.Random) -> str:
+        words = rng.choices(self.words, weights=self.weights, k=rng.randint(6, 24))
+        return " ".join(words).capitalize() + "."
+
+    def sections(self, index: int, words: int) -> list[dict]:
+        """Sections of a document, ``{"heading", "paragraphs"}``, of ``words`` words."""
+        rng = self._rng(index)
+        sections, total = [], 0
+        while total < words:
+            paragraphs = []
+            for _ in range(rng.randint(2, 6)):
+                paragraph = " ".join(
+                    self._sentence(rng) for _ in range(rng.randint(2, 7))
+                )
+                paragraphs.append(paragraph)
+                total += paragraph.count(" ") + 1
+            heading = " ".join(rng.choices(self.words, k=rng.randint(1, 3))).title()
+            sections.append({"heading": heading, "paragraphs": paragraphs})
+        return sections
+
+    def text(self, index: int, words: int, markdown: bool = False) -> str:
+        """A document as plain text, or as Markdown with ``##`` section headings."""
+        blocks = []
+        for section in self.sections(index, words):
+            blocks.append(
+                f"## {section['heading']}" if markdown else section["heading"]
+            )
+            blocks.extend(section["paragraphs"])
+        return "\n\n".join(blocks) + "\n"
+
+    def queries(self, count: int, terms: int = 3) -> list[str]:
+        """Queries of a few words, mixing common and rare terms."""
+        rng = random.Random(f"{self.seed}-queries")
+        return [" ".join(rng.choices(self.words[:2000], k=terms)) for _ in range(count)]
+
+    def write_pdf(self, path: Path, index: int, words: int):
+        lines = textwrap.wrap(self.text(index, words).replace("\n\n", " "), 90)
+        writer = PdfWriter()
+        font = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+        for start in range(0, len(lines), LINES_PER_PDF_PAGE):
+            writer.add_blank_page(width=612, height=792)
+            page = writer.pages[-1]
+            shown = " T* ".join(
+                f"({line}) Tj" for line in lines[start : start + LINES_PER_PDF_PAGE]
+            )
+            stream = DecodedStreamObject()
+            stream.set_data(
+                f"BT /F1 10 Tf 14 TL 40 760 Td {shown} ET".encode("latin-1")
+            )
+            page[NameObject("/Contents")] = writer._add_object(stream)
+            page[NameObject("/Resources")] = DictionaryObject(
+                {
+                    NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+                }
+            )
+        with open(path, "wb") as f:
+            writer.write(f)
+
+    def write_docx(self, path: Path, index: int, words: int):
+        document = DocxDocument()
+        for section in self.sections(index, words):
+            document.add_heading(section["heading"], level=1)
+            for paragraph in section["paragraphs"]:
+                document.add_paragraph(paragraph)
+        document.save(path)
+
+    def write(
+        self, directory: Path, documents: int, words: int, formats=FORMATS
+    ) -> dict[str, list[Path]]:
+        """Write ``documents`` files of about ``words`` words in each format."""
+        directory.mkdir(parents=True, exist_ok=True)
+        paths: dict[str, list[Path]] = {}
+        for fmt in formats:
+            for index in range(documents):
+                path = directory / f"doc{index:05d}.{fmt}"
+                if fmt == "pdf":
+                    self.write_pdf(path, index, words)
+                elif fmt == "docx":
+                    self.write_docx(path, index, words)
+                else:
+                    path.write_text(
+                        self.text(index, words, markdown=fmt == "md"), encoding="utf-8"
+                    )
+                paths.setdefault(fmt, []).append(path)
+        return paths
@@ -0,0 +1,362 @@
+"""Reproducible benchmark suite for ingestion, indexing and retrieval.
+
+Builds a synthetic corpus with corpus.py and measures:
+
+- parse: DocumentProcessor extraction throughput per file format
+- split: chunking throughput of ChatManager.split_segments
+- search: DocumentSearch.index_document and search latency as the corpus
+  grows, and the first search after a restart
+- vector: the top-level package's VectorStore add and search with a local
+  fake embedder, per backend (chroma, numpy exact and numpy IVF), run by
+  bench_vector_store.py in a separate process
+
+Each benchmark runs ``--repeat`` times and keeps the best value of each
+metric. It also reports its peak traced Python memory, measured in a second,
+traced run so that tracing does not slow the timed one, and the process
+RSS high-water mark after it. Results are written as JSON. With
+``--baseline``, every metric is compared to a stored run, and the script
+exits with status 1 when any is worse by more than ``--tolerance``.
+
+Run from the backend directory:
+
+    PYTHONPATH=src python benchmarks/run_suite.py --output results.json
+    PYTHONPATH=src python benchmarks/run_suite.py --baseline results.json
+
+The vector benchmark imports the top-level package from ../src; point
+``--vector-python`` at an interpreter that has its dependencies if they are
+installed apart from the backend's.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+# Nothing here calls OpenAI, but ChatManager refuses to start without a key.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from corpus import FORMATS, CorpusGenerator
+from langchain_community.chat_models.fake import FakeListChatModel
+
+from ai_document_assistant.core.search import DocumentSearch
+from ai_document_assistant.data_processing.document_processor import DocumentProcessor
+from ai_document_assistant.llm.chat_manager import ChatManager
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+# The top-level package, which holds VectorStore
+TOP_LEVEL_SRC = BENCHMARK_DIR.parents[1] / "src"
+
+Metrics = dict[str, float]
+
+
+def percentiles(samples: list[float]) -> Metrics:
+    """Median and 95th percentile of latencies in seconds, as milliseconds."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return {"p50_ms": 1000 * statistics.median(ordered), "p95_ms": 1000 * p95}
+
+
+def max_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def bench_parse(corpus: dict[str, list[Path]]) -> dict[str, Metrics]:
+    processor = DocumentProcessor()
+    results = {}
+    for fmt, paths in corpus.items():
+        size = sum(path.stat().st_size for path in paths)
+        start = time.perf_counter()
+        segments = [processor.extract_segments(path) for path in paths]
+        elapsed = time.perf_counter() - start
+        assert all(segments), f"failed to parse {fmt} files"
+        results[f"parse.{fmt}"] = {
+            "mb_per_s": size / 1e6 / elapsed,
+            "docs_per_s": len(paths) / elapsed,
+        }
+    return results
+
+
+def bench_split(
+    corpus: dict[str, list[Path]], chat_manager: ChatManager
+) -> dict[str, Metrics]:
+    processor = DocumentProcessor()
+    results = {}
+    for fmt, paths in corpus.items():
+        documents = [processor.extract_segments(path) for path in paths]
+        size = sum(len(segment.text) for segments in documents for segment in segments)
+        start = time.perf_counter()
+        chunks = sum(
+            len(chat_manager.split_segments(segments, {})) for segments in documents
+        )
+        elapsed = time.perf_counter() - start
+        results[f"split.{fmt}"] = {
+            "mb_per_s": size / 1e6 / elapsed,
+            "chunks_per_s": chunks / elapsed,
+        }
+    return results
+
+
+def bench_search(
+    generator: CorpusGenerator, sizes: list[int], words: int, queries: int
+) -> dict[str, Metrics]:
+    results = {}
+    query_texts = generator.queries(queries)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        search = DocumentSearch(Path(temp_dir))
+        indexed = 0
+        for size in sizes:
+            latencies = []
+            for index in range(indexed, size):
+                text = generator.text(index, words)
+                start = time.perf_counter()
+                search.index_document(
+                    f"doc{index}", text, {"filename": f"doc{index}.txt"}
+                )
+                latencies.append(time.perf_counter() - start)
+            indexed = size
+            # Reopen the index so the first search loads the postings from disk,
+            # as after a restart.
+            search.close()
+            search = DocumentSearch(Path(temp_dir))
+            start = time.perf_counter()
+            search.search(query_texts[0])
+            cold_start = time.perf_counter() - start
+
+            search_latencies = []
+            for query in query_texts:
+                start = time.perf_counter()
+                search.search(query, limit=5)
+                search_latencies.append(time.perf_counter() - start)
+            metrics = (
+                {f"index_{key}": value for key, value in percentiles(latencies).items()}
+                if latencies
+                else {}
+            )
+            metrics.update(
+                {
+                    f"search_{key}": value
+                    for key, value in percentiles(search_latencies).items()
+                }
+            )
+            metrics["search_qps"] = len(search_latencies) / sum(search_latencies)
+            metrics["cold_search_ms"] = 1000 * cold_start
+            results[f"search.{size}"] = metrics
+        search.close()
+    return results
+
+
+def bench_vector(
+    python: str,
+    backends: list[str],
+    documents: int,
+    words: int,
+    queries: int,
+    dim: int,
+    seed: int,
+    trace: bool,
+) -> dict[str, Metrics]:
+    results = {}
+    env = {**os.environ, "PYTHONPATH": str(TOP_LEVEL_SRC)}
+    for backend in backends:
+        command = [
+            python,
+            str(BENCHMARK_DIR / "bench_vector_store.py"),
+            f"--backend={backend}",
+            f"--docs={documents}",
+            f"--words={words}",
+            f"--queries={queries}",
+            f"--dim={dim}",
+            f"--seed={seed}",
+        ]
+        if trace:
+            command.append("--trace")
+        output = subprocess.run(
+            command, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        results[f"vector.{backend}"] = json.loads(output.splitlines()[-1])
+    return results
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s") or metric.endswith("_qps")
+
+
+def run_benchmark(
+    name: str,
+    benchmark: Callable[[bool], dict[str, Metrics]],
+    repeat: int,
+    trace_memory: bool,
+) -> dict[str, Metrics]:
+    """Run a benchmark ``repeat`` times keeping the best value of each metric.
+
+    The benchmark is called with whether the run is traced. Benchmarks run
+    in another process report their own memory metrics.
+    """
+    print(f"running {name}...", file=sys.stderr)
+    results = benchmark(False)
+    for _ in range(repeat - 1):
+        for key, metrics in benchmark(False).items():
+            for metric, value in metrics.items():
+                best = max if higher_is_better(metric) else min
+                results[key][metric] = best(results[key][metric], value)
+    if trace_memory:
+        tracemalloc.start()
+        traced = benchmark(True)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        for key, metrics in results.items():
+            metrics["peak_traced_mb"] = traced[key].get("peak_traced_mb", peak_mb)
+    for metrics in results.values():
+        metrics.setdefault("max_rss_mb", max_rss_mb())
+    return results
+
+
+def compare(
+    results: dict[str, Metrics], baseline: dict[str, Metrics], tolerance: float
+) -> list[str]:
+    """Describe every metric worse than the baseline by more than ``tolerance``."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(name, {}).get(metric)
+            if not reference or metric == "max_rss_mb":
+                continue
+            change = value / reference - 1
+            worse = -change if higher_is_better(metric) else change
+            marker = "REGRESSION" if worse > tolerance else ""
+            print(
+                f"  {name:<18} {metric:<22} {reference:12.3f} -> {value:12.3f}  "
+                f"{change:+7.1%}  {marker}"
+            )
+            if marker:
+                regressions.append(
+                    f"{name} {metric}: {reference:.3f} -> {value:.3f} ({change:+.1%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--docs", type=int, default=20, help="documents per format for parse and split"
+    )
+    parser.add_argument("--words", type=int, default=2000, help="words per document")
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument(
+        "--search-sizes",
+        default="100,1000,3000",
+        help="corpus sizes for search latency",
+    )
+    parser.add_argument("--search-words", type=int, default=500)
+    parser.add_argument("--vector-docs", type=int, default=50)
+    parser.add_argument(
+        "--vector-backends",
+        default="chroma,numpy,numpy-ivf",
+        help="VectorStore backends to benchmark",
+    )
+    parser.add_argument(
+        "--vector-python",
+        default=sys.executable,
+        help="interpreter with the top-level package's dependencies",
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per benchmark; the best is kept"
+    )
+    parser.add_argument(
+        "--only", default="parse,split,search,vector", help="benchmarks to run"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the traced memory runs"
+    )
+    parser.add_argument("--output", type=Path, help="write results to this JSON file")
+    parser.add_argument(
+        "--baseline", type=Path, help="compare against a stored results file"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed relative slowdown"
+    )
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(seed=args.seed)
+    chat_manager = ChatManager(llm=FakeListChatModel(responses=["ok"]))
+    only = set(args.only.split(","))
+    results: dict[str, Metrics] = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = generator.write(
+            Path(temp_dir), args.docs, args.words, args.formats.split(",")
+        )
+        benchmarks = {
+            "parse": lambda traced: bench_parse(corpus),
+            "split": lambda traced: bench_split(corpus, chat_manager),
+            "search": lambda traced: bench_search(
+                generator,
+                [int(size) for size in args.search_sizes.split(",")],
+                args.search_words,
+                args.queries,
+            ),
+            "vector": lambda traced: bench_vector(
+                args.vector_python,
+                args.vector_backends.split(","),
+                args.vector_docs,
+                args.words,
+                args.queries,
+                args.dim,
+                args.seed,
+                traced,
+            ),
+        }
+        for name, benchmark in benchmarks.items():
+            if name in only:
+                results.update(
+                    run_benchmark(name, benchmark, args.repeat, not args.no_memory)
+                )
+
+    for name, metrics in results.items():
+        print(
+            f"{name:<18} "
+            + "  ".join(f"{key}={value:.3f}" for key, value in metrics.items())
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: str(value) for key, value in vars(args).items()},
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"wrote {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        print(f"compared with {args.baseline} ({baseline['meta']['timestamp']}):")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            tolerance = f"{args.tolerance:.0%}"
+            print(f"{len(regressions)} metrics regressed by more than {tolerance}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
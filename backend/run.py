@@ -1,5 +1,4 @@
 import uvicorn
-from ai_document_assistant.main import app
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -7,4 +6,4 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
-    ) 
\ No newline at end of file
+    )
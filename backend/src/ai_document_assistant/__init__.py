@@ -2,8 +2,35 @@
 
 __version__ = "0.1.0"
 
-from .core.config import settings
-from .data_processing.document_processor import DocumentProcessor
-from .llm.chat_manager import ChatManager
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["settings", "DocumentProcessor", "ChatManager"] 
\ No newline at end of file
+if TYPE_CHECKING:
+    from .core import config as settings
+    from .data_processing.document_processor import DocumentProcessor
+    from .llm.chat_manager import ChatManager
+
+# Exports are imported on first access, so importing the package (or one of
+# its light modules) does not pull in LangChain, Chroma and the OpenAI clients.
+_LAZY_EXPORTS = {
+    "settings": (".core.config", None),
+    "DocumentProcessor": (".data_processing.document_processor", "DocumentProcessor"),
+    "ChatManager": (".llm.chat_manager", "ChatManager"),
+}
+
+__all__ = ["settings", "DocumentProcessor", "ChatManager"]
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_EXPORTS[name]
+    value = importlib.import_module(module_name, __name__)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,5 +1,18 @@
 """Core functionality for the AI Document Assistant."""
 
-from .config import settings
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["settings"] 
\ No newline at end of file
+if TYPE_CHECKING:
+    from . import config as settings
+
+__all__ = ["settings"]
+
+
+def __getattr__(name):
+    # Loading the configuration reads the environment; defer it to first use.
+    if name != "settings":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    settings = importlib.import_module(".config", __name__)
+    globals()["settings"] = settings
+    return settings
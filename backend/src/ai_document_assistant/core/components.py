@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class _Entry:
+    __slots__ = ("factory", "close", "lock", "value", "status", "error")
+
+    def __init__(
+        self, factory: Callable[[], Any], close: Optional[Callable[[Any], None]]
+    ):
+        self.factory = factory
+        self.close = close
+        self.lock = threading.Lock()
+        self.value: Any = None
+        self.status = PENDING
+        self.error: Optional[str] = None
+
+
+class Components:
+    """Named components built once, on first use, from registered factories.
+
+    Factories can import heavy modules and open indexes without slowing
+    down start-up: nothing runs until a component is asked for, either by a
+    request or by ``warm_up`` in the background. Each component has its own
+    lock, so building one does not hold up the others.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, _Entry] = {}
+        self._built: list[str] = []
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        close: Optional[Callable[[Any], None]] = None,
+    ):
+        self._entries[name] = _Entry(factory, close)
+
+    def get(self, name: str) -> Any:
+        """Return a component, building it in this thread if needed."""
+        entry = self._entries[name]
+        if entry.status == READY:
+            return entry.value
+        with entry.lock:
+            if entry.status != READY:
+                entry.status = LOADING
+                try:
+                    entry.value = entry.factory()
+                except Exception as e:
+                    entry.status, entry.error = FAILED, str(e)
+                    raise
+                entry.status, entry.error = READY, None
+                with self._lock:
+                    self._built.append(name)
+        return entry.value
+
+    async def aget(self, name: str) -> Any:
+        """Return a component, building it in a worker thread off the event loop."""
+        entry = self._entries[name]
+        if entry.status == READY:
+            return entry.value
+        return await asyncio.to_thread(self.get, name)
+
+    def is_ready(self, name: str) -> bool:
+        return self._entries[name].status == READY
+
+    async def warm_up(self, names: list[str]):
+        """Build components in order in the background.
+
+        Failures are logged, and the component is built again on its next use.
+        """
+        for name in names:
+            try:
+                await self.aget(name)
+            except Exception as e:
+                logger.error(f"Failed to load {name}: {str(e)}")
+
+    def status(self) -> dict[str, dict[str, Optional[str]]]:
+        return {
+            name: {"status": entry.status, "error": entry.error}
+            for name, entry in self._entries.items()
+        }
+
+    def close(self):
+        """Close built components, most recently built first."""
+        with self._lock:
+            built, self._built = self._built, []
+        for name in reversed(built):
+            entry = self._entries[name]
+            with entry.lock:
+                if entry.close is not None:
+                    try:
+                        entry.close(entry.value)
+                    except Exception as e:
+                        logger.error(f"Error closing {name}: {str(e)}")
+                entry.value, entry.status = None, PENDING
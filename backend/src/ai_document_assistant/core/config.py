@@ -1,5 +1,6 @@
-from pathlib import Path
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,28 +13,83 @@ API_DESCRIPTION = "API for processing and analyzing documents using AI"
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4-turbo-preview")
 
 # File Processing Configuration
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB default
 SUPPORTED_FILE_TYPES = {
     "application/pdf": [".pdf"],
     "application/msword": [".doc"],
-    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": [".docx"],
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": [
+        ".docx"
+    ],
     "text/plain": [".txt"],
     "text/markdown": [".md"],
 }
 
+# Concurrency Configuration
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "32"))
+
+# Chunking Configuration
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "characters").lower()  # "characters" or "tokens"
+# Text held while chunking a document as it is extracted, and chunks embedded
+# per batch during ingestion
+INGEST_WINDOW_CHARS = int(os.getenv("INGEST_WINDOW_CHARS", "65536"))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+
+# Retrieval Configuration
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "10"))
+RETRIEVAL_RERANK = os.getenv("RETRIEVAL_RERANK", "true").lower() == "true"
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "1000"))
+
+# Chat Session Configuration
+SESSION_MAX_IN_MEMORY = int(os.getenv("SESSION_MAX_IN_MEMORY", "1000"))
+SESSION_MEMORY_BYTES = int(os.getenv("SESSION_MEMORY_BYTES", str(64 * 1024 * 1024)))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+SESSION_RETENTION_SECONDS = float(
+    os.getenv("SESSION_RETENTION_SECONDS", str(7 * 24 * 3600))
+)
+
+# Worker Configuration
+# With more than one worker, the worker holding the writer lock ingests documents and
+# publishes search index snapshots that the others map and search.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Seconds between publishes, and between the readers' checks for a newer one
+SEARCH_SNAPSHOT_INTERVAL = float(os.getenv("SEARCH_SNAPSHOT_INTERVAL", "2"))
+SEARCH_SNAPSHOT_POLL = float(os.getenv("SEARCH_SNAPSHOT_POLL", "1"))
+
 # Directory Configuration
 BASE_DIR = Path(__file__).parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
 CACHE_DIR = BASE_DIR / "cache"
 
-# Create necessary directories
-DATA_DIR.mkdir(exist_ok=True)
-CACHE_DIR.mkdir(exist_ok=True)
-(CACHE_DIR / "chroma").mkdir(exist_ok=True)
+# Profiling Configuration
+# Requests slower than this are profiled and dumped to PROFILE_DIR; 0 turns
+# profiling off.
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+# Share of requests sampled
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(CACHE_DIR / "profiles")))
 
 # Logging Configuration
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO") 
\ No newline at end of file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+
+def require_openai_api_key() -> str:
+    """Return the OpenAI API key; checked when a client is built, not at import."""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+    return OPENAI_API_KEY
+
+
+def ensure_directories():
+    """Create the data and cache directories."""
+    DATA_DIR.mkdir(exist_ok=True)
+    CACHE_DIR.mkdir(exist_ok=True)
+    (CACHE_DIR / "chroma").mkdir(exist_ok=True)
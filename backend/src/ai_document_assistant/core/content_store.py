@@ -0,0 +1,81 @@
+import hashlib
+import os
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from .segment_store import _fsync_dir, write_atomic
+
+
+class ContentWriter:
+    """Streams a document body into the store; it replaces the old body on commit."""
+
+    def __init__(self, path: Path, compression_level: int):
+        self.path = path
+        self.length = 0
+        self._tmp_path = path.with_name(path.name + ".tmp")
+        path.parent.mkdir(exist_ok=True)
+        self._file = open(self._tmp_path, "wb")
+        self._compressor = zlib.compressobj(compression_level)
+
+    def write(self, text: str):
+        """Append text to the body, compressing it as it comes."""
+        self._file.write(self._compressor.compress(text.encode("utf-8")))
+        self.length += len(text)
+
+    def commit(self):
+        """Make the body readers see the written text."""
+        self._file.write(self._compressor.flush())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        _fsync_dir(self.path.parent)
+
+    def abort(self):
+        """Drop the written text, leaving any stored body as it was."""
+        if not self._file.closed:
+            self._file.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+
+class ContentStore:
+    """Document bodies on disk, one zlib-compressed blob per doc_id."""
+
+    def __init__(self, directory: Path, compression_level: int = 6):
+        self.directory = directory
+        self.compression_level = compression_level
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, doc_id: str) -> Path:
+        # doc_ids come from clients, so hash them into safe, sharded file names.
+        digest = hashlib.sha1(doc_id.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.z"
+
+    def put(self, doc_id: str, content: str):
+        """Store a document body, replacing any previous version."""
+        path = self._path(doc_id)
+        path.parent.mkdir(exist_ok=True)
+        write_atomic(
+            path, zlib.compress(content.encode("utf-8"), self.compression_level)
+        )
+
+    def writer(self, doc_id: str) -> ContentWriter:
+        """Start streaming a document body, to replace any previous version."""
+        return ContentWriter(self._path(doc_id), self.compression_level)
+
+    def get(self, doc_id: str) -> Optional[str]:
+        """Load and decompress a document body."""
+        path = self._path(doc_id)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        return zlib.decompress(data).decode("utf-8")
+
+    def delete(self, doc_id: str):
+        """Remove a document body if it exists."""
+        self._path(doc_id).unlink(missing_ok=True)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self._path(doc_id).exists()
@@ -0,0 +1,125 @@
+import heapq
+import math
+import re
+from collections import Counter
+from collections.abc import Sequence
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """Postings lists with term frequencies, scored with BM25."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[str, int]] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self.doc_terms: dict[str, tuple[str, ...]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, text: str):
+        """Add a document, replacing any previous version with the same id."""
+        self.add_terms(doc_id, Counter(tokenize(text)))
+
+    def add_terms(self, doc_id: str, term_counts: dict[str, int]):
+        """Add a document from precomputed term frequencies."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        for term, tf in term_counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+        length = sum(term_counts.values())
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = tuple(term_counts)
+        self.total_length += length
+
+    def copy(self) -> "InvertedIndex":
+        """Copy the postings and lengths, to read while this index changes."""
+        other = InvertedIndex(self.k1, self.b)
+        other.postings = {term: dict(docs) for term, docs in self.postings.items()}
+        other.doc_lengths = dict(self.doc_lengths)
+        other.doc_terms = dict(self.doc_terms)
+        other.total_length = self.total_length
+        return other
+
+    def remove(self, doc_id: str):
+        """Remove a document and its postings."""
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+
+        for term in self.doc_terms.pop(doc_id, ()):
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        """Inverse document frequency of a term."""
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str) -> dict[str, float]:
+        """Accumulate BM25 scores for every document containing a query term."""
+        return self.score_many([query])[0]
+
+    def score_many(self, queries: Sequence[str]) -> list[dict[str, float]]:
+        """Score a batch of queries in one pass over the postings of their terms.
+
+        Each posting list is walked once however many queries share the term.
+        """
+        scores: list[dict[str, float]] = [{} for _ in queries]
+        if not self.doc_lengths:
+            return scores
+
+        queries_by_term: dict[str, list[int]] = {}
+        for i, query in enumerate(queries):
+            for term in set(tokenize(query)):
+                queries_by_term.setdefault(term, []).append(i)
+
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        k1, b = self.k1, self.b
+        for term, query_ids in queries_by_term.items():
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf(term)
+            targets = [scores[i] for i in query_ids]
+            for doc_id, tf in docs.items():
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avg_length)
+                weight = idf * tf * (k1 + 1) / (tf + norm)
+                for query_scores in targets:
+                    query_scores[doc_id] = query_scores.get(doc_id, 0.0) + weight
+        return scores
+
+    def top_k(self, query: str, k: int) -> list[tuple[str, float]]:
+        """Return the k best (doc_id, score) pairs, highest score first."""
+        return self.top_k_many([query], k)[0]
+
+    def top_k_many(
+        self, queries: Sequence[str], k: int
+    ) -> list[list[tuple[str, float]]]:
+        """Return the k best (doc_id, score) pairs of each query, best first."""
+        if k <= 0:
+            return [[] for _ in queries]
+        return [
+            heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            for scores in self.score_many(queries)
+        ]
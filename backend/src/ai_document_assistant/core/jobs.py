@@ -0,0 +1,361 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Awaitable, Iterable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+from .metrics import INGEST_JOBS, INGEST_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_JSON_FIELDS = ("metadata", "timings")
+
+T = TypeVar("T")
+
+
+class JobStore:
+    """SQLite-backed record of ingestion jobs, so queued work survives a restart."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(db_path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                stage TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                timings TEXT NOT NULL DEFAULT '{}',
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                content_hash TEXT
+            )""")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "content_hash" not in columns:
+            # Databases created before jobs recorded the hash of their upload
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_content_hash "
+            "ON jobs (content_hash, status)"
+        )
+
+    def _row_to_job(self, row: Optional[sqlite3.Row]) -> Optional[dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for field in _JSON_FIELDS:
+            job[field] = json.loads(job[field])
+        return job
+
+    def create(
+        self,
+        filename: str,
+        file_path: Path,
+        metadata: dict[str, Any],
+        job_id: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """Queue a new job.
+
+        If a queued or running job already has the given content hash, that
+        job is returned instead, so a file uploaded twice is ingested once.
+        """
+        job_id = job_id or str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        with self._lock:
+            # Other processes share the database, so check and insert in one
+            # write transaction.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = None
+                if content_hash is not None:
+                    row = self._find_active(content_hash)
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, status, filename, file_path, metadata, "
+                        "content_hash, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            job_id,
+                            QUEUED,
+                            filename,
+                            str(file_path),
+                            json.dumps(metadata),
+                            content_hash,
+                            now,
+                            now,
+                        ),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is not None:
+            return self._row_to_job(row)
+        return self.get(job_id)
+
+    def _find_active(self, content_hash: str) -> Optional[sqlite3.Row]:
+        return self._conn.execute(
+            "SELECT * FROM jobs WHERE content_hash = ? AND status IN (?, ?) "
+            "ORDER BY created_at LIMIT 1",
+            (content_hash, QUEUED, RUNNING),
+        ).fetchone()
+
+    def find_active(self, content_hash: str) -> Optional[dict[str, Any]]:
+        """Return the queued or running job for a content hash, if any."""
+        with self._lock:
+            row = self._find_active(content_hash)
+        return self._row_to_job(row)
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row)
+
+    def update(self, job_id: str, **fields: Any):
+        """Update the given columns of a job."""
+        for field in _JSON_FIELDS:
+            if field in fields:
+                fields[field] = json.dumps(fields[field])
+        fields["updated_at"] = datetime.now().isoformat()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+            )
+
+    def claim_next(self) -> Optional[dict[str, Any]]:
+        """Atomically mark the oldest queued job as running and return it."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                        (RUNNING, datetime.now().isoformat(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        if job is not None:
+            job["status"] = RUNNING
+        return job
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs left running by a previous process back in the queue."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = NULL, progress = 0, "
+                "timings = '{}' WHERE status = ?",
+                (QUEUED, RUNNING),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobContext:
+    """Handed to a job handler to report stage progress and timings.
+
+    Stages run one after another with ``stage``. Stages whose work is
+    interleaved, such as parsing and embedding a document as it streams, add
+    up the time of each step with ``timed`` and are recorded with ``complete``.
+    """
+
+    def __init__(self, store: JobStore, job: dict[str, Any], stages: list[str]):
+        self.store = store
+        self.job = job
+        self.stages = stages
+        self.timings: dict[str, float] = {}
+        self.current_stage: Optional[str] = None
+        self._elapsed: dict[str, float] = {}
+
+    async def begin(self, name: str):
+        """Report the stage the job is in."""
+        self.current_stage = name
+        await asyncio.to_thread(self.store.update, self.job["id"], stage=name)
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Time a stage and record it on the job when it finishes."""
+        await self.begin(name)
+        start = time.perf_counter()
+        yield
+        await self._record(name, time.perf_counter() - start)
+
+    @contextmanager
+    def timed(self, name: str):
+        """Add the time of one step to a stage; usable from worker threads.
+
+        A step that fails makes its stage the one the job failed in.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.current_stage = name
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self._elapsed[name] = self._elapsed.get(name, 0.0) + elapsed
+
+    def timed_iter(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Yield items, adding the time taken to produce each one to a stage."""
+        iterator = iter(items)
+        while True:
+            with self.timed(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    async def complete(self, name: str):
+        """Record the time added up by ``timed`` for a stage."""
+        await self._record(name, self._elapsed.pop(name, 0.0))
+
+    async def _record(self, name: str, elapsed: float):
+        INGEST_STAGE_SECONDS.observe(elapsed, stage=name)
+        self.timings[name] = round(elapsed, 4)
+        await asyncio.to_thread(
+            self.store.update,
+            self.job["id"],
+            timings=self.timings,
+            progress=len(self.timings) / len(self.stages),
+        )
+
+
+JobHandler = Callable[[dict[str, Any], JobContext], Awaitable[None]]
+
+
+class JobQueue:
+    """Runs queued jobs from a JobStore with a fixed number of asyncio workers."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: JobHandler,
+        stages: list[str],
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self.handler = handler
+        self.stages = stages
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self):
+        """Requeue interrupted jobs and start the workers."""
+        requeued = await asyncio.to_thread(self.store.requeue_interrupted)
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self):
+        """Cancel the workers; jobs they were running are requeued on next start."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        filename: str,
+        file_path: Path,
+        metadata: dict[str, Any],
+        job_id: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """Queue a job and wake a worker.
+
+        Returns the queued or running job with the same content hash instead
+        of queueing another, as JobStore.create does.
+        """
+        job = await asyncio.to_thread(
+            self.store.create, filename, file_path, metadata, job_id, content_hash
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def _worker(self):
+        while True:
+            # Clear before claiming, so a job submitted after the claim finds
+            # nothing still wakes this worker.
+            self._wakeup.clear()
+            job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: dict[str, Any]):
+        """Run a job; the uploaded file of a job that fails is deleted."""
+        context = JobContext(self.store, job, self.stages)
+        try:
+            await self.handler(job, context)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(
+                f"Job {job['id']} failed in stage {context.current_stage}: {str(e)}"
+            )
+            INGEST_JOBS.inc(status=FAILED)
+            await asyncio.to_thread(
+                self.store.update,
+                job["id"],
+                status=FAILED,
+                stage=context.current_stage,
+                error=str(e),
+            )
+            # Nothing refers to the upload of a failed job; the job row keeps
+            # the error.
+            await asyncio.to_thread(Path(job["file_path"]).unlink, missing_ok=True)
+            return
+        INGEST_JOBS.inc(status=DONE)
+        await asyncio.to_thread(
+            self.store.update, job["id"], status=DONE, stage=None, progress=1.0
+        )
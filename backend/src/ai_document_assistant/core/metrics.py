@@ -0,0 +1,284 @@
+import bisect
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+# Seconds, from a fast lexical lookup up to a long LLM answer
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+# Bytes, 1 KiB to 64 MiB
+SIZE_BUCKETS = tuple(float(1024 * 4**i) for i in range(9))
+# Items such as chunks per document or texts per embedding batch
+COUNT_BUCKETS = (
+    1.0,
+    2.0,
+    5.0,
+    10.0,
+    20.0,
+    50.0,
+    100.0,
+    200.0,
+    500.0,
+    1000.0,
+    2000.0,
+    5000.0,
+)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_text(
+        self, values: LabelValues, extra: tuple[tuple[str, str], ...] = ()
+    ) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return (
+            "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+        )
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    """Monotonic count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(
+                    f"{self.name}{self._label_text(key)} {_format_value(value)}"
+                )
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count per bucket (the last one is +Inf), sum, count
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0, 0.0])
+            )
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the seconds spent in the block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+        return int(entry[1][1]) if entry else 0
+
+    def sum(self, **labels: str) -> float:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+        return entry[1][0] if entry else 0.0
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), list(totals)))
+                for key, (counts, totals) in self._values.items()
+            )
+        for key, (counts, (total, count)) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = self._label_text(key, (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{self._label_text(key)} {_format_value(total)}"
+            )
+            lines.append(f"{self.name}_count{self._label_text(key)} {int(count)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter(self.prefix + name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram(self.prefix + name, documentation, labelnames, buckets)
+        )
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(prefix="docassistant_")
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds",
+    "Time to produce an HTTP response, up to its headers for streams.",
+    ["method", "route", "status"],
+)
+UPLOAD_BYTES = REGISTRY.histogram(
+    "upload_bytes", "Size of accepted uploads.", buckets=SIZE_BUCKETS
+)
+INGEST_STAGE_SECONDS = REGISTRY.histogram(
+    "ingest_stage_seconds", "Time spent in each ingestion stage.", ["stage"]
+)
+INGEST_JOBS = REGISTRY.counter(
+    "ingest_jobs_total", "Finished ingestion jobs by outcome.", ["status"]
+)
+PARSE_SECONDS_PER_PAGE = REGISTRY.histogram(
+    "parse_seconds_per_page",
+    "Extraction time divided by the pages (or 1) of each document.",
+)
+PARSED_PAGES = REGISTRY.counter("parsed_pages_total", "Pages extracted from documents.")
+CHUNKS_PER_DOCUMENT = REGISTRY.histogram(
+    "chunks_per_document", "Chunks cut from each document.", buckets=COUNT_BUCKETS
+)
+EMBEDDING_BATCH_SECONDS = REGISTRY.histogram(
+    "embedding_batch_seconds", "Latency of one embedding request."
+)
+EMBEDDING_BATCH_SIZE = REGISTRY.histogram(
+    "embedding_batch_size",
+    "Texts sent in one embedding request.",
+    buckets=COUNT_BUCKETS,
+)
+VECTOR_INSERT_SECONDS = REGISTRY.histogram(
+    "vector_insert_seconds",
+    "Latency of writing a batch of vectors to the vector store.",
+)
+VECTOR_SEARCH_SECONDS = REGISTRY.histogram(
+    "vector_search_seconds",
+    "Latency of one vector store search, embedding the query included.",
+)
+LEXICAL_SEARCH_SECONDS = REGISTRY.histogram(
+    "lexical_search_seconds",
+    "Latency of one BM25 search call, which may hold a batch of queries.",
+)
+LEXICAL_QUERIES = REGISTRY.counter(
+    "lexical_queries_total", "Queries answered by the BM25 index."
+)
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "llm_first_token_seconds",
+    "Time from a streamed chat request to its first answer token.",
+)
+LLM_RESPONSE_SECONDS = REGISTRY.histogram(
+    "llm_response_seconds",
+    "Time to answer a chat message, retrieval included.",
+    ["mode"],
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ["cache", "result"],
+)
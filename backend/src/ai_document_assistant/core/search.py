@@ -1,57 +1,437 @@
-from typing import List, Dict, Any
-from pathlib import Path
 import json
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator, MutableMapping
 from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from .content_store import ContentStore, ContentWriter
+from .inverted_index import InvertedIndex, tokenize
+from .locks import ReadWriteLock
+from .metrics import LEXICAL_QUERIES, LEXICAL_SEARCH_SECONDS
+from .segment_store import SegmentStore
+from .snapshot import IndexSnapshot, current_snapshot, publish
+from .snippets import make_snippets
+
+logger = logging.getLogger(__name__)
+
+
+class _StoredDocuments(MutableMapping):
+    """Dict-like view of the documents in a SegmentStore, decoded on access."""
+
+    def __init__(self, store: SegmentStore):
+        self.store = store
+
+    def __getitem__(self, doc_id: str) -> dict[str, Any]:
+        value = self.store.get(doc_id)
+        if value is None:
+            raise KeyError(doc_id)
+        return json.loads(value)
+
+    def __setitem__(self, doc_id: str, doc_data: dict[str, Any]):
+        self.store.put(doc_id, json.dumps(doc_data).encode("utf-8"))
+
+    def __delitem__(self, doc_id: str):
+        if not self.store.delete(doc_id):
+            raise KeyError(doc_id)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self.store
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.keys())
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+def _hit_fields(doc_data: dict[str, Any]) -> bytes:
+    """What a search hit shows about a document, as stored in snapshots."""
+    return json.dumps(
+        {"metadata": doc_data["metadata"], "indexed_at": doc_data["indexed_at"]}
+    ).encode("utf-8")
+
+
+def _load_content(
+    content_store: ContentStore, doc_id: str, doc_data: dict[str, Any]
+) -> str:
+    content = content_store.get(doc_id)
+    if content is None:
+        # Records written before bodies moved to the content store.
+        content = doc_data.get("content", "")
+    return content
+
+
+def _build_results(
+    content_store: ContentStore,
+    queries: list[str],
+    batch_hits: list[list[Any]],
+    records: dict[str, Optional[dict[str, Any]]],
+    context: int,
+) -> list[list[dict[str, Any]]]:
+    """Turn scored hits into results with snippets, loading each body once per batch."""
+    contents: dict[str, str] = {}
+    batch_results = []
+    for query, hits in zip(queries, batch_hits):
+        results = []
+        for doc_id, score in hits:
+            doc_data = records[doc_id]
+            if doc_data is None:
+                continue
+            if doc_id not in contents:
+                contents[doc_id] = _load_content(content_store, doc_id, doc_data)
+            results.append(
+                {
+                    "doc_id": doc_id,
+                    "metadata": doc_data["metadata"],
+                    "indexed_at": doc_data["indexed_at"],
+                    "score": score,
+                    "snippets": make_snippets(contents[doc_id], query, context=context),
+                }
+            )
+        batch_results.append(results)
+    return batch_results
+
+
+class DocumentWriter:
+    """Indexes a document from text written in pieces.
+
+    The body is compressed to disk and its terms are counted as the text
+    arrives, so only the term counts are held in memory. Pieces should break
+    between words.
+    """
+
+    def __init__(self, search: "DocumentSearch", doc_id: str, metadata: dict[str, Any]):
+        self.search = search
+        self.doc_id = doc_id
+        self.metadata = metadata
+        self.terms: Counter = Counter()
+        self._content: ContentWriter = search.content_store.writer(doc_id)
+
+    @property
+    def length(self) -> int:
+        """Characters written so far."""
+        return self._content.length
+
+    def write(self, text: str):
+        """Append text to the document."""
+        self._content.write(text)
+        self.terms.update(tokenize(text))
+
+    def commit(self):
+        """Store the body and make the document searchable, replacing any old one."""
+        with self.search.lock.write():
+            self._content.commit()
+            self.search._add_record(
+                self.doc_id, self.metadata, self.terms, self._content.length
+            )
+
+    def abort(self):
+        """Discard the written text; a no-op once committed."""
+        self._content.abort()
+
 
 class DocumentSearch:
     def __init__(self, storage_dir: Path):
         self.storage_dir = storage_dir
         self.index_file = storage_dir / "search_index.json"
+        self.store_dir = storage_dir / "search_index"
+        self.snapshot_dir = storage_dir / "search_snapshots"
+        self.content_store = ContentStore(storage_dir / "content")
         self._load_index()
 
     def _load_index(self):
-        """Load the search index from disk."""
+        """Open the on-disk index; postings are built on the first search."""
+        self.store = SegmentStore(self.store_dir)
+        self.index = _StoredDocuments(self.store)
+        self._inverted_index: Optional[InvertedIndex] = None
+        self._doc_ids_by_hash: dict[str, str] = {}
+        self._hit_fields: dict[str, bytes] = {}
+        # Counts changes to the index; a snapshot is published when it moved on.
+        self._changes = 0
+        self._published_changes: Optional[int] = None
+        self._publish_lock = threading.Lock()
+        # Searches share the lock; indexing, deletion and the initial build
+        # take it exclusively.
+        self.lock = ReadWriteLock()
+
         if self.index_file.exists():
-            with open(self.index_file, "r") as f:
-                self.index = json.load(f)
-        else:
-            self.index = {}
-
-    def _save_index(self):
-        """Save the search index to disk."""
-        with open(self.index_file, "w") as f:
-            json.dump(self.index, f)
-
-    def index_document(self, doc_id: str, content: str, metadata: Dict[str, Any]):
-        """Index a document for search."""
-        self.index[doc_id] = {
-            "content": content,
+            self._migrate_legacy_index()
+
+    def _migrate_legacy_index(self):
+        """Import a search_index.json written by older versions, then set it aside."""
+        with open(self.index_file) as f:
+            legacy = json.load(f)
+
+        records = []
+        for doc_id, doc_data in legacy.items():
+            content = doc_data.pop("content")
+            self.content_store.put(doc_id, content)
+            doc_data["terms"] = Counter(tokenize(content))
+            doc_data["length"] = len(content)
+            records.append((doc_id, json.dumps(doc_data).encode("utf-8")))
+        self.store.put_many(records)
+
+        self.index_file.rename(self.index_file.with_suffix(".json.migrated"))
+        logger.info(f"Migrated {len(records)} documents from {self.index_file}")
+
+    @property
+    def inverted_index(self) -> InvertedIndex:
+        """Postings for every stored document, built on first use."""
+        return self.ensure_index()
+
+    def ensure_index(self) -> InvertedIndex:
+        """Build the postings from the stored term counts, unless already built."""
+        if self._inverted_index is None:
+            with self.lock.write():
+                if self._inverted_index is None:
+                    inverted_index = InvertedIndex()
+                    for doc_id in self.store.keys():
+                        value = self.store.get(doc_id)
+                        if value is None:
+                            continue
+                        doc_data = json.loads(value)
+                        inverted_index.add_terms(doc_id, doc_data["terms"])
+                        self._hit_fields[doc_id] = _hit_fields(doc_data)
+                        content_hash = doc_data["metadata"].get("content_hash")
+                        if content_hash:
+                            self._doc_ids_by_hash[content_hash] = doc_id
+                    self._inverted_index = inverted_index
+        return self._inverted_index
+
+    def index_document(self, doc_id: str, content: str, metadata: dict[str, Any]):
+        """Index a document for search; the body goes to the content store."""
+        terms = Counter(tokenize(content))
+        with self.lock.write():
+            self.content_store.put(doc_id, content)
+            self._add_record(doc_id, metadata, terms, len(content))
+
+    def begin_document(self, doc_id: str, metadata: dict[str, Any]) -> "DocumentWriter":
+        """Start indexing a document whose text arrives in pieces.
+
+        Write the text to the returned writer and commit it to make the
+        document searchable.
+        """
+        return DocumentWriter(self, doc_id, metadata)
+
+    def _add_record(
+        self, doc_id: str, metadata: dict[str, Any], terms: Counter, length: int
+    ):
+        """Record an indexed document; the caller holds the write lock."""
+        doc_data = {
             "metadata": metadata,
             "indexed_at": datetime.now().isoformat(),
+            "length": length,
+            "terms": terms,
         }
-        self._save_index()
+        self.index[doc_id] = doc_data
+        self._changes += 1
+        if self._inverted_index is not None:
+            self._inverted_index.add_terms(doc_id, terms)
+            self._hit_fields[doc_id] = _hit_fields(doc_data)
+            if metadata.get("content_hash"):
+                self._doc_ids_by_hash[metadata["content_hash"]] = doc_id
 
-    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for documents matching the query."""
-        results = []
-        query = query.lower()
+    def search(
+        self, query: str, limit: int = 5, context: int = 80
+    ) -> list[dict[str, Any]]:
+        """Search for documents matching the query, ranked by BM25.
 
-        for doc_id, doc_data in self.index.items():
-            content = doc_data["content"].lower()
-            if query in content:
-                results.append({
-                    "doc_id": doc_id,
-                    "content": doc_data["content"],
-                    "metadata": doc_data["metadata"],
-                    "indexed_at": doc_data["indexed_at"],
-                })
+        Hits carry highlighted snippets with offsets into the document rather
+        than the full body; use get_document to fetch that. ``context`` is the
+        number of characters kept on each side of a matched term.
+        """
+        return self.search_many([query], limit, context)[0]
+
+    def search_many(
+        self, queries: list[str], limit: int = 5, context: int = 80
+    ) -> list[list[dict[str, Any]]]:
+        """Run a batch of searches, returning the hits of each query in order.
 
-        # Sort by relevance (simple implementation)
-        results.sort(key=lambda x: x["content"].count(query), reverse=True)
-        return results[:limit]
+        The queries are scored together in one pass over the postings, and
+        each matched document is read from the store once for the whole batch.
+        """
+        start = time.perf_counter()
+        inverted_index = self.inverted_index
+        with self.lock.read():
+            batch_hits = inverted_index.top_k_many(queries, limit)
+            records = {
+                doc_id: self.index.get(doc_id)
+                for hits in batch_hits
+                for doc_id, _ in hits
+            }
+
+        batch_results = _build_results(
+            self.content_store, queries, batch_hits, records, context
+        )
+        LEXICAL_SEARCH_SECONDS.observe(time.perf_counter() - start)
+        LEXICAL_QUERIES.inc(len(queries))
+        return batch_results
+
+    def find_by_hash(self, content_hash: str) -> Optional[str]:
+        """Return the id of an indexed document with this upload hash, if any."""
+        self.ensure_index()  # the hash map is built alongside the postings
+        with self.lock.read():
+            return self._doc_ids_by_hash.get(content_hash)
+
+    def get_document(self, doc_id: str) -> Optional[dict[str, Any]]:
+        """Fetch a document's full body and metadata."""
+        doc_data = self.index.get(doc_id)
+        if doc_data is None:
+            return None
+        return {
+            "doc_id": doc_id,
+            "content": _load_content(self.content_store, doc_id, doc_data),
+            "metadata": doc_data["metadata"],
+            "indexed_at": doc_data["indexed_at"],
+        }
 
     def delete_document(self, doc_id: str):
         """Remove a document from the search index."""
-        if doc_id in self.index:
-            del self.index[doc_id]
-            self._save_index() 
\ No newline at end of file
+        with self.lock.write():
+            doc_data = self.index.get(doc_id)
+            if doc_data is not None:
+                content_hash = doc_data["metadata"].get("content_hash")
+                if self._doc_ids_by_hash.get(content_hash) == doc_id:
+                    del self._doc_ids_by_hash[content_hash]
+                del self.index[doc_id]
+                self.content_store.delete(doc_id)
+                self._changes += 1
+                if self._inverted_index is not None:
+                    self._inverted_index.remove(doc_id)
+                    self._hit_fields.pop(doc_id, None)
+
+    def publish_snapshot(self) -> Optional[int]:
+        """Publish the index for SnapshotSearch readers if it changed since last time.
+
+        Returns the new generation, or None when there was nothing to publish.
+        """
+        inverted_index = self.inverted_index
+        with self._publish_lock:
+            start = time.perf_counter()
+            # Copy under the lock and write outside it, so indexing only waits
+            # for the copy.
+            with self.lock.read():
+                changes = self._changes
+                if (
+                    changes == self._published_changes
+                    and current_snapshot(self.snapshot_dir) is not None
+                ):
+                    return None
+                inverted_index = inverted_index.copy()
+                hit_fields = dict(self._hit_fields)
+                doc_ids_by_hash = dict(self._doc_ids_by_hash)
+            generation, path = publish(
+                self.snapshot_dir, inverted_index, hit_fields, doc_ids_by_hash
+            )
+            self._published_changes = changes
+        logger.info(
+            f"Published search snapshot {generation} "
+            f"with {len(inverted_index)} documents "
+            f"({path.stat().st_size} bytes) in {time.perf_counter() - start:.2f}s"
+        )
+        return generation
+
+    def close(self):
+        """Release the files backing the index."""
+        self.store.close()
+
+
+class SnapshotSearch:
+    """Read-only search over the snapshots published by a DocumentSearch elsewhere.
+
+    Every reader maps the same immutable file, so the index is held once in
+    the page cache however many workers serve searches. CURRENT is checked at
+    most every ``poll_interval`` seconds and a newer generation is swapped in
+    without blocking searches running on the old one.
+    """
+
+    def __init__(self, storage_dir: Path, poll_interval: float = 1.0):
+        self.storage_dir = storage_dir
+        self.snapshot_dir = storage_dir / "search_snapshots"
+        self.content_store = ContentStore(storage_dir / "content")
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._checked_at = float("-inf")
+        self.refresh()
+
+    def refresh(self) -> Optional[IndexSnapshot]:
+        """Switch to the current snapshot if a newer one was published."""
+        self._checked_at = time.monotonic()
+        path = current_snapshot(self.snapshot_dir)
+        snapshot = self._snapshot
+        if path is None or (snapshot is not None and snapshot.path == path):
+            return snapshot
+        try:
+            snapshot = IndexSnapshot(path)
+        except FileNotFoundError:
+            # Pruned by a newer publish in between; the next check finds that one.
+            return self._snapshot
+        logger.info(
+            f"Loaded search snapshot {snapshot.generation} "
+            f"with {len(snapshot)} documents"
+        )
+        # Searches holding the old snapshot finish on it; its map is released
+        # with the last of them.
+        self._snapshot = snapshot
+        return snapshot
+
+    @property
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        if time.monotonic() - self._checked_at >= self.poll_interval:
+            return self.refresh()
+        return self._snapshot
+
+    @property
+    def generation(self) -> Optional[int]:
+        snapshot = self.snapshot
+        return snapshot.generation if snapshot is not None else None
+
+    def search(
+        self, query: str, limit: int = 5, context: int = 80
+    ) -> list[dict[str, Any]]:
+        """Search for documents matching the query; see DocumentSearch.search."""
+        return self.search_many([query], limit, context)[0]
+
+    def search_many(
+        self, queries: list[str], limit: int = 5, context: int = 80
+    ) -> list[list[dict[str, Any]]]:
+        """Run a batch of searches on one snapshot; see DocumentSearch.search_many."""
+        start = time.perf_counter()
+        snapshot = self.snapshot
+        if snapshot is None:
+            return [[] for _ in queries]
+        batch_hits = snapshot.top_k_many(queries, limit)
+        records = {
+            doc_id: snapshot.fields(doc_id) for hits in batch_hits for doc_id, _ in hits
+        }
+        batch_results = _build_results(
+            self.content_store, queries, batch_hits, records, context
+        )
+        LEXICAL_SEARCH_SECONDS.observe(time.perf_counter() - start)
+        LEXICAL_QUERIES.inc(len(queries))
+        return batch_results
+
+    def find_by_hash(self, content_hash: str) -> Optional[str]:
+        """Return the id of a published document with this upload hash, if any."""
+        snapshot = self.snapshot
+        return snapshot.find_by_hash(content_hash) if snapshot is not None else None
+
+    def get_document(self, doc_id: str) -> Optional[dict[str, Any]]:
+        """Fetch a published document's full body and metadata."""
+        snapshot = self.snapshot
+        fields = snapshot.fields(doc_id) if snapshot is not None else None
+        if fields is None:
+            return None
+        content = self.content_store.get(doc_id)
+        if content is None:
+            # Deleted since the snapshot was published.
+            return None
+        return {"doc_id": doc_id, "content": content, **fields}
+
+    def close(self):
+        """Drop the current snapshot; the map is released once no search uses it."""
+        self._snapshot = None
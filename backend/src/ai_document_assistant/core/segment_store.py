@@ -0,0 +1,419 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# op, key length, value length, crc32 of key + value
+HEADER = struct.Struct(">BHII")
+OP_PUT = 1
+OP_DELETE = 2
+
+MANIFEST_NAME = "MANIFEST"
+SEGMENT_SUFFIX = ".log"
+
+
+def _fsync_dir(directory: Path):
+    """Flush directory entries so a rename survives a crash, where the OS allows it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: Path, data: bytes):
+    """Replace a file so readers see either the old or the new contents."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path.parent)
+
+
+class _Segment:
+    """A single log file, read through mmap where the platform allows it."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.name
+        self.size = path.stat().st_size if path.exists() else 0
+        self.map: Optional[mmap.mmap] = None
+
+    def open_map(self):
+        self.close_map()
+        self.size = self.path.stat().st_size
+        if not self.size:
+            return
+        with open(self.path, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self.map = None
+
+    def close_map(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def read(self, offset: int, length: int) -> bytes:
+        if (
+            self.map is not None
+            and offset + length > len(self.map)
+            and offset + length <= self.size
+        ):
+            # The active segment grew since it was mapped.
+            self.open_map()
+        if self.map is not None and offset + length <= len(self.map):
+            return self.map[offset : offset + length]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+class SegmentStore:
+    """Append-only key/value log split into segments.
+
+    Writes append a checksummed record to the active segment and fsync it;
+    deletes append a tombstone. The manifest lists the segments in replay
+    order and is only ever replaced atomically, so a crash leaves either the
+    old or the new layout. Dead records are reclaimed by compaction, which
+    runs in a background thread once they make up ``compaction_ratio`` of the
+    log.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        compaction_ratio: float = 0.5,
+        min_compaction_bytes: int = 1024 * 1024,
+    ):
+        self.directory = directory
+        self.manifest_file = directory / MANIFEST_NAME
+        self.max_segment_bytes = max_segment_bytes
+        self.compaction_ratio = compaction_ratio
+        self.min_compaction_bytes = min_compaction_bytes
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        # key -> (segment name, value offset, value length, record size)
+        self._locations: dict[str, tuple[str, int, int, int]] = {}
+        self._segments: list[_Segment] = []
+        self._dead_bytes = 0
+        self._next_segment = 1
+        self._writer = None
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    @property
+    def _active(self) -> _Segment:
+        return self._segments[-1]
+
+    def _segment(self, name: str) -> _Segment:
+        for segment in self._segments:
+            if segment.name == name:
+                return segment
+        raise KeyError(name)
+
+    def _new_segment_path(self) -> Path:
+        path = self.directory / f"{self._next_segment:08d}{SEGMENT_SUFFIX}"
+        self._next_segment += 1
+        return path
+
+    def _write_manifest(self):
+        manifest = {
+            "segments": [segment.name for segment in self._segments],
+            "next_segment": self._next_segment,
+        }
+        write_atomic(self.manifest_file, json.dumps(manifest).encode("utf-8"))
+
+    def _open(self):
+        """Replay the segments listed in the manifest, headers only."""
+        if self.manifest_file.exists():
+            manifest = json.loads(self.manifest_file.read_text())
+            names = manifest["segments"]
+            self._next_segment = manifest["next_segment"]
+        else:
+            names = []
+
+        # Files not in the manifest are leftovers of an interrupted rotation
+        # or compaction.
+        for path in self.directory.glob(f"*{SEGMENT_SUFFIX}"):
+            if path.name not in names:
+                logger.warning(f"Removing orphaned segment {path}")
+                path.unlink()
+
+        for name in names:
+            path = self.directory / name
+            if not path.exists():
+                path.touch()
+            self._segments.append(_Segment(path))
+
+        if not self._segments:
+            path = self._new_segment_path()
+            path.touch()
+            self._segments.append(_Segment(path))
+            self._write_manifest()
+
+        for segment in self._segments:
+            segment.open_map()
+            is_active = segment is self._active
+            end = self._scan(segment, verify=is_active)
+            if end < segment.size:
+                if is_active:
+                    logger.warning(
+                        f"Truncating torn tail of {segment.path} at byte {end}"
+                    )
+                    segment.close_map()
+                    with open(segment.path, "r+b") as f:
+                        f.truncate(end)
+                        os.fsync(f.fileno())
+                    segment.open_map()
+                else:
+                    logger.error(
+                        f"Corrupt record in sealed segment {segment.path} at byte {end}"
+                    )
+
+        self._writer = open(self._active.path, "ab")
+
+    def _scan(self, segment: _Segment, verify: bool) -> int:
+        """Apply a segment's records to the key table; return where the good ones end.
+
+        Only the active segment can have a torn tail, so only it is checksummed.
+        """
+        if not segment.size:
+            return 0
+        data = segment.map if segment.map is not None else segment.path.read_bytes()
+        size = segment.size
+        offset = 0
+        while offset + HEADER.size <= size:
+            op, key_len, value_len, crc = HEADER.unpack_from(data, offset)
+            key_start = offset + HEADER.size
+            value_start = key_start + key_len
+            end = value_start + value_len
+            if op not in (OP_PUT, OP_DELETE) or end > size:
+                break
+            if verify and zlib.crc32(data[key_start:end]) != crc:
+                break
+            key = data[key_start:value_start].decode("utf-8")
+            self._apply(op, key, segment.name, value_start, value_len, end - offset)
+            offset = end
+        return offset
+
+    def _apply(
+        self,
+        op: int,
+        key: str,
+        segment_name: str,
+        value_offset: int,
+        value_len: int,
+        record_size: int,
+    ):
+        previous = self._locations.pop(key, None)
+        if previous is not None:
+            self._dead_bytes += previous[3]
+        if op == OP_PUT:
+            self._locations[key] = (segment_name, value_offset, value_len, record_size)
+        else:
+            self._dead_bytes += record_size
+
+    def _append(self, records: Iterable[tuple[int, str, bytes]]):
+        """Append records with a single write and fsync."""
+        with self._lock:
+            base = self._active.size
+            buffer = bytearray()
+            applied = []
+            for op, key, value in records:
+                key_bytes = key.encode("utf-8")
+                buffer += HEADER.pack(
+                    op, len(key_bytes), len(value), zlib.crc32(key_bytes + value)
+                )
+                value_offset = base + len(buffer) + len(key_bytes)
+                buffer += key_bytes
+                buffer += value
+                applied.append(
+                    (
+                        op,
+                        key,
+                        value_offset,
+                        len(value),
+                        HEADER.size + len(key_bytes) + len(value),
+                    )
+                )
+            if not buffer:
+                return
+
+            self._writer.write(buffer)
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+            self._active.size += len(buffer)
+
+            for op, key, value_offset, value_len, record_size in applied:
+                self._apply(
+                    op, key, self._active.name, value_offset, value_len, record_size
+                )
+
+            if self._active.size >= self.max_segment_bytes:
+                self._rotate()
+        self._maybe_compact()
+
+    def _rotate(self):
+        """Seal the active segment and start a new one."""
+        self._writer.close()
+        path = self._new_segment_path()
+        path.touch()
+        sealed = self._active
+        self._segments.append(_Segment(path))
+        self._write_manifest()
+        sealed.open_map()
+        self._writer = open(path, "ab")
+
+    def _total_bytes(self) -> int:
+        return sum(segment.size for segment in self._segments)
+
+    def _maybe_compact(self):
+        with self._lock:
+            dead = self._dead_bytes
+            if (
+                dead < self.min_compaction_bytes
+                or dead < self.compaction_ratio * self._total_bytes()
+            ):
+                return
+            if (
+                self._compaction_thread is not None
+                and self._compaction_thread.is_alive()
+            ):
+                return
+            self._compaction_thread = threading.Thread(
+                target=self.compact, name="segment-compaction", daemon=True
+            )
+            self._compaction_thread.start()
+
+    def compact(self):
+        """Rewrite all sealed segments into one containing only live records."""
+        with self._compact_lock:
+            with self._lock:
+                if self._active.size:
+                    self._rotate()
+                sealed = self._segments[:-1]
+                if not sealed:
+                    return
+                sealed_names = {segment.name for segment in sealed}
+                live = [
+                    (key, location)
+                    for key, location in self._locations.items()
+                    if location[0] in sealed_names
+                ]
+                target = self._new_segment_path()
+
+            # Sealed segments are immutable, so they are copied without the lock.
+            moved = {}
+            offset = 0
+            with open(target, "wb") as f:
+                for key, location in live:
+                    segment_name, value_offset, value_len, _ = location
+                    value = self._segment(segment_name).read(value_offset, value_len)
+                    key_bytes = key.encode("utf-8")
+                    record = HEADER.pack(
+                        OP_PUT,
+                        len(key_bytes),
+                        len(value),
+                        zlib.crc32(key_bytes + value),
+                    )
+                    record += key_bytes + value
+                    f.write(record)
+                    moved[key] = (
+                        location,
+                        (
+                            target.name,
+                            offset + HEADER.size + len(key_bytes),
+                            value_len,
+                            len(record),
+                        ),
+                    )
+                    offset += len(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self._lock:
+                compacted = _Segment(target)
+                for key, (old, new) in moved.items():
+                    # Keys overwritten or deleted while compacting keep their
+                    # newer location.
+                    if self._locations.get(key) == old:
+                        self._locations[key] = new
+
+                remaining = [s for s in self._segments if s.name not in sealed_names]
+                self._segments = ([compacted] if offset else []) + remaining
+                self._write_manifest()
+                compacted.open_map()
+
+                live_bytes = sum(location[3] for location in self._locations.values())
+                self._dead_bytes = max(self._total_bytes() - live_bytes, 0)
+
+                for segment in sealed:
+                    segment.close_map()
+                    segment.path.unlink()
+                if not offset:
+                    target.unlink()
+            logger.info(f"Compacted {len(sealed)} segments into {target.name}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            location = self._locations.get(key)
+            if location is None:
+                return None
+            segment_name, value_offset, value_len, _ = location
+            return self._segment(segment_name).read(value_offset, value_len)
+
+    def put(self, key: str, value: bytes):
+        self._append([(OP_PUT, key, value)])
+
+    def put_many(self, items: Iterable[tuple[str, bytes]]):
+        self._append((OP_PUT, key, value) for key, value in items)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._locations:
+                return False
+            self._append([(OP_DELETE, key, b"")])
+            return True
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self._locations)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._locations
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def close(self):
+        """Wait for compaction and release file handles and maps."""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for segment in self._segments:
+                segment.close_map()
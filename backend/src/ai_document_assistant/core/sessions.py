@@ -0,0 +1,183 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+from .metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message overhead on top of its text, used for the memory cap
+MESSAGE_OVERHEAD = 200
+
+
+def history_size(history: InMemoryChatMessageHistory) -> int:
+    """Estimate the memory held by a session's messages."""
+    return sum(len(message.content) + MESSAGE_OVERHEAD for message in history.messages)
+
+
+class _Session:
+    __slots__ = ("history", "size", "last_access")
+
+    def __init__(self, history: InMemoryChatMessageHistory):
+        self.history = history
+        self.size = history_size(history)
+        self.last_access = time.monotonic()
+
+
+class SessionStore:
+    """Per-session chat histories, kept in memory up to a cap and spilled to SQLite.
+
+    Live sessions sit in an OrderedDict in least-recently-used order, so a
+    lookup is a dict hit plus a move to the end. Sessions idle for longer
+    than ``idle_seconds``, or pushed out by ``max_sessions`` or ``max_bytes``,
+    are written to disk and reloaded on their next request. Spilled sessions
+    untouched for ``retention_seconds`` are deleted.
+
+    With ``write_through``, as when several worker processes share the
+    database, nothing is kept in memory: every get reads the session from
+    SQLite and every save writes it there.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_sessions: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_seconds: float = 1800.0,
+        retention_seconds: float = 7 * 24 * 3600.0,
+        write_through: bool = False,
+    ):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.retention_seconds = retention_seconds
+        self.write_through = write_through
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(db_path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Workers writing at once wait for each other instead of failing.
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)"
+        )
+
+    def get(self, session_id: str) -> InMemoryChatMessageHistory:
+        """Return a session's history, loading it from disk or creating it if needed."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_access = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                CACHE_REQUESTS.inc(cache="sessions", result="hit")
+                return session.history
+
+            CACHE_REQUESTS.inc(cache="sessions", result="miss")
+
+            row = self._conn.execute(
+                "SELECT messages FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            history = InMemoryChatMessageHistory(
+                messages=messages_from_dict(json.loads(row[0])) if row else []
+            )
+            if not self.write_through:
+                self._insert(session_id, history)
+            return history
+
+    def save(self, session_id: str, history: InMemoryChatMessageHistory):
+        """Record a change to a session's history and enforce the caps."""
+        with self._lock:
+            if self.write_through:
+                self._write(session_id, history)
+                self._delete_expired()
+                return
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.size
+            self._insert(session_id, history)
+
+    def delete(self, session_id: str) -> bool:
+        """Drop a session from memory and disk."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.size
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE id = ?", (session_id,)
+            )
+        return session is not None or cursor.rowcount > 0
+
+    def flush(self):
+        """Spill every live session to disk."""
+        with self._lock:
+            while self._sessions:
+                self._spill_oldest()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {
+            "in_memory": len(self._sessions),
+            "in_memory_bytes": self._bytes,
+            "on_disk": stored,
+        }
+
+    def _insert(self, session_id: str, history: InMemoryChatMessageHistory):
+        session = _Session(history)
+        self._sessions[session_id] = session
+        self._bytes += session.size
+        self._evict()
+
+    def _evict(self):
+        # The head of the OrderedDict is always the least recently used session.
+        idle_before = time.monotonic() - self.idle_seconds
+        spilled = 0
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions
+            or self._bytes > self.max_bytes
+            or next(iter(self._sessions.values())).last_access < idle_before
+        ):
+            self._spill_oldest()
+            spilled += 1
+        if spilled:
+            self._delete_expired()
+            logger.debug(f"Spilled {spilled} sessions to disk")
+
+    def _spill_oldest(self):
+        session_id, session = self._sessions.popitem(last=False)
+        self._bytes -= session.size
+        self._write(session_id, session.history)
+
+    def _write(self, session_id: str, history: InMemoryChatMessageHistory):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, messages, updated_at) "
+            "VALUES (?, ?, ?)",
+            (session_id, json.dumps(messages_to_dict(history.messages)), time.time()),
+        )
+
+    def _delete_expired(self):
+        self._conn.execute(
+            "DELETE FROM sessions WHERE updated_at < ?",
+            (time.time() - self.retention_seconds,),
+        )
@@ -0,0 +1,332 @@
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any, Optional
+
+from .inverted_index import InvertedIndex, tokenize
+from .segment_store import _fsync_dir, write_atomic
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DASNAP01"
+CURRENT_NAME = "CURRENT"
+SNAPSHOT_SUFFIX = ".snap"
+
+# Section name -> array typecode. Offsets into string blobs are 64-bit, doc numbers
+# 32-bit.
+_SECTIONS = {
+    "doc_id_offsets": "Q",
+    "doc_id_blob": "B",
+    "doc_norms": "d",
+    "fields_offsets": "Q",
+    "fields_blob": "B",
+    "term_offsets": "Q",
+    "term_blob": "B",
+    "posting_offsets": "Q",
+    "posting_docs": "I",
+    "posting_tfs": "I",
+    "hash_offsets": "Q",
+    "hash_blob": "B",
+    "hash_docs": "I",
+}
+
+
+def _string_table(strings: Iterable[bytes]) -> tuple[array, bytes]:
+    offsets = array("Q", [0])
+    blob = bytearray()
+    for value in strings:
+        blob += value
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+def write_snapshot(
+    path: Path,
+    generation: int,
+    inverted_index: InvertedIndex,
+    fields: dict[str, bytes],
+    doc_ids_by_hash: dict[str, str],
+):
+    """Write an immutable snapshot of an index to ``path``.
+
+    ``fields`` maps each doc_id to the JSON of what search hits show about
+    it, and ``doc_ids_by_hash`` maps upload hashes to doc_ids. Documents are
+    numbered in doc_id order, so ids are found by binary search; postings,
+    document norms and the upload-hash table are stored as flat arrays that
+    readers use straight from the mapped file.
+    """
+    doc_ids = sorted(inverted_index.doc_lengths)
+    numbers = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+    doc_id_offsets, doc_id_blob = _string_table(
+        doc_id.encode("utf-8") for doc_id in doc_ids
+    )
+    fields_offsets, fields_blob = _string_table(fields[doc_id] for doc_id in doc_ids)
+
+    k1, b = inverted_index.k1, inverted_index.b
+    avg_length = inverted_index.total_length / len(doc_ids) if doc_ids else 0.0
+    avg_length = avg_length or 1.0
+    doc_norms = array(
+        "d",
+        (
+            k1 * (1 - b + b * inverted_index.doc_lengths[doc_id] / avg_length)
+            for doc_id in doc_ids
+        ),
+    )
+
+    terms = sorted(inverted_index.postings)
+    term_offsets, term_blob = _string_table(term.encode("utf-8") for term in terms)
+    posting_offsets = array("Q", [0])
+    posting_docs = array("I")
+    posting_tfs = array("I")
+    for term in terms:
+        docs = inverted_index.postings[term]
+        posting_docs.extend(map(numbers.__getitem__, docs))
+        posting_tfs.extend(docs.values())
+        posting_offsets.append(len(posting_docs))
+
+    hashes = sorted(
+        (content_hash, numbers[doc_id])
+        for content_hash, doc_id in doc_ids_by_hash.items()
+        if doc_id in numbers
+    )
+    hash_offsets, hash_blob = _string_table(
+        content_hash.encode("utf-8") for content_hash, _ in hashes
+    )
+    hash_docs = array("I", (i for _, i in hashes))
+
+    sections = {
+        "doc_id_offsets": doc_id_offsets,
+        "doc_id_blob": doc_id_blob,
+        "doc_norms": doc_norms,
+        "fields_offsets": fields_offsets,
+        "fields_blob": fields_blob,
+        "term_offsets": term_offsets,
+        "term_blob": term_blob,
+        "posting_offsets": posting_offsets,
+        "posting_docs": posting_docs,
+        "posting_tfs": posting_tfs,
+        "hash_offsets": hash_offsets,
+        "hash_blob": hash_blob,
+        "hash_docs": hash_docs,
+    }
+    header = {
+        "generation": generation,
+        "byteorder": sys.byteorder,
+        "docs": len(doc_ids),
+        "terms": len(terms),
+        "hashes": len(hashes),
+        "k1": k1,
+        "b": b,
+        "sections": {},
+    }
+    # Sections start on 8-byte boundaries so they can be cast in place.
+    offset = 0
+    for name, data in sections.items():
+        size = len(data) * (data.itemsize if isinstance(data, array) else 1)
+        header["sections"][name] = [offset, size]
+        offset += size + (-size % 8)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = len(MAGIC) + 8 + len(header_bytes)
+    data_start += -data_start % 8
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for data in sections.values():
+            f.write(data.tobytes() if isinstance(data, array) else data)
+            f.write(b"\0" * (-f.tell() % 8))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path.parent)
+
+
+class IndexSnapshot:
+    """A published index, read in place from a memory-mapped file.
+
+    The file is never modified, so every process mapping it shares the same
+    page-cache pages, and only the few strings a search touches are copied.
+    Scores match InvertedIndex.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not an index snapshot")
+        header_len = int.from_bytes(view[len(MAGIC) : len(MAGIC) + 8], "little")
+        header_start = len(MAGIC) + 8
+        header = json.loads(bytes(view[header_start : header_start + header_len]))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(
+                f"{path} was written on a {header['byteorder']}-endian machine"
+            )
+        data_start = header_start + header_len
+        data_start += -data_start % 8
+
+        self.generation: int = header["generation"]
+        self.doc_count: int = header["docs"]
+        self.term_count: int = header["terms"]
+        self.hash_count: int = header["hashes"]
+        self.k1: float = header["k1"]
+        self.b: float = header["b"]
+        for name, typecode in _SECTIONS.items():
+            offset, size = header["sections"][name]
+            section = view[data_start + offset : data_start + offset + size]
+            setattr(
+                self, f"_{name}", section.cast(typecode) if typecode != "B" else section
+            )
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    @staticmethod
+    def _string(offsets: memoryview, blob: memoryview, i: int) -> bytes:
+        return blob[offsets[i] : offsets[i + 1]].tobytes()
+
+    @classmethod
+    def _find(
+        cls, offsets: memoryview, blob: memoryview, count: int, key: bytes
+    ) -> Optional[int]:
+        """Binary search a sorted string table."""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if cls._string(offsets, blob, mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < count and cls._string(offsets, blob, lo) == key:
+            return lo
+        return None
+
+    def doc_id(self, number: int) -> str:
+        return self._string(self._doc_id_offsets, self._doc_id_blob, number).decode(
+            "utf-8"
+        )
+
+    def fields(self, doc_id: str) -> Optional[dict[str, Any]]:
+        """Metadata and indexing time of a document, or None if not in the snapshot."""
+        number = self._find(
+            self._doc_id_offsets,
+            self._doc_id_blob,
+            self.doc_count,
+            doc_id.encode("utf-8"),
+        )
+        if number is None:
+            return None
+        return json.loads(self._string(self._fields_offsets, self._fields_blob, number))
+
+    def find_by_hash(self, content_hash: str) -> Optional[str]:
+        i = self._find(
+            self._hash_offsets,
+            self._hash_blob,
+            self.hash_count,
+            content_hash.encode("utf-8"),
+        )
+        if i is None:
+            return None
+        return self.doc_id(self._hash_docs[i])
+
+    def score_many(self, queries: Sequence[str]) -> list[dict[int, float]]:
+        """BM25 scores of each query by doc number, walking each posting list once."""
+        scores: list[dict[int, float]] = [{} for _ in queries]
+        if not self.doc_count:
+            return scores
+
+        queries_by_term: dict[str, list[int]] = {}
+        for i, query in enumerate(queries):
+            for term in set(tokenize(query)):
+                queries_by_term.setdefault(term, []).append(i)
+
+        n = self.doc_count
+        k1 = self.k1
+        norms = self._doc_norms
+        for term, query_ids in queries_by_term.items():
+            t = self._find(
+                self._term_offsets,
+                self._term_blob,
+                self.term_count,
+                term.encode("utf-8"),
+            )
+            if t is None:
+                continue
+            start, end = self._posting_offsets[t], self._posting_offsets[t + 1]
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            targets = [scores[i] for i in query_ids]
+            for doc, tf in zip(
+                self._posting_docs[start:end], self._posting_tfs[start:end]
+            ):
+                weight = idf * tf * (k1 + 1) / (tf + norms[doc])
+                for query_scores in targets:
+                    query_scores[doc] = query_scores.get(doc, 0.0) + weight
+        return scores
+
+    def top_k_many(
+        self, queries: Sequence[str], k: int
+    ) -> list[list[tuple[str, float]]]:
+        """Return the k best (doc_id, score) pairs of each query, best first."""
+        if k <= 0:
+            return [[] for _ in queries]
+        return [
+            [
+                (self.doc_id(doc), score)
+                for doc, score in heapq.nlargest(
+                    k, scores.items(), key=lambda item: item[1]
+                )
+            ]
+            for scores in self.score_many(queries)
+        ]
+
+
+def current_snapshot(directory: Path) -> Optional[Path]:
+    """Path of the snapshot CURRENT points at, if one was published."""
+    try:
+        name = (directory / CURRENT_NAME).read_text().strip()
+    except FileNotFoundError:
+        return None
+    return directory / name if name else None
+
+
+def publish(
+    directory: Path,
+    inverted_index: InvertedIndex,
+    fields: dict[str, bytes],
+    doc_ids_by_hash: dict[str, str],
+    keep: int = 2,
+) -> tuple[int, Path]:
+    """Write the next generation of a snapshot, point CURRENT at it and prune old ones.
+
+    The ``keep`` newest generations stay on disk. Older ones are unlinked;
+    processes that still map them keep reading them until they switch over.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    generations = sorted(
+        int(path.stem)
+        for path in directory.glob(f"*{SNAPSHOT_SUFFIX}")
+        if path.stem.isdigit()
+    )
+    generation = (generations[-1] if generations else 0) + 1
+    path = directory / f"{generation:010d}{SNAPSHOT_SUFFIX}"
+    write_snapshot(path, generation, inverted_index, fields, doc_ids_by_hash)
+    write_atomic(directory / CURRENT_NAME, path.name.encode("utf-8"))
+    for old in generations[: max(len(generations) + 1 - keep, 0)]:
+        try:
+            (directory / f"{old:010d}{SNAPSHOT_SUFFIX}").unlink()
+        except OSError as e:
+            # Windows refuses to delete a mapped file; try again on the next publish.
+            logger.debug(f"Could not remove snapshot {old}: {str(e)}")
+    return generation, path
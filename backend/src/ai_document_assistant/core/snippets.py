@@ -0,0 +1,44 @@
+from typing import Any
+
+from .inverted_index import TOKEN_PATTERN, tokenize
+
+
+def make_snippets(
+    content: str, query: str, max_snippets: int = 3, context: int = 80
+) -> list[dict[str, Any]]:
+    """Cut highlighted windows around the query terms found in content.
+
+    Offsets in ``start``, ``end`` and ``highlights`` refer to the full document,
+    so clients can map a snippet back onto the body fetched separately.
+    """
+    terms = set(tokenize(query))
+    snippets: list[dict[str, Any]] = []
+
+    for match in TOKEN_PATTERN.finditer(content):
+        if match.group().lower() not in terms:
+            continue
+        if snippets and match.start() < snippets[-1]["end"]:
+            current = snippets[-1]
+            current["highlights"].append([match.start(), match.end()])
+            current["end"] = max(
+                current["end"], min(len(content), match.end() + context)
+            )
+            continue
+        if len(snippets) == max_snippets:
+            break
+        snippets.append(
+            {
+                "start": max(0, match.start() - context),
+                "end": min(len(content), match.end() + context),
+                "highlights": [[match.start(), match.end()]],
+            }
+        )
+
+    if not snippets and content:
+        snippets.append(
+            {"start": 0, "end": min(len(content), 2 * context), "highlights": []}
+        )
+
+    for snippet in snippets:
+        snippet["text"] = content[snippet["start"] : snippet["end"]]
+    return snippets
@@ -1,5 +1,17 @@
 """Document processing functionality for the AI Document Assistant."""
 
-from .document_processor import DocumentProcessor
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["DocumentProcessor"] 
\ No newline at end of file
+if TYPE_CHECKING:
+    from .document_processor import DocumentProcessor
+
+__all__ = ["DocumentProcessor"]
+
+
+def __getattr__(name):
+    if name != "DocumentProcessor":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = importlib.import_module(".document_processor", __name__).DocumentProcessor
+    globals()[name] = value
+    return value
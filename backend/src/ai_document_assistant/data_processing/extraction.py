@@ -0,0 +1,221 @@
+import bisect
+import re
+import xml.etree.ElementTree as ElementTree
+import zipfile
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Optional
+
+from PyPDF2 import PdfReader
+
+# Placed between segments in the document text; offsets account for it.
+SEPARATOR = "\n\n"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_HEADING_STYLE = re.compile(r"^(heading|title)", re.IGNORECASE)
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+(.*)")
+
+
+class Segment:
+    """A page or paragraph of extracted text and where it came from."""
+
+    def __init__(
+        self,
+        text: str,
+        page: Optional[int] = None,
+        heading: Optional[str] = None,
+        start: int = 0,
+    ):
+        self.text = text
+        self.page = page
+        self.heading = heading
+        self.start = start
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+def join_segments(segments: Iterable[Segment]) -> str:
+    """The document text the segment offsets refer to."""
+    return SEPARATOR.join(segment.text for segment in segments)
+
+
+def _with_offsets(segments: Iterable[Segment]) -> Iterator[Segment]:
+    offset = 0
+    for segment in segments:
+        segment.start = offset
+        offset = segment.end + len(SEPARATOR)
+        yield segment
+
+
+def extract_pdf_pages(file_path: Path, start: int, stop: int) -> list[tuple[int, str]]:
+    """Text of pages [start, stop) as (page number, text) pairs; runs in a worker."""
+    reader = PdfReader(file_path)
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def _pdf_outline(reader: PdfReader) -> list[tuple[int, str]]:
+    """(page index, title) of each bookmark, in page order."""
+    entries = []
+    pending = list(reader.outline)
+    while pending:
+        item = pending.pop()
+        if isinstance(item, list):
+            pending.extend(item)
+            continue
+        try:
+            entries.append((reader.get_destination_page_number(item), item.title))
+        except Exception:
+            continue
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def _iter_pdf_pages(
+    file_path: Path,
+    page_count: int,
+    executor: Optional[Executor],
+    pages_per_task: int,
+    max_pending: int,
+) -> Iterator[tuple[int, str]]:
+    """Yield (page number, text) in order, fanning page ranges out to the executor.
+
+    At most ``max_pending`` ranges are in flight, so only a few pages of text
+    are held at once however long the document is.
+    """
+    ranges = (
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+    if executor is None:
+        for start, stop in ranges:
+            yield from extract_pdf_pages(file_path, start, stop)
+        return
+
+    pending = deque()
+    for start, stop in ranges:
+        pending.append(executor.submit(extract_pdf_pages, file_path, start, stop))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def iter_pdf_segments(
+    file_path: Path,
+    executor: Optional[Executor] = None,
+    pages_per_task: int = 32,
+    max_pending: int = 4,
+) -> Iterator[Segment]:
+    """Yield one segment per non-empty page, headed by the nearest earlier bookmark."""
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    outline = _pdf_outline(reader)
+    outline_pages = [page for page, _ in outline]
+    del reader
+
+    pages = _iter_pdf_pages(
+        file_path, page_count, executor, pages_per_task, max_pending
+    )
+    for page, text in pages:
+        text = text.strip()
+        if not text:
+            continue
+        i = bisect.bisect_right(outline_pages, page - 1) - 1
+        yield Segment(text, page=page, heading=outline[i][1] if i >= 0 else None)
+
+
+def iter_docx_segments(file_path: Path) -> Iterator[Segment]:
+    """Yield one segment per non-empty paragraph, streamed from document.xml.
+
+    Page numbers count the page breaks Word recorded when the file was last
+    saved, so they are approximate for documents never laid out by Word.
+    """
+    page = 1
+    heading = None
+    with (
+        zipfile.ZipFile(file_path) as archive,
+        archive.open("word/document.xml") as xml,
+    ):
+        for _, element in ElementTree.iterparse(xml, events=("end",)):
+            if element.tag == _W + "tbl":
+                element.clear()
+                continue
+            if element.tag != _W + "p":
+                continue
+
+            parts = []
+            breaks = 0
+            for node in element.iter():
+                if node.tag == _W + "t" and node.text:
+                    parts.append(node.text)
+                elif node.tag == _W + "tab":
+                    parts.append("\t")
+                elif node.tag == _W + "lastRenderedPageBreak":
+                    breaks += 1
+                elif node.tag == _W + "br":
+                    if node.get(_W + "type") == "page":
+                        breaks += 1
+                    else:
+                        parts.append("\n")
+            style = element.find(f"{_W}pPr/{_W}pStyle")
+            is_heading = (
+                style is not None and _HEADING_STYLE.match(style.get(_W + "val", ""))
+            ) or element.find(f"{_W}pPr/{_W}outlineLvl") is not None
+            element.clear()
+
+            text = "".join(parts).strip()
+            if text:
+                if is_heading:
+                    heading = text
+                yield Segment(text, page=page, heading=heading)
+            page += breaks
+
+
+def iter_text_segments(file_path: Path) -> Iterator[Segment]:
+    """Yield the blank-line separated paragraphs of a text or Markdown file."""
+    heading = None
+    lines: list[str] = []
+    with open(file_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.strip():
+                match = _MARKDOWN_HEADING.match(line)
+                if match:
+                    if lines:
+                        yield Segment("\n".join(lines), heading=heading)
+                        lines = []
+                    heading = match.group(1).strip()
+                lines.append(line)
+            elif lines:
+                yield Segment("\n".join(lines), heading=heading)
+                lines = []
+    if lines:
+        yield Segment("\n".join(lines), heading=heading)
+
+
+def iter_segments(
+    file_path: Path,
+    executor: Optional[Executor] = None,
+    pages_per_task: int = 32,
+    max_pending: int = 4,
+) -> Iterator[Segment]:
+    """Stream the segments of a supported file with their offsets in the joined text."""
+    file_type = file_path.suffix.lower()
+    if file_type == ".pdf":
+        segments = iter_pdf_segments(file_path, executor, pages_per_task, max_pending)
+    elif file_type in [".doc", ".docx"]:
+        segments = iter_docx_segments(file_path)
+    elif file_type in [".txt", ".md"]:
+        segments = iter_text_segments(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_path}")
+    return _with_offsets(segments)
+
+
+def extract_segments(file_path: Path, pages_per_task: int = 32) -> list[Segment]:
+    """All segments of a file, extracted in the calling process."""
+    return list(iter_segments(file_path, pages_per_task=pages_per_task))
@@ -0,0 +1,112 @@
+import codecs
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from ..core.config import MAX_FILE_SIZE, SUPPORTED_FILE_TYPES
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+SNIFF_SIZE = 8192
+
+_MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (
+        b"PK\x03\x04",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+]
+
+
+class UploadTooLargeError(Exception):
+    """The upload exceeded MAX_FILE_SIZE."""
+
+
+class UnsupportedUploadError(Exception):
+    """The upload's content does not match a supported file type."""
+
+
+class StoredUpload:
+    def __init__(self, path: Path, size: int, content_hash: str, content_type: str):
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+        self.content_type = content_type
+
+
+def sniff_content_type(head: bytes, filename: str) -> Optional[str]:
+    """Detect the file type from its first bytes, checked against the extension."""
+    suffix = Path(filename).suffix.lower()
+    content_type = None
+    for magic, mime_type in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            content_type = mime_type
+            break
+    else:
+        # Text has no magic number: accept valid UTF-8 without NUL bytes.
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        except UnicodeDecodeError:
+            return None
+        if b"\x00" in head:
+            return None
+        content_type = "text/markdown" if suffix == ".md" else "text/plain"
+
+    if suffix not in SUPPORTED_FILE_TYPES.get(content_type, []):
+        return None
+    return content_type
+
+
+async def save_upload(
+    upload: UploadFile,
+    target_path: Path,
+    filename: str,
+    max_size: int = MAX_FILE_SIZE,
+    chunk_size: int = CHUNK_SIZE,
+) -> StoredUpload:
+    """Stream an upload to disk in fixed-size chunks.
+
+    The type is sniffed from the first bytes and the SHA-256 is computed on
+    the fly. Writing stops as soon as ``max_size`` is exceeded, and a partial
+    file is never left at ``target_path``.
+    """
+    partial_path = target_path.with_name(target_path.name + ".part")
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+
+    f = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            if content_type is None:
+                content_type = sniff_content_type(chunk[:SNIFF_SIZE], filename)
+                if content_type is None:
+                    raise UnsupportedUploadError(f"Unsupported file type: {filename}")
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLargeError(
+                    f"File too large: {filename} exceeds {max_size} bytes"
+                )
+            digest.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+        await run_in_threadpool(f.close)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    if content_type is None:
+        partial_path.unlink(missing_ok=True)
+        raise UnsupportedUploadError(f"Empty file: {filename}")
+
+    partial_path.replace(target_path)
+    return StoredUpload(target_path, size, digest.hexdigest(), content_type)
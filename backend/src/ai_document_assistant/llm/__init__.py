@@ -1,5 +1,19 @@
 """Language model functionality for the AI Document Assistant."""
 
-from .chat_manager import ChatManager
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["ChatManager"] 
\ No newline at end of file
+if TYPE_CHECKING:
+    from .chat_manager import ChatManager
+
+__all__ = ["ChatManager"]
+
+
+def __getattr__(name):
+    # chat_manager imports LangChain, Chroma and the OpenAI clients; only load them
+    # when asked.
+    if name != "ChatManager":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = importlib.import_module(".chat_manager", __name__).ChatManager
+    globals()[name] = value
+    return value
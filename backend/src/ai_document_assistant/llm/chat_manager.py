@@ -1,25 +1,164 @@
+import asyncio
+import bisect
 import logging
-from typing import List, Optional
-from langchain_openai import ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterable
+from typing import Any, Callable, Optional
+
+from chromadb.api.client import SharedSystemClient
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
-from ..core.config import OPENAI_API_KEY, CACHE_DIR
+from langchain.schema import Document
+from langchain_community.vectorstores import Chroma
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.retrievers import BaseRetriever
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from ..core.config import (
+    CACHE_DIR,
+    CHAT_MODEL,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    CHUNK_UNIT,
+    INGEST_WINDOW_CHARS,
+    RETRIEVAL_FETCH_K,
+    RETRIEVAL_K,
+    RETRIEVAL_RERANK,
+    require_openai_api_key,
+)
+from ..core.metrics import (
+    CHUNKS_PER_DOCUMENT,
+    EMBEDDING_BATCH_SECONDS,
+    EMBEDDING_BATCH_SIZE,
+    LLM_FIRST_TOKEN_SECONDS,
+    LLM_RESPONSE_SECONDS,
+    VECTOR_INSERT_SECONDS,
+)
+from ..core.search import DocumentSearch
+from ..data_processing.chunking import Chunker, load_token_offsets
+from ..data_processing.extraction import SEPARATOR, Segment
+from .hybrid_retriever import HybridRetriever
 
 logger = logging.getLogger(__name__)
 
+STREAMING_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Answer the user's question using the following context. "
+            "If the answer is not in the context, say so.\n\nContext:\n{context}",
+        ),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{question}"),
+    ]
+)
+
+
+class ChunkStream:
+    """Cuts chunks from a document's segments as they arrive.
+
+    About ``window`` characters of text are held at a time. Chunks come out
+    as the chunker would cut the joined document text, with the metadata
+    ChatManager.split_segments gives them.
+    """
+
+    def __init__(self, chunker: Chunker, metadata: dict[str, Any], window: int):
+        self.chunker = chunker
+        self.metadata = metadata
+        self.window = window
+        self.count = 0
+        # Document text from offset _base on, in pieces, and the segments it covers
+        self._parts: list[str] = []
+        self._size = 0
+        self._base = 0
+        self._segments: list[Segment] = []
+        # Offsets of the segments that open a section
+        self._headings: list[int] = []
+        self._heading: Optional[str] = None
+        self._next_cut = window
+
+    def feed(self, segment: Segment) -> list[Document]:
+        """Add the next segment; returns the chunks it completed."""
+        # A segment whose heading differs from the one before opens a section.
+        if segment.heading and segment.heading != self._heading:
+            self._headings.append(segment.start)
+        self._heading = segment.heading
+        text = SEPARATOR + segment.text if self._segments else segment.text
+        self._parts.append(text)
+        self._size += len(text)
+        self._segments.append(segment)
+        if self._size < self._next_cut:
+            return []
+        return self._cut(final=False)
+
+    def finish(self) -> list[Document]:
+        """Chunk the rest of the document."""
+        chunks = self._cut(final=True)
+        CHUNKS_PER_DOCUMENT.observe(self.count)
+        return chunks
+
+    def _cut(self, final: bool) -> list[Document]:
+        text = "".join(self._parts)
+        base = self._base
+        headings = [offset - base for offset in self._headings if offset >= base]
+        if final:
+            spans, resume = self.chunker.split(text, headings), len(text)
+        else:
+            spans, resume = self.chunker.split_prefix(text, headings)
+        starts = [segment.start for segment in self._segments]
+        chunks = []
+        for start, end in spans:
+            chunk_metadata = {**self.metadata, "start": base + start, "end": base + end}
+            first = self._segments[
+                max(bisect.bisect_right(starts, base + start) - 1, 0)
+            ]
+            last = self._segments[max(bisect.bisect_left(starts, base + end) - 1, 0)]
+            if first.page is not None:
+                chunk_metadata["page"] = first.page
+                chunk_metadata["page_end"] = last.page
+            if first.heading:
+                chunk_metadata["heading"] = first.heading
+            chunks.append(
+                Document(page_content=text[start:end], metadata=chunk_metadata)
+            )
+        self.count += len(chunks)
+
+        # Keep the text from where the next chunk starts
+        self._base = base + resume
+        self._parts = [text[resume:]]
+        self._size = len(text) - resume
+        first_kept = max(bisect.bisect_right(starts, self._base) - 1, 0)
+        self._segments = self._segments[first_kept:]
+        self._headings = [offset for offset in self._headings if offset >= self._base]
+        self._next_cut = self._size + self.window
+        return chunks
+
+
 class ChatManager:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model_name="gpt-4-turbo-preview",
+    def __init__(
+        self,
+        llm: Optional[BaseChatModel] = None,
+        document_search: Optional[DocumentSearch] = None,
+        snapshot_generation: Optional[Callable[[], Optional[int]]] = None,
+    ):
+        api_key = require_openai_api_key()
+        self.llm = llm or ChatOpenAI(
+            model_name=CHAT_MODEL,
             temperature=0.7,
-            openai_api_key=OPENAI_API_KEY,
+            openai_api_key=api_key,
+            streaming=True,
         )
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
+        self.embeddings = OpenAIEmbeddings(openai_api_key=api_key)
+        self.chunker = Chunker(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            token_offsets=(
+                load_token_offsets(CHAT_MODEL) if CHUNK_UNIT == "tokens" else None
+            ),
         )
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
@@ -27,47 +166,262 @@ class ChatManager:
         )
         self.vector_store = None
         self.chain = None
+        # In a reader worker, the vector store is reopened whenever this returns
+        # a new snapshot generation, so chat sees what the writer embedded.
+        self.snapshot_generation = snapshot_generation
+        self._loaded_generation: Optional[int] = None
+        self._reload_lock = threading.Lock()
+        # With a search index, retrieval fuses BM25 and vector results.
+        self.retriever: Optional[BaseRetriever] = None
+        if document_search is not None:
+            self.retriever = HybridRetriever(
+                document_search=document_search,
+                get_vector_store=lambda: self.vector_store,
+                k=RETRIEVAL_K,
+                fetch_k=RETRIEVAL_FETCH_K,
+                rerank=RETRIEVAL_RERANK,
+            )
 
-    def initialize_chain(self, documents: List[str]):
+    def initialize_chain(self, documents: list[str]):
         """Initialize the conversation chain with documents."""
         try:
             # Split documents into chunks
-            texts = self.text_splitter.split_documents(documents)
-            
+            texts = self.chunker.create_documents(
+                [doc.page_content for doc in documents],
+                [doc.metadata for doc in documents],
+            )
+
             # Create or update vector store
             self.vector_store = Chroma.from_documents(
                 documents=texts,
-                embedding=self.llm.embeddings,
+                embedding=self.embeddings,
                 persist_directory=str(CACHE_DIR / "chroma"),
             )
-
-            # Create conversation chain
-            self.chain = ConversationalRetrievalChain.from_llm(
-                llm=self.llm,
-                retriever=self.vector_store.as_retriever(),
-                memory=self.memory,
-                return_source_documents=True,
-            )
+            self._build_chain()
         except Exception as e:
             logger.error(f"Error initializing chain: {str(e)}")
             raise
 
-    def get_response(self, message: str) -> Optional[str]:
+    def _build_chain(self):
+        """Create the conversation chain over the current vector store.
+
+        The chain has no memory of its own: each call is given the history of
+        the session it answers for.
+        """
+        self.chain = ConversationalRetrievalChain.from_llm(
+            llm=self.llm,
+            retriever=self._retriever(),
+            return_source_documents=True,
+        )
+
+    def load_vector_store(self, reopen: bool = False):
+        """Open the chunks embedded by an earlier run or by the ingesting worker.
+
+        Chroma shares one client per directory within a process and reads its
+        vector index from disk only when that client starts, so ``reopen``
+        starts a new one. Searches already running finish on the old client.
+        """
+        if self.snapshot_generation is not None:
+            self._loaded_generation = self.snapshot_generation()
+        if reopen:
+            SharedSystemClient.clear_system_cache()
+        vector_store = Chroma(
+            persist_directory=str(CACHE_DIR / "chroma"),
+            embedding_function=self.embeddings,
+        )
+        if vector_store._collection.count():
+            self.vector_store = vector_store
+            self._build_chain()
+
+    def _snapshot_changed(self) -> bool:
+        return (
+            self.snapshot_generation is not None
+            and self.snapshot_generation() != self._loaded_generation
+        )
+
+    def refresh_vector_store(self):
+        """Reopen the vector store if the writer published a snapshot since."""
+        with self._reload_lock:
+            if self._snapshot_changed():
+                self.load_vector_store(reopen=True)
+
+    async def _arefresh_vector_store(self):
+        if self._snapshot_changed():
+            await asyncio.to_thread(self.refresh_vector_store)
+
+    def split_texts(
+        self, texts: list[str], metadatas: list[dict[str, Any]]
+    ) -> list[Document]:
+        """Split texts into chunk documents carrying their metadata."""
+        return self.chunker.create_documents(texts, metadatas)
+
+    def chunk_stream(
+        self, metadata: dict[str, Any], window: int = INGEST_WINDOW_CHARS
+    ) -> ChunkStream:
+        """Start chunking a document whose segments arrive one at a time."""
+        return ChunkStream(self.chunker, metadata, window)
+
+    def split_segments(
+        self, segments: Iterable[Segment], metadata: dict[str, Any]
+    ) -> list[Document]:
+        """Split extracted segments into chunks that record where they came from.
+
+        Chunks are cut from the joined document text, so they can span
+        segments. Each carries its character span, the page it starts and
+        ends on, and the heading in effect where it starts.
+        """
+        stream = self.chunk_stream(metadata)
+        chunks = []
+        for segment in segments:
+            chunks.extend(stream.feed(segment))
+        chunks.extend(stream.finish())
+        return chunks
+
+    async def aadd_chunks(
+        self,
+        chunks: list[Document],
+        doc_id: Optional[str] = None,
+        first_index: int = 0,
+    ):
+        """Embed chunks into the vector store without blocking the event loop.
+
+        With a doc_id the chunks are stored as "{doc_id}-{i}", numbered from
+        ``first_index`` for a document added in batches, so adding a document
+        again, as a retried job does, replaces its chunks.
+        """
+        if not chunks:
+            return
+        try:
+            if self.vector_store is None:
+                self.vector_store = Chroma(
+                    persist_directory=str(CACHE_DIR / "chroma"),
+                    embedding_function=self.embeddings,
+                )
+            # Embed through the async OpenAI client, then hand the vectors to
+            # Chroma in a worker thread so neither step blocks the event loop.
+            contents = [chunk.page_content for chunk in chunks]
+            EMBEDDING_BATCH_SIZE.observe(len(contents))
+            with EMBEDDING_BATCH_SECONDS.time():
+                vectors = await self.embeddings.aembed_documents(contents)
+            with VECTOR_INSERT_SECONDS.time():
+                await asyncio.to_thread(
+                    self.vector_store._collection.upsert,
+                    ids=[
+                        f"{doc_id}-{first_index + i}" if doc_id else str(uuid.uuid4())
+                        for i in range(len(chunks))
+                    ],
+                    embeddings=vectors,
+                    metadatas=[chunk.metadata for chunk in chunks],
+                    documents=contents,
+                )
+            if self.chain is None:
+                self._build_chain()
+        except Exception as e:
+            logger.error(f"Error adding documents: {str(e)}")
+            raise
+
+    async def aadd_texts(self, texts: list[str], metadatas: list[dict[str, Any]]):
+        """Split and embed texts into the vector store without blocking the loop."""
+        chunks = await asyncio.to_thread(self.split_texts, texts, metadatas)
+        await self.aadd_chunks(chunks)
+
+    def _history(
+        self, history: Optional[BaseChatMessageHistory]
+    ) -> BaseChatMessageHistory:
+        """Use the given session history, or the manager's own memory without one."""
+        return history if history is not None else self.memory.chat_memory
+
+    def get_response(
+        self, message: str, history: Optional[BaseChatMessageHistory] = None
+    ) -> Optional[str]:
         """Get AI response for a user message."""
         try:
+            self.refresh_vector_store()
+            if not self.chain:
+                return "Please upload some documents first."
+
+            history = self._history(history)
+            with LLM_RESPONSE_SECONDS.time(mode="blocking"):
+                result = self.chain(
+                    {"question": message, "chat_history": history.messages}
+                )
+            history.add_user_message(message)
+            history.add_ai_message(result["answer"])
+            return result["answer"]
+        except Exception as e:
+            logger.error(f"Error getting response: {str(e)}")
+            return "Sorry, I encountered an error. Please try again."
+
+    async def aget_response(
+        self, message: str, history: Optional[BaseChatMessageHistory] = None
+    ) -> Optional[str]:
+        """Get AI response for a user message using the async LLM client."""
+        try:
+            await self._arefresh_vector_store()
             if not self.chain:
                 return "Please upload some documents first."
 
-            result = self.chain({"question": message})
+            history = self._history(history)
+            with LLM_RESPONSE_SECONDS.time(mode="blocking"):
+                result = await self.chain.ainvoke(
+                    {"question": message, "chat_history": history.messages}
+                )
+            history.add_user_message(message)
+            history.add_ai_message(result["answer"])
             return result["answer"]
         except Exception as e:
             logger.error(f"Error getting response: {str(e)}")
             return "Sorry, I encountered an error. Please try again."
 
-    def clear_history(self):
-        """Clear the conversation history."""
-        self.memory.clear()
-        if self.vector_store:
-            self.vector_store.delete_collection()
-            self.vector_store = None
-        self.chain = None 
\ No newline at end of file
+    def _retriever(self) -> BaseRetriever:
+        if self.retriever is not None:
+            return self.retriever
+        return self.vector_store.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+
+    async def aget_relevant_documents(self, message: str) -> list[Document]:
+        """Retrieve the chunks used as context for a message."""
+        return await self._retriever().ainvoke(message)
+
+    async def astream_response(
+        self, message: str, history: Optional[BaseChatMessageHistory] = None
+    ) -> AsyncIterator[str]:
+        """Yield the AI response token by token as the LLM produces it."""
+        try:
+            await self._arefresh_vector_store()
+        except Exception as e:
+            logger.error(f"Error reopening the vector store: {str(e)}")
+        if self.vector_store is None:
+            yield "Please upload some documents first."
+            return
+
+        try:
+            start = time.perf_counter()
+            history = self._history(history)
+            documents = await self.aget_relevant_documents(message)
+            messages = STREAMING_PROMPT.format_messages(
+                context="\n\n".join(doc.page_content for doc in documents),
+                chat_history=history.messages,
+                question=message,
+            )
+
+            answer = []
+            async for chunk in self.llm.astream(messages):
+                if not chunk.content:
+                    continue
+                if not answer:
+                    first_token = time.perf_counter() - start
+                    LLM_FIRST_TOKEN_SECONDS.observe(first_token)
+                    logger.info(f"Time to first token: {first_token:.3f}s")
+                answer.append(chunk.content)
+                yield chunk.content
+
+            LLM_RESPONSE_SECONDS.observe(time.perf_counter() - start, mode="stream")
+            history.add_user_message(message)
+            history.add_ai_message("".join(answer))
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            yield "Sorry, I encountered an error. Please try again."
+
+    def clear_history(self, history: Optional[BaseChatMessageHistory] = None):
+        """Clear a conversation history; indexed documents are kept."""
+        self._history(history).clear()
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import logging
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from langchain.schema import Document
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.retrievers import BaseRetriever
+
+from ..core.inverted_index import tokenize
+from ..core.metrics import VECTOR_SEARCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]], k: int = 60
+) -> dict[str, float]:
+    """Score each key by the sum of 1 / (k + rank) over the rankings it appears in."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def term_overlap(query_terms: set, text: str) -> float:
+    """Fraction of the distinct query terms that occur in text."""
+    if not query_terms:
+        return 0.0
+    return len(query_terms & set(tokenize(text))) / len(query_terms)
+
+
+def _content_key(doc: Document) -> str:
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class HybridRetriever(BaseRetriever):
+    """Retrieve chunks from both the BM25 index and the vector store.
+
+    Both searches run concurrently and their rankings are merged with
+    reciprocal-rank fusion, so passages with exact identifiers found by BM25
+    make it into the context without over-fetching from the vector store.
+    Lexical passages are the highlighted windows around the matched terms;
+    one contained in a vector chunk of the same document counts as a hit on
+    that chunk. With ``rerank`` set, the fused list is reordered by a blend of
+    the fused score and the fraction of query terms each passage contains.
+    """
+
+    document_search: Any
+    get_vector_store: Callable[[], Any]
+    k: int = 4
+    fetch_k: int = 10
+    rrf_k: int = 60
+    rerank: bool = True
+    rerank_weight: float = 0.5
+    snippet_context: int = 300
+
+    def lexical_search(self, query: str) -> list[Document]:
+        """Passages around the query terms in the best BM25 documents."""
+        passages = []
+        for result in self.document_search.search(
+            query, self.fetch_k, context=self.snippet_context
+        ):
+            for snippet in result["snippets"]:
+                if not snippet["highlights"]:
+                    continue
+                passages.append(
+                    Document(
+                        page_content=snippet["text"],
+                        metadata={
+                            "doc_id": result["doc_id"],
+                            "source": result["metadata"].get("filename"),
+                            "start": snippet["start"],
+                            "end": snippet["end"],
+                        },
+                    )
+                )
+        return passages[: self.fetch_k]
+
+    def vector_search(self, query: str) -> list[Document]:
+        vector_store = self.get_vector_store()
+        if vector_store is None:
+            return []
+        with VECTOR_SEARCH_SECONDS.time():
+            return vector_store.similarity_search(query, k=self.fetch_k)
+
+    async def avector_search(self, query: str) -> list[Document]:
+        vector_store = self.get_vector_store()
+        if vector_store is None:
+            return []
+        with VECTOR_SEARCH_SECONDS.time():
+            return await vector_store.asimilarity_search(query, k=self.fetch_k)
+
+    def fuse(
+        self, query: str, lexical: list[Document], vector: list[Document]
+    ) -> list[Document]:
+        """Merge both result lists with reciprocal-rank fusion and optionally rerank."""
+        documents: dict[str, Document] = {}
+        vector_keys = []
+        for doc in vector:
+            key = _content_key(doc)
+            documents.setdefault(key, doc)
+            vector_keys.append(key)
+
+        lexical_keys = []
+        for passage in lexical:
+            key = None
+            for doc in vector:
+                if (
+                    doc.metadata.get("doc_id") == passage.metadata["doc_id"]
+                    and passage.page_content in doc.page_content
+                ):
+                    key = _content_key(doc)
+                    break
+            if key is None:
+                key = f"{passage.metadata['doc_id']}:{passage.metadata['start']}"
+                documents.setdefault(key, passage)
+            if key not in lexical_keys:
+                lexical_keys.append(key)
+
+        scores = reciprocal_rank_fusion([lexical_keys, vector_keys], self.rrf_k)
+        if self.rerank and scores:
+            top = max(scores.values())
+            query_terms = set(tokenize(query))
+            scores = {
+                key: (1 - self.rerank_weight) * score / top
+                + self.rerank_weight
+                * term_overlap(query_terms, documents[key].page_content)
+                for key, score in scores.items()
+            }
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[: self.k]
+        return [
+            Document(
+                page_content=documents[key].page_content,
+                metadata={**documents[key].metadata, "retrieval_score": scores[key]},
+            )
+            for key in ranked
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            lexical = executor.submit(self.lexical_search, query)
+            vector = executor.submit(self.vector_search, query)
+            return self.fuse(query, lexical.result(), vector.result())
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        lexical, vector = await asyncio.gather(
+            asyncio.to_thread(self.lexical_search, query),
+            self.avector_search(query),
+        )
+        return self.fuse(query, lexical, vector)
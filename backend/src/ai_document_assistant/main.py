@@ -1,26 +1,135 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any
+import asyncio
+import json
+import logging
+import random
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-import os
-import logging
+from typing import Any, Optional
 
-from .core.config import API_TITLE, API_DESCRIPTION, API_VERSION
-from .core.search import DocumentSearch
-from .data_processing.processor import DocumentProcessor
-from .llm.chat import ChatManager
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from .core.components import Components
+from .core.config import (
+    API_DESCRIPTION,
+    API_TITLE,
+    API_VERSION,
+    INGEST_CONCURRENCY,
+    INGEST_EMBED_BATCH,
+    MAX_BATCH_QUERIES,
+    MAX_FILE_SIZE,
+    PARSE_WORKERS,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_REQUEST_MS,
+    SEARCH_SNAPSHOT_INTERVAL,
+    SEARCH_SNAPSHOT_POLL,
+    SESSION_IDLE_SECONDS,
+    SESSION_MAX_IN_MEMORY,
+    SESSION_MEMORY_BYTES,
+    SESSION_RETENTION_SECONDS,
+    WEB_CONCURRENCY,
+    ensure_directories,
+)
+from .core.jobs import JobContext, JobQueue, JobStore
+from .core.locks import FileLock
+from .core.metrics import CACHE_REQUESTS, HTTP_REQUEST_SECONDS, REGISTRY, UPLOAD_BYTES
+from .core.profiling import StackSampler
+from .data_processing.upload import (
+    UnsupportedUploadError,
+    UploadTooLargeError,
+    save_upload,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+storage_dir = Path("storage")
+
+# Heavy components are built on first use; see register_components below.
+components = Components()
+
+# Built on startup, after the index starts loading
+WARM_UP = ["document_search", "document_processor", "chat_manager"]
+READER_WARM_UP = ["document_search", "chat_manager"]
+
+# With several workers, only the one holding this lock ingests and writes the
+# search index; the others search the snapshots it publishes and leave uploads to
+# its job queue.
+writer_lock = FileLock(storage_dir / "writer.lock")
+WRITER = "writer"
+READER = "reader"
+role = WRITER
+
+
+def warm_up_names() -> list[str]:
+    return WARM_UP if role == WRITER else READER_WARM_UP
+
+
+async def publish_snapshots():
+    """Publish the search index for the other workers whenever it has changed."""
+    document_search = await components.aget("document_search")
+    while True:
+        try:
+            await run_in_threadpool(document_search.publish_snapshot)
+        except Exception as e:
+            logger.error(f"Error publishing search snapshot: {str(e)}")
+        await asyncio.sleep(SEARCH_SNAPSHOT_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the job queue and load the index in the background.
+
+    /health answers at once, before the index has loaded.
+    """
+    global role
+    ensure_directories()
+    role = WRITER
+    if WEB_CONCURRENCY > 1 and not writer_lock.try_acquire():
+        role = READER
+    logger.info(f"Starting as the {role} worker")
+    warm_up = asyncio.create_task(components.warm_up(warm_up_names()))
+    tasks = [warm_up]
+    job_queue = None
+    if role == WRITER:
+        job_queue = components.get("job_queue")
+        await job_queue.start()
+        if WEB_CONCURRENCY > 1:
+            tasks.append(asyncio.create_task(publish_snapshots()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if job_queue is not None:
+            await job_queue.stop()
+        if (
+            role == WRITER
+            and WEB_CONCURRENCY > 1
+            and components.is_ready("document_search")
+        ):
+            # Hand the last changes to the readers before the lock goes.
+            await run_in_threadpool(components.get("document_search").publish_snapshot)
+        components.close()
+        writer_lock.release()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -32,84 +141,449 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-storage_dir = Path("storage")
-storage_dir.mkdir(exist_ok=True)
-document_search = DocumentSearch(storage_dir)
-document_processor = DocumentProcessor()
-chat_manager = ChatManager()
+# Room for the multipart boundary and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse uploads declared larger than the limit, before reading the body."""
+    if request.url.path == "/upload":
+        content_length = request.headers.get("content-length")
+        if (
+            content_length
+            and content_length.isdigit()
+            and int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD
+        ):
+            return JSONResponse(status_code=413, content={"detail": "File too large"})
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Time each request by route and, when enabled, profile the slow ones."""
+    sampler = None
+    if PROFILE_SLOW_REQUEST_MS > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000).start()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        # The route template keeps ids out of the label values
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            elapsed,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+        if sampler is not None:
+            sampler.stop()
+            if elapsed * 1000 >= PROFILE_SLOW_REQUEST_MS:
+                await run_in_threadpool(
+                    sampler.dump, PROFILE_DIR, f"{request.method} {request.url.path}"
+                )
+
+
+def load_document_search():
+    from .core.search import DocumentSearch, SnapshotSearch
+
+    if role == READER:
+        return SnapshotSearch(storage_dir, poll_interval=SEARCH_SNAPSHOT_POLL)
+    document_search = DocumentSearch(storage_dir)
+    # Build the postings now rather than on the first search
+    document_search.ensure_index()
+    return document_search
+
+
+def load_document_processor():
+    from .data_processing.document_processor import DocumentProcessor
+
+    return DocumentProcessor()
+
+
+def load_chat_manager():
+    from .llm.chat_manager import ChatManager
+
+    document_search = components.get("document_search")
+    chat_manager = ChatManager(
+        document_search=document_search,
+        # Readers reopen the vectors the writer embedded when it publishes a snapshot.
+        snapshot_generation=(
+            (lambda: document_search.generation) if role == READER else None
+        ),
+    )
+    chat_manager.load_vector_store()
+    return chat_manager
+
+
+def load_session_store():
+    from .core.sessions import SessionStore
+
+    storage_dir.mkdir(exist_ok=True)
+    return SessionStore(
+        storage_dir / "sessions.sqlite3",
+        max_sessions=SESSION_MAX_IN_MEMORY,
+        max_bytes=SESSION_MEMORY_BYTES,
+        idle_seconds=SESSION_IDLE_SECONDS,
+        retention_seconds=SESSION_RETENTION_SECONDS,
+        # Requests of one session can land on any worker.
+        write_through=WEB_CONCURRENCY > 1,
+    )
+
+
+def load_job_queue():
+    storage_dir.mkdir(exist_ok=True)
+    return JobQueue(
+        JobStore(storage_dir / "jobs.sqlite3"),
+        run_ingestion,
+        INGEST_STAGES,
+        concurrency=INGEST_CONCURRENCY,
+    )
+
+
+def register_components():
+    components.register(
+        "document_search", load_document_search, lambda search: search.close()
+    )
+    components.register("document_processor", load_document_processor)
+    components.register("chat_manager", load_chat_manager)
+    components.register(
+        "session_store", load_session_store, lambda store: store.close()
+    )
+    # CPU-bound parsing runs in worker processes so it never holds the event loop
+    # or the GIL.
+    components.register(
+        "parse_executor",
+        lambda: ProcessPoolExecutor(max_workers=PARSE_WORKERS),
+        lambda executor: executor.shutdown(wait=False, cancel_futures=True),
+    )
+    components.register("job_queue", load_job_queue, lambda queue: queue.store.close())
+
+
+INGEST_STAGES = ["parse", "chunk", "embed", "index"]
+
+
+async def run_ingestion(job: dict[str, Any], context: JobContext):
+    """Parse, chunk, embed and index an uploaded file as one stream.
+
+    Extracted segments go straight to the chunker and to the search index's
+    body on disk, and chunks are embedded in batches of INGEST_EMBED_BATCH
+    while the next batch is parsed, so only a few pages of text are held at
+    once however large the file. The document becomes searchable once all
+    of its chunks are embedded.
+    """
+    from .data_processing.extraction import SEPARATOR
+
+    file_path = Path(job["file_path"])
+    metadata = job["metadata"]
+    doc_id = job["id"]
+    document_processor = await components.aget("document_processor")
+    parse_executor = await components.aget("parse_executor")
+    chat_manager = await components.aget("chat_manager")
+    document_search = await components.aget("document_search")
+
+    def batches(writer):
+        # Runs in worker threads, one batch at a time. PDFs hand page ranges
+        # to the parse processes.
+        segments = document_processor.iter_segments(file_path, parse_executor)
+        stream = chat_manager.chunk_stream(
+            {"doc_id": doc_id, "source": job["filename"]}
+        )
+        batch = []
+        for segment in context.timed_iter("parse", segments):
+            with context.timed("index"):
+                writer.write(
+                    SEPARATOR + segment.text if writer.length else segment.text
+                )
+            with context.timed("chunk"):
+                batch.extend(stream.feed(segment))
+            while len(batch) >= INGEST_EMBED_BATCH:
+                yield batch[:INGEST_EMBED_BATCH]
+                batch = batch[INGEST_EMBED_BATCH:]
+        with context.timed("chunk"):
+            batch.extend(stream.finish())
+        for start in range(0, len(batch), INGEST_EMBED_BATCH):
+            yield batch[start : start + INGEST_EMBED_BATCH]
+
+    await context.begin("parse")
+    writer = await run_in_threadpool(document_search.begin_document, doc_id, metadata)
+    chunk_batches = batches(writer)
+    pending = asyncio.ensure_future(run_in_threadpool(next, chunk_batches, None))
+    try:
+        first_index = 0
+        while (batch := await pending) is not None:
+            # Parse the next batch while this one is embedded
+            pending = asyncio.ensure_future(
+                run_in_threadpool(next, chunk_batches, None)
+            )
+            with context.timed("embed"):
+                await chat_manager.aadd_chunks(batch, doc_id, first_index)
+            first_index += len(batch)
+        for stage in ("parse", "chunk", "embed"):
+            await context.complete(stage)
+
+        await context.begin("index")
+        with context.timed("index"):
+            await run_in_threadpool(writer.commit)
+        await context.complete("index")
+    finally:
+        # Let the batch being parsed finish before closing the stream
+        await asyncio.gather(pending, return_exceptions=True)
+        chunk_batches.close()
+        await run_in_threadpool(writer.abort)
+
+
+register_components()
+
 
 class ChatRequest(BaseModel):
     message: str
+    stream: bool = False
+    session_id: Optional[str] = None
+
+
+class ClearRequest(BaseModel):
+    session_id: str
+
 
 class SearchResponse(BaseModel):
-    results: List[Dict[str, Any]]
+    results: list[dict[str, Any]]
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[str]
+    limit: int = 5
 
-@app.post("/upload")
+
+class BatchSearchResponse(BaseModel):
+    results: list[list[dict[str, Any]]]
+    elapsed_ms: float
+    queries_per_second: float
+
+
+@app.post("/upload", status_code=202)
 async def upload_file(file: UploadFile = File(...)):
-    """Handle file upload and processing."""
+    """Save an upload and queue it for ingestion."""
     try:
         # Save the uploaded file
         file_id = str(uuid.uuid4())
         file_path = storage_dir / f"{file_id}_{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        try:
+            stored = await save_upload(file, file_path, file.filename)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e)) from e
+        except UnsupportedUploadError as e:
+            raise HTTPException(status_code=415, detail=str(e)) from e
+        UPLOAD_BYTES.observe(stored.size)
 
-        # Process the document
-        processed_content = document_processor.process_file(file_path)
+        # Skip files that were already indexed
+        document_search = await components.aget("document_search")
+        existing_id = await run_in_threadpool(
+            document_search.find_by_hash, stored.content_hash
+        )
+        CACHE_REQUESTS.inc(
+            cache="upload_hash", result="miss" if existing_id is None else "hit"
+        )
+        if existing_id is not None:
+            await run_in_threadpool(file_path.unlink)
+            return {
+                "message": f"File {file.filename} was already uploaded",
+                "filename": file.filename,
+                "doc_id": existing_id,
+                "duplicate": True,
+            }
 
-        # Index the document for search
-        document_search.index_document(
-            file_id,
-            processed_content,
+        # Parse, chunk, embed and index in the background
+        job_queue = await components.aget("job_queue")
+        job = await job_queue.submit(
+            file.filename,
+            file_path,
             {
                 "filename": file.filename,
                 "file_path": str(file_path),
-                "file_size": len(content),
-            }
+                "file_size": stored.size,
+                "content_type": stored.content_type,
+                "content_hash": stored.content_hash,
+            },
+            job_id=file_id,
+            content_hash=stored.content_hash,
         )
+        if job["id"] != file_id:
+            # The same file is already queued or being ingested
+            await run_in_threadpool(file_path.unlink)
+            return {
+                "message": f"File {file.filename} is already being processed",
+                "filename": file.filename,
+                "doc_id": job["id"],
+                "job_id": job["id"],
+                "status": job["status"],
+                "duplicate": True,
+            }
 
-        return {"message": f"File {file.filename} uploaded and processed successfully", "filename": file.filename}
+        return {
+            "message": f"File {file.filename} uploaded and queued for processing",
+            "filename": file.filename,
+            "doc_id": file_id,
+            "job_id": job["id"],
+            "status": job["status"],
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Report the status, progress and stage timings of an ingestion job."""
+    try:
+        job_queue = await components.aget("job_queue")
+        job = await run_in_threadpool(job_queue.store.get, job_id)
+    except Exception as e:
+        logger.error(f"Error fetching job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+async def stream_chat_events(message: str, session_id: str):
+    """Format streamed tokens as server-sent events, ending with an `end` event."""
+    session_store = await components.aget("session_store")
+    chat_manager = await components.aget("chat_manager")
+    history = await run_in_threadpool(session_store.get, session_id)
+    async for token in chat_manager.astream_response(message, history):
+        yield f"data: {json.dumps(token)}\n\n"
+    await run_in_threadpool(session_store.save, session_id, history)
+    yield f"event: end\ndata: {json.dumps({'session_id': session_id})}\n\n"
+
 
 @app.post("/chat")
 async def chat(request: ChatRequest):
-    """Handle chat messages."""
+    """Handle chat messages, optionally streaming tokens as server-sent events.
+
+    Each session keeps its own history; a request without a session id starts a new one.
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+    if request.stream:
+        return StreamingResponse(
+            stream_chat_events(request.message, session_id),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+                "X-Session-ID": session_id,
+            },
+        )
     try:
-        response = chat_manager.get_response(request.message)
-        return {"response": response}
+        session_store = await components.aget("session_store")
+        chat_manager = await components.aget("chat_manager")
+        history = await run_in_threadpool(session_store.get, session_id)
+        response = await chat_manager.aget_response(request.message, history)
+        await run_in_threadpool(session_store.save, session_id, history)
+        return {"response": response, "session_id": session_id}
     except Exception as e:
         logger.error(f"Error in chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 
 @app.get("/search")
 async def search_documents(query: str, limit: int = 5):
     """Search for documents."""
     try:
-        results = document_search.search(query, limit)
+        document_search = await components.aget("document_search")
+        results = await run_in_threadpool(document_search.search, query, limit)
         return SearchResponse(results=results)
     except Exception as e:
         logger.error(f"Error searching documents: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post("/search/batch")
+async def search_documents_batch(request: BatchSearchRequest):
+    """Run many searches in one request; results are in query order."""
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch"
+        )
+    try:
+        document_search = await components.aget("document_search")
+        start = time.perf_counter()
+        results = await run_in_threadpool(
+            document_search.search_many, request.queries, request.limit
+        )
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        logger.error(f"Error searching documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return BatchSearchResponse(
+        results=results,
+        elapsed_ms=1000 * elapsed,
+        queries_per_second=len(request.queries) / elapsed if elapsed > 0 else 0.0,
+    )
+
+
+@app.get("/documents/{doc_id}")
+async def get_document(doc_id: str):
+    """Fetch the full text of an indexed document."""
+    try:
+        document_search = await components.aget("document_search")
+        document = await run_in_threadpool(document_search.get_document, doc_id)
+    except Exception as e:
+        logger.error(f"Error fetching document {doc_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
+    return document
+
 
 @app.post("/clear")
-async def clear_chat():
-    """Clear chat history."""
+async def clear_chat(request: ClearRequest):
+    """Clear the chat history of one session."""
     try:
-        chat_manager.clear_history()
-        return {"message": "Chat history cleared successfully"}
+        session_store = await components.aget("session_store")
+        await run_in_threadpool(session_store.delete, request.session_id)
+        return {
+            "message": "Chat history cleared successfully",
+            "session_id": request.session_id,
+        }
     except Exception as e:
         logger.error(f"Error clearing chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose metrics in the Prometheus text format.
+
+    The registry lives in this process, so with several workers each one
+    reports only the requests and jobs it handled itself.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
+    """Report liveness, and readiness once the search index and chat components load."""
+    ready = all(components.is_ready(name) for name in warm_up_names())
+    health = {
+        "status": "healthy" if ready else "starting",
+        "ready": ready,
+        "role": role,
+        "components": components.status(),
+    }
+    if role == READER and components.is_ready("document_search"):
+        health["search_generation"] = components.get("document_search").generation
+    return health
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,212 @@
+import asyncio
+import time
+
+from langchain.schema import Document
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from ai_document_assistant.data_processing.extraction import Segment, join_segments
+from ai_document_assistant.llm import chat_manager as chat_manager_module
+from ai_document_assistant.llm.chat_manager import ChatManager
+
+
+def make_manager(response: str, delay: float) -> ChatManager:
+    manager = ChatManager(llm=FakeListChatModel(responses=[response], sleep=delay))
+    manager.vector_store = object()
+
+    async def fake_retrieval(message):
+        return [Document(page_content="The warranty lasts twelve months.")]
+
+    manager.aget_relevant_documents = fake_retrieval
+    return manager
+
+
+async def collect(manager: ChatManager, message: str):
+    start = time.perf_counter()
+    first_token_at = None
+    tokens = []
+    async for token in manager.astream_response(message):
+        if first_token_at is None:
+            first_token_at = time.perf_counter() - start
+        tokens.append(token)
+    return tokens, first_token_at, time.perf_counter() - start
+
+
+def test_stream_response_yields_tokens_incrementally():
+    manager = make_manager("Twelve months.", delay=0.01)
+
+    tokens, first_token_at, total = asyncio.run(
+        collect(manager, "How long is the warranty?")
+    )
+
+    assert "".join(tokens) == "Twelve months."
+    assert len(tokens) > 1
+    assert first_token_at < total / 2
+
+
+def test_stream_response_updates_history():
+    manager = make_manager("Twelve months.", delay=0)
+
+    asyncio.run(collect(manager, "How long is the warranty?"))
+
+    messages = manager.memory.chat_memory.messages
+    assert [m.content for m in messages] == [
+        "How long is the warranty?",
+        "Twelve months.",
+    ]
+
+
+def test_stream_response_without_documents():
+    manager = ChatManager(llm=FakeListChatModel(responses=["unused"]))
+
+    tokens, _, _ = asyncio.run(collect(manager, "Hello"))
+
+    assert tokens == ["Please upload some documents first."]
+
+
+def test_stream_response_uses_given_history():
+    manager = make_manager("Twelve months.", delay=0)
+    history = InMemoryChatMessageHistory()
+
+    async def run():
+        async for _ in manager.astream_response("How long is the warranty?", history):
+            pass
+
+    asyncio.run(run())
+
+    assert [m.content for m in history.messages] == [
+        "How long is the warranty?",
+        "Twelve months.",
+    ]
+    assert manager.memory.chat_memory.messages == []
+
+
+def test_split_segments_records_source_locations():
+    manager = ChatManager(llm=FakeListChatModel(responses=["unused"]))
+    headings = ["Overview"] * 3 + ["Repair"] * 6
+    segments = [
+        Segment(f"Step {page} of the procedure. " * 12, page=page, heading=heading)
+        for page, heading in enumerate(headings, start=1)
+    ]
+    offset = 0
+    for segment in segments:
+        segment.start = offset
+        offset = segment.end + 2
+    text = join_segments(segments)
+
+    chunks = manager.split_segments(segments, {"doc_id": "doc-1"})
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert (
+            text[chunk.metadata["start"] : chunk.metadata["end"]] == chunk.page_content
+        )
+        assert chunk.metadata["doc_id"] == "doc-1"
+        assert chunk.metadata["page"] <= chunk.metadata["page_end"]
+    assert (
+        chunks[0].metadata["page"] == 1 and chunks[0].metadata["heading"] == "Overview"
+    )
+    assert (
+        chunks[-1].metadata["page_end"] == 9
+        and chunks[-1].metadata["heading"] == "Repair"
+    )
+    assert any(chunk.metadata["page"] < chunk.metadata["page_end"] for chunk in chunks)
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.rows = {}
+        self.upserts = 0
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.upserts += 1
+        self.rows.update(zip(ids, documents))
+
+
+def test_add_chunks_replaces_chunks_of_a_retried_document():
+    manager = ChatManager(llm=FakeListChatModel(responses=["unused"]))
+    manager.embeddings = DeterministicFakeEmbedding(size=8)
+    collection = RecordingCollection()
+    manager.vector_store = type("Store", (), {"_collection": collection})()
+    manager.chain = object()
+    chunks = [
+        Document(page_content=f"chunk {i}", metadata={"doc_id": "doc-1"})
+        for i in range(3)
+    ]
+
+    asyncio.run(manager.aadd_chunks(chunks, "doc-1"))
+    asyncio.run(manager.aadd_chunks(chunks, "doc-1"))
+    asyncio.run(manager.aadd_chunks([], "doc-2"))
+
+    assert collection.rows == {
+        "doc-1-0": "chunk 0",
+        "doc-1-1": "chunk 1",
+        "doc-1-2": "chunk 2",
+    }
+    assert collection.upserts == 2
+
+
+def test_reader_reopens_the_vector_store_when_a_snapshot_is_published(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(chat_manager_module, "CACHE_DIR", tmp_path)
+    generation = {"value": None}
+    reader = ChatManager(
+        llm=FakeListChatModel(responses=["Twelve months."]),
+        snapshot_generation=lambda: generation["value"],
+    )
+    reader.embeddings = DeterministicFakeEmbedding(size=8)
+    reader.load_vector_store()
+    assert reader.vector_store is None
+
+    writer = ChatManager(llm=FakeListChatModel(responses=["unused"]))
+    writer.embeddings = reader.embeddings
+    chunks = [
+        Document(page_content="The warranty lasts twelve months.", metadata={"page": 1})
+    ]
+    asyncio.run(writer.aadd_chunks(chunks, "doc-1"))
+
+    tokens, _, _ = asyncio.run(collect(reader, "How long is the warranty?"))
+    assert tokens == ["Please upload some documents first."]
+
+    generation["value"] = 1
+    tokens, _, _ = asyncio.run(collect(reader, "How long is the warranty?"))
+    assert "".join(tokens) == "Twelve months."
+    assert reader.vector_store is not None and reader.chain is not None
+
+
+def test_chunk_stream_matches_splitting_the_whole_document():
+    manager = ChatManager(llm=FakeListChatModel(responses=["unused"]))
+    segments = [
+        Segment(
+            f"Page {page} covers the pump. " * (page % 7 + 3),
+            page=page,
+            heading=f"Part {page // 10}",
+        )
+        for page in range(1, 60)
+    ]
+    offset = 0
+    for segment in segments:
+        segment.start = offset
+        offset = segment.end + 2
+
+    whole = manager.chunk_stream({"doc_id": "doc-1"}, window=10**9)
+    expected = [c for s in segments for c in whole.feed(s)] + whole.finish()
+
+    stream = manager.chunk_stream({"doc_id": "doc-1"}, window=2000)
+    chunks = []
+    held = 0
+    for segment in segments:
+        chunks.extend(stream.feed(segment))
+        held = max(held, stream._size)
+    chunks.extend(stream.finish())
+
+    assert len(chunks) > 10
+    assert [(c.page_content, c.metadata) for c in chunks] == [
+        (c.page_content, c.metadata) for c in expected
+    ]
+    # Held: the window, the segment that filled it, and the unfinished chunk
+    longest = max(len(segment.text) for segment in segments)
+    assert held < 2000 + longest + manager.chunker.chunk_size + 10
+    assert manager.split_segments(iter(segments), {"doc_id": "doc-1"}) == chunks
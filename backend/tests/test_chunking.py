@@ -0,0 +1,162 @@
+import pickle
+import random
+
+import pytest
+from langchain.schema import Document
+
+from ai_document_assistant.data_processing.chunking import (
+    Chunker,
+    approximate_token_offsets,
+)
+
+WORDS = (
+    "the pump seal failed after months of use. Replace the bearing! Check it? "
+    "shaft valve"
+).split()
+
+
+def make_text(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    paragraphs = []
+    for i in range(60):
+        if i % 10 == 0:
+            paragraphs.append(f"## Section {i // 10}")
+        lines = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25)))
+            for _ in range(rng.randint(1, 6))
+        ]
+        paragraphs.append("\n".join(lines))
+    return "\n\n".join(paragraphs)
+
+
+def assert_valid_spans(text, spans, max_size, measure=len):
+    covered = bytearray(len(text))
+    previous_start = -1
+    for start, end in spans:
+        assert previous_start < start < end
+        assert measure(text[start:end]) <= max_size
+        assert not text[start].isspace() and not text[end - 1].isspace()
+        covered[start:end] = b"\1" * (end - start)
+        previous_start = start
+    assert all(covered[i] or text[i].isspace() for i in range(len(text)))
+
+
+def test_chunks_cover_text_within_size():
+    text = make_text()
+    spans = Chunker(chunk_size=300, chunk_overlap=50).split(text)
+
+    assert len(spans) > 10
+    assert_valid_spans(text, spans, 300)
+
+
+def test_chunks_prefer_paragraph_and_sentence_breaks():
+    text = "First paragraph is here.\n\nSecond one follows. It has two sentences."
+    chunker = Chunker(chunk_size=36, chunk_overlap=0)
+
+    assert chunker.split_text(text) == [
+        "First paragraph is here.",
+        "Second one follows.",
+        "It has two sentences.",
+    ]
+
+
+def test_overlap_repeats_the_end_of_the_previous_chunk():
+    text = " ".join(f"word{i}" for i in range(200))
+    spans = Chunker(chunk_size=100, chunk_overlap=30).split(text)
+
+    for (_, previous_end), (start, _) in zip(spans, spans[1:]):
+        assert start < previous_end
+        assert previous_end - start <= 30
+
+
+def test_token_sized_chunks():
+    text = make_text(1)
+    spans = Chunker(
+        chunk_size=64, chunk_overlap=8, token_offsets=approximate_token_offsets
+    ).split(text)
+
+    assert_valid_spans(
+        text, spans, 64, measure=lambda chunk: len(approximate_token_offsets(chunk))
+    )
+
+
+def test_split_on_headings_starts_a_chunk_at_each_heading():
+    text = make_text(2)
+    chunker = Chunker(chunk_size=400, chunk_overlap=50, split_on_headings=True)
+    chunks = chunker.split_text(text)
+
+    assert [chunk for chunk in chunks if "## Section" in chunk] == [
+        chunk for chunk in chunks if chunk.startswith("## Section")
+    ]
+    assert sum(chunk.startswith("## Section") for chunk in chunks) == 6
+
+
+def test_heading_offsets_start_chunks():
+    text = (
+        "Intro text here.\n\nPump\n\nDetails about the pump.\n\n"
+        "Seal\n\nDetails about the seal."
+    )
+    headings = [text.index("Pump"), text.index("Seal")]
+    chunks = Chunker(chunk_size=100, chunk_overlap=20, split_on_headings=True).split(
+        text, headings
+    )
+
+    assert [text[start:end] for start, end in chunks] == [
+        "Intro text here.",
+        "Pump\n\nDetails about the pump.",
+        "Seal\n\nDetails about the seal.",
+    ]
+
+
+def test_long_words_are_cut_and_chunkers_pickle():
+    chunker = pickle.loads(pickle.dumps(Chunker(chunk_size=10, chunk_overlap=3)))
+
+    assert chunker.split_text("abcdefghijklmnopqrstuvwxyz hello") == [
+        "abcdefghij",
+        "klmnopqrst",
+        "uvwxyz",
+        "hello",
+    ]
+    assert chunker.split("   ") == []
+    with pytest.raises(ValueError):
+        Chunker(chunk_size=10, chunk_overlap=10)
+
+
+def test_split_documents_keeps_metadata_and_offsets():
+    text = make_text(3)
+    chunker = Chunker(chunk_size=200, chunk_overlap=40)
+
+    chunks = chunker.split_documents(
+        [Document(page_content=text, metadata={"source": "a.txt"})]
+    )
+
+    assert [chunk.page_content for chunk in chunks] == chunker.split_text(text)
+    for chunk in chunks:
+        assert chunk.metadata["source"] == "a.txt"
+        assert (
+            text[chunk.metadata["start"] : chunk.metadata["end"]] == chunk.page_content
+        )
+
+
+@pytest.mark.parametrize("split_on_headings", [False, True])
+def test_split_prefix_resumes_where_split_would_cut(split_on_headings):
+    text = make_text(seed=3)
+    headings = [i for i in range(len(text)) if text.startswith("\n\n##", i - 2)]
+    chunker = Chunker(
+        chunk_size=300, chunk_overlap=50, split_on_headings=split_on_headings
+    )
+
+    # Split the text as it arrives in pieces, keeping it from each resume point
+    spans = []
+    base = 0
+    for end in list(range(700, len(text), 700)) + [len(text)]:
+        held = text[base:end]
+        held_headings = [offset - base for offset in headings if offset >= base]
+        if end < len(text):
+            prefix, resume = chunker.split_prefix(held, held_headings)
+        else:
+            prefix, resume = chunker.split(held, held_headings), len(held)
+        spans.extend((base + start, base + stop) for start, stop in prefix)
+        base += resume
+
+    assert spans == chunker.split(text, headings)
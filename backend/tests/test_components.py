@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ai_document_assistant.core.components import Components
+
+
+def test_components_are_built_once_on_first_use():
+    calls = []
+    components = Components()
+    components.register("index", lambda: calls.append("index") or {"docs": 3})
+
+    assert calls == [] and not components.is_ready("index")
+
+    def slow_get():
+        time.sleep(0.01)
+        return components.get("index")
+
+    threads = [threading.Thread(target=slow_get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["index"]
+    assert components.get("index") == {"docs": 3}
+    assert components.status()["index"] == {"status": "ready", "error": None}
+
+
+def test_failed_components_report_the_error_and_are_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("OPENAI_API_KEY environment variable is not set")
+        return "chat"
+
+    components = Components()
+    components.register("chat", flaky)
+
+    asyncio.run(components.warm_up(["chat"]))
+    assert components.status()["chat"] == {
+        "status": "failed",
+        "error": "OPENAI_API_KEY environment variable is not set",
+    }
+    assert asyncio.run(components.aget("chat")) == "chat"
+    assert components.is_ready("chat")
+
+
+def test_close_runs_in_reverse_build_order_and_resets():
+    closed = []
+    components = Components()
+    components.register("search", lambda: "search", closed.append)
+    components.register("sessions", lambda: "sessions", closed.append)
+    components.register("unused", lambda: "unused", closed.append)
+
+    components.get("search")
+    components.get("sessions")
+    components.close()
+
+    assert closed == ["sessions", "search"]
+    assert components.status()["search"]["status"] == "pending"
+    with pytest.raises(KeyError):
+        components.get("missing")
@@ -0,0 +1,115 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from docx import Document as DocxDocument
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from ai_document_assistant.data_processing.extraction import (
+    SEPARATOR,
+    extract_segments,
+    iter_segments,
+    join_segments,
+)
+
+
+@pytest.fixture
+def temp_storage():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+def write_pdf(path: Path, pages, bookmarks=()):
+    """Write a PDF with one line of Helvetica text per page."""
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    for text in pages:
+        writer.add_blank_page(width=612, height=792)
+        page = writer.pages[-1]
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+            }
+        )
+    for title, page_index in bookmarks:
+        writer.add_outline_item(title, page_index)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def assert_offsets_match(segments):
+    text = join_segments(segments)
+    for segment in segments:
+        assert text[segment.start : segment.end] == segment.text
+    assert segments[-1].end == len(text)
+
+
+def test_text_segments_follow_paragraphs_and_headings(temp_storage):
+    path = temp_storage / "notes.md"
+    path.write_text(
+        "# Intro\nFirst paragraph.\n\nSecond\nparagraph.\n\n\n## Details\nMore text.\n"
+    )
+
+    segments = extract_segments(path)
+
+    assert [s.text for s in segments] == [
+        "# Intro\nFirst paragraph.",
+        "Second\nparagraph.",
+        "## Details\nMore text.",
+    ]
+    assert [s.heading for s in segments] == ["Intro", "Intro", "Details"]
+    assert segments[1].start == len("# Intro\nFirst paragraph.") + len(SEPARATOR)
+    assert_offsets_match(segments)
+
+
+def test_docx_segments_carry_headings_and_pages(temp_storage):
+    path = temp_storage / "report.docx"
+    doc = DocxDocument()
+    doc.add_heading("Summary", level=1)
+    doc.add_paragraph("The pump failed twice.")
+    doc.add_paragraph("")
+    doc.add_page_break()
+    doc.add_heading("Causes", level=1)
+    doc.add_paragraph("The seal was worn.")
+    doc.save(path)
+
+    segments = extract_segments(path)
+
+    assert [s.text for s in segments] == [
+        "Summary",
+        "The pump failed twice.",
+        "Causes",
+        "The seal was worn.",
+    ]
+    assert [s.heading for s in segments] == ["Summary", "Summary", "Causes", "Causes"]
+    assert [s.page for s in segments] == [1, 1, 2, 2]
+    assert_offsets_match(segments)
+
+
+def test_pdf_pages_are_extracted_in_order_across_workers(temp_storage):
+    path = temp_storage / "manual.pdf"
+    write_pdf(
+        path,
+        [f"Page {i} text" for i in range(1, 8)],
+        bookmarks=[("Setup", 0), ("Repair", 4)],
+    )
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        segments = list(iter_segments(path, executor, pages_per_task=2))
+
+    assert [s.page for s in segments] == list(range(1, 8))
+    assert [s.text for s in segments] == [f"Page {i} text" for i in range(1, 8)]
+    assert [s.heading for s in segments] == ["Setup"] * 4 + ["Repair"] * 3
+    assert [s.text for s in extract_segments(path)] == [s.text for s in segments]
+    assert_offsets_match(segments)
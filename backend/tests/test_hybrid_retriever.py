@@ -0,0 +1,147 @@
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+from langchain.schema import Document
+
+from ai_document_assistant.core.search import DocumentSearch
+from ai_document_assistant.llm.hybrid_retriever import (
+    HybridRetriever,
+    reciprocal_rank_fusion,
+)
+
+
+@pytest.fixture
+def temp_storage():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+class FakeVectorStore:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def similarity_search(self, query, k=4):
+        return self.documents[:k]
+
+    async def asimilarity_search(self, query, k=4):
+        return self.documents[:k]
+
+
+class BarrierVectorStore(FakeVectorStore):
+    """Waits in similarity_search until the lexical search is running too."""
+
+    def __init__(self, documents, barrier):
+        super().__init__(documents)
+        self.barrier = barrier
+
+    def similarity_search(self, query, k=4):
+        self.barrier.wait()
+        return super().similarity_search(query, k)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    scores = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+    assert max(scores, key=scores.get) == "b"
+    assert scores["a"] > scores["d"]
+
+
+def test_identifier_found_by_lexical_side(temp_storage):
+    search = DocumentSearch(temp_storage)
+    search.index_document(
+        "manual",
+        "General maintenance notes. Replace part PN-48213 every year.",
+        {"filename": "manual.txt"},
+    )
+    search.index_document(
+        "other",
+        "General maintenance notes about filters and belts.",
+        {"filename": "other.txt"},
+    )
+    vector_store = FakeVectorStore(
+        [
+            Document(
+                page_content="General maintenance notes about filters and belts.",
+                metadata={"doc_id": "other"},
+            ),
+        ]
+    )
+    retriever = HybridRetriever(
+        document_search=search, get_vector_store=lambda: vector_store, k=2
+    )
+
+    documents = asyncio.run(retriever.ainvoke("When is PN-48213 replaced?"))
+
+    assert "PN-48213" in documents[0].page_content
+    assert documents[0].metadata["doc_id"] == "manual"
+    search.close()
+
+
+def test_lexical_passage_inside_vector_chunk_is_merged(temp_storage):
+    content = "The warranty for model X9 lasts twelve months from delivery."
+    search = DocumentSearch(temp_storage)
+    search.index_document("warranty", content, {"filename": "warranty.txt"})
+    vector_store = FakeVectorStore(
+        [
+            Document(
+                page_content="Shipping takes five days.",
+                metadata={"doc_id": "shipping"},
+            ),
+            Document(page_content=content, metadata={"doc_id": "warranty"}),
+        ]
+    )
+    retriever = HybridRetriever(
+        document_search=search, get_vector_store=lambda: vector_store, rerank=False
+    )
+
+    documents = retriever.invoke("X9 warranty")
+
+    assert [doc.metadata["doc_id"] for doc in documents] == ["warranty", "shipping"]
+    search.close()
+
+
+def test_without_vector_store(temp_storage):
+    search = DocumentSearch(temp_storage)
+    search.index_document(
+        "doc", "Clause 7.2 covers termination.", {"filename": "contract.txt"}
+    )
+    retriever = HybridRetriever(document_search=search, get_vector_store=lambda: None)
+
+    documents = retriever.invoke("clause 7.2")
+
+    assert len(documents) == 1
+    search.close()
+
+
+def test_sync_retrieval_runs_both_searches_concurrently(temp_storage):
+    search = DocumentSearch(temp_storage)
+    search.index_document(
+        "doc", "Clause 7.2 covers termination.", {"filename": "contract.txt"}
+    )
+    barrier = threading.Barrier(2, timeout=5)
+    lexical_search = search.search
+
+    def search_at_barrier(*args, **kwargs):
+        barrier.wait()
+        return lexical_search(*args, **kwargs)
+
+    search.search = search_at_barrier
+    vector_store = BarrierVectorStore(
+        [
+            Document(
+                page_content="Clause 7.2 covers termination.",
+                metadata={"doc_id": "doc"},
+            )
+        ],
+        barrier,
+    )
+    retriever = HybridRetriever(
+        document_search=search, get_vector_store=lambda: vector_store
+    )
+
+    documents = retriever.invoke("clause 7.2")
+
+    assert [doc.page_content for doc in documents] == ["Clause 7.2 covers termination."]
+    search.close()
@@ -0,0 +1,102 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from ai_document_assistant import main
+from ai_document_assistant.core.components import Components
+from ai_document_assistant.core.jobs import JobContext, JobStore
+from ai_document_assistant.core.search import DocumentSearch
+from ai_document_assistant.data_processing.document_processor import (
+    DocumentProcessor,
+)
+from ai_document_assistant.data_processing.extraction import extract_segments
+from ai_document_assistant.llm.chat_manager import ChatManager
+
+
+class RecordingCollection:
+    def __init__(self, fail_after=None):
+        self.rows = {}
+        self.batches = []
+        self.fail_after = fail_after
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            raise RuntimeError("vector store unavailable")
+        self.batches.append(list(ids))
+        self.rows.update(zip(ids, documents))
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    manager = ChatManager(llm=FakeListChatModel(responses=["unused"]))
+    manager.embeddings = DeterministicFakeEmbedding(size=8)
+    manager.chain = object()
+    search = DocumentSearch(tmp_path / "storage")
+    components = Components()
+    components.register("document_processor", DocumentProcessor)
+    components.register("parse_executor", lambda: None)
+    components.register("chat_manager", lambda: manager)
+    components.register("document_search", lambda: search)
+    monkeypatch.setattr(main, "components", components)
+    monkeypatch.setattr(main, "INGEST_EMBED_BATCH", 5)
+    return manager, search
+
+
+def ingest(tmp_path: Path, path: Path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job = store.create(path.name, path, {"filename": path.name}, job_id="doc-1")
+    context = JobContext(store, job, main.INGEST_STAGES)
+    try:
+        asyncio.run(main.run_ingestion(job, context))
+    finally:
+        job = store.get("doc-1")
+        store.close()
+    return job, context
+
+
+def write_manual(tmp_path: Path) -> Path:
+    path = tmp_path / "manual.md"
+    sections = [
+        f"# Part {i}\n\n" + "\n\n".join(f"Step {j} of part {i}. " * 8 for j in range(6))
+        for i in range(8)
+    ]
+    path.write_text("\n\n".join(sections), encoding="utf-8")
+    return path
+
+
+def test_ingestion_streams_chunks_in_batches(tmp_path, pipeline):
+    manager, search = pipeline
+    collection = RecordingCollection()
+    manager.vector_store = type("Store", (), {"_collection": collection})()
+    path = write_manual(tmp_path)
+
+    job, context = ingest(tmp_path, path)
+
+    segments = extract_segments(path)
+    expected = manager.split_segments(segments, {"doc_id": "doc-1"})
+    assert len(collection.batches) > 1
+    assert all(len(batch) <= 5 for batch in collection.batches)
+    assert [i for batch in collection.batches for i in batch] == [
+        f"doc-1-{i}" for i in range(len(expected))
+    ]
+    assert list(collection.rows.values()) == [c.page_content for c in expected]
+    document = search.get_document("doc-1")
+    assert document["content"] == "\n\n".join(s.text for s in segments)
+    assert set(context.timings) == set(main.INGEST_STAGES)
+    assert job["progress"] == 1.0
+
+
+def test_failed_ingestion_indexes_nothing(tmp_path, pipeline):
+    manager, search = pipeline
+    collection = RecordingCollection(fail_after=1)
+    manager.vector_store = type("Store", (), {"_collection": collection})()
+    path = write_manual(tmp_path)
+
+    with pytest.raises(RuntimeError):
+        ingest(tmp_path, path)
+
+    assert search.get_document("doc-1") is None
+    assert not any(p.suffix == ".tmp" for p in (tmp_path / "storage").rglob("*"))
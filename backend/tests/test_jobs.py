@@ -0,0 +1,159 @@
+import asyncio
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.core.jobs import (
+    DONE,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    JobQueue,
+    JobStore,
+)
+
+
+@pytest.fixture
+def temp_storage():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+def test_interrupted_jobs_are_requeued(temp_storage):
+    store = JobStore(temp_storage / "jobs.sqlite3")
+    job = store.create("a.txt", temp_storage / "a.txt", {"filename": "a.txt"})
+    assert job["status"] == QUEUED
+
+    claimed = store.claim_next()
+    assert claimed["id"] == job["id"]
+    assert claimed["status"] == RUNNING
+    assert store.claim_next() is None
+    store.close()
+
+    # A restart finds the job still running and puts it back in the queue.
+    reopened = JobStore(temp_storage / "jobs.sqlite3")
+    assert reopened.requeue_interrupted() == 1
+    assert reopened.get(job["id"])["status"] == QUEUED
+    assert reopened.get(job["id"])["metadata"] == {"filename": "a.txt"}
+
+
+def test_queue_runs_stages_and_records_failures(temp_storage):
+    store = JobStore(temp_storage / "jobs.sqlite3")
+
+    async def handler(job, context):
+        async with context.stage("parse"):
+            await asyncio.sleep(0)
+        async with context.stage("index"):
+            if job["filename"] == "bad.txt":
+                raise ValueError("cannot index")
+
+    async def run():
+        queue = JobQueue(
+            store, handler, ["parse", "index"], concurrency=2, poll_interval=0.01
+        )
+        await queue.start()
+        (temp_storage / "good.txt").write_text("good")
+        (temp_storage / "bad.txt").write_text("bad")
+        good = await queue.submit("good.txt", temp_storage / "good.txt", {})
+        bad = await queue.submit("bad.txt", temp_storage / "bad.txt", {})
+        for _ in range(200):
+            if all(store.get(j["id"])["status"] in (DONE, FAILED) for j in (good, bad)):
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return store.get(good["id"]), store.get(bad["id"])
+
+    good, bad = asyncio.run(run())
+    assert good["status"] == DONE
+    assert good["progress"] == 1.0
+    assert set(good["timings"]) == {"parse", "index"}
+    assert bad["status"] == FAILED
+    assert bad["error"] == "cannot index"
+    assert bad["stage"] == "index"
+    # The upload of the failed job is removed; the indexed one is kept
+    assert (temp_storage / "good.txt").exists()
+    assert not (temp_storage / "bad.txt").exists()
+
+
+def test_submit_during_claim_wakes_a_worker(temp_storage):
+    store = JobStore(temp_storage / "jobs.sqlite3")
+    claim_next = store.claim_next
+    queue = None
+
+    def claim_then_submit():
+        # A submit that lands after this claim found the queue empty
+        job = claim_next()
+        if job is None and not store.get("late"):
+            store.create("late.txt", temp_storage / "late.txt", {}, "late")
+            queue._wakeup.set()
+        return job
+
+    async def handler(job, context):
+        pass
+
+    async def run():
+        nonlocal queue
+        store.claim_next = claim_then_submit
+        queue = JobQueue(store, handler, [], concurrency=1, poll_interval=30)
+        await queue.start()
+        # Well within the poll interval
+        for _ in range(500):
+            job = store.get("late")
+            if job is not None and job["status"] == DONE:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert store.get("late")["status"] == DONE
+
+
+def test_same_upload_queued_twice_runs_once(temp_storage):
+    store = JobStore(temp_storage / "jobs.sqlite3")
+    ran = []
+
+    async def handler(job, context):
+        ran.append(job["id"])
+
+    async def run():
+        queue = JobQueue(store, handler, [], poll_interval=0.01)
+        # Both uploads arrive before a worker picks up the first.
+        first = await queue.submit("a.txt", temp_storage / "1_a.txt", {}, "1", "h")
+        second = await queue.submit("a.txt", temp_storage / "2_a.txt", {}, "2", "h")
+        other = await queue.submit("b.txt", temp_storage / "3_b.txt", {}, "3", "g")
+        assert store.find_active("h")["id"] == "1"
+        await queue.start()
+        for _ in range(200):
+            if store.find_active("h") is None and store.find_active("g") is None:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return first, second, other
+
+    first, second, other = asyncio.run(run())
+    assert second["id"] == first["id"] == "1"
+    assert other["id"] == "3"
+    assert sorted(ran) == ["1", "3"]
+    assert store.get("2") is None
+
+    # Once the job has finished, the index is what catches repeats
+    assert store.create("a.txt", temp_storage / "4_a.txt", {}, "4", "h")["id"] == "4"
+
+
+def test_job_store_adds_content_hash_to_old_databases(temp_storage):
+    path = temp_storage / "jobs.sqlite3"
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "filename TEXT NOT NULL, file_path TEXT NOT NULL, metadata TEXT NOT NULL, "
+            "stage TEXT, progress REAL NOT NULL DEFAULT 0, "
+            "timings TEXT NOT NULL DEFAULT '{}', error TEXT, "
+            "created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+        )
+    conn.close()
+
+    store = JobStore(path)
+    job = store.create("a.txt", temp_storage / "a.txt", {}, content_hash="h")
+    assert store.find_active("h")["id"] == job["id"]
@@ -0,0 +1,84 @@
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.core.metrics import MetricsRegistry
+from ai_document_assistant.core.profiling import StackSampler
+
+
+@pytest.fixture
+def temp_storage():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+def test_counters_render_per_label_set():
+    registry = MetricsRegistry(prefix="test_")
+    requests = registry.counter(
+        "cache_requests_total", "Cache lookups.", ["cache", "result"]
+    )
+
+    requests.inc(cache="sessions", result="hit")
+    requests.inc(2, cache="sessions", result="hit")
+    requests.inc(cache="sessions", result="miss")
+
+    assert requests.value(cache="sessions", result="hit") == 3
+    assert registry.render().splitlines() == [
+        "# HELP test_cache_requests_total Cache lookups.",
+        "# TYPE test_cache_requests_total counter",
+        'test_cache_requests_total{cache="sessions",result="hit"} 3',
+        'test_cache_requests_total{cache="sessions",result="miss"} 1',
+    ]
+    with pytest.raises(ValueError):
+        requests.inc(cache="sessions")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram(
+        "search_seconds", "Search latency.", buckets=[0.1, 1.0]
+    )
+
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    assert latency.count() == 4
+    assert latency.sum() == pytest.approx(3.65)
+    assert registry.render().splitlines()[2:] == [
+        'search_seconds_bucket{le="0.1"} 2',
+        'search_seconds_bucket{le="1"} 3',
+        'search_seconds_bucket{le="+Inf"} 4',
+        "search_seconds_sum 3.65",
+        "search_seconds_count 4",
+    ]
+
+
+def test_histogram_times_blocks_that_raise():
+    registry = MetricsRegistry()
+    latency = registry.histogram("llm_seconds", "LLM latency.", ["mode"])
+
+    with pytest.raises(RuntimeError):
+        with latency.time(mode="stream"):
+            raise RuntimeError("model unavailable")
+
+    assert latency.count(mode="stream") == 1
+    assert latency.count(mode="blocking") == 0
+
+
+def test_stack_sampler_dumps_folded_stacks(temp_storage):
+    def busy_wait(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    sampler = StackSampler(interval=0.001).start()
+    busy_wait(0.1)
+    sampler.stop()
+    path = sampler.dump(temp_storage, "POST /chat")
+
+    assert path.name.endswith("POST_chat.folded")
+    lines = path.read_text().splitlines()
+    assert any("test_metrics.py:busy_wait" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
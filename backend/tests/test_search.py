@@ -1,20 +1,25 @@
-import pytest
-from pathlib import Path
 import tempfile
-import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.core.locks import FileLock
+from ai_document_assistant.core.search import DocumentSearch, SnapshotSearch
 
-from ai_document_assistant.core.search import DocumentSearch
 
 @pytest.fixture
 def temp_storage():
     with tempfile.TemporaryDirectory() as temp_dir:
         yield Path(temp_dir)
 
+
 def test_document_search_initialization(temp_storage):
     search = DocumentSearch(temp_storage)
     assert search.storage_dir == temp_storage
     assert search.index_file == temp_storage / "search_index.json"
 
+
 def test_document_indexing(temp_storage):
     search = DocumentSearch(temp_storage)
     doc_id = "test123"
@@ -29,22 +34,24 @@ def test_document_indexing(temp_storage):
 
     # Verify the document was indexed
     assert doc_id in search.index
-    assert search.index[doc_id]["content"] == content
     assert search.index[doc_id]["metadata"] == metadata
+    assert "content" not in search.index[doc_id]
+    assert search.get_document(doc_id)["content"] == content
+
 
 def test_document_search(temp_storage):
     search = DocumentSearch(temp_storage)
-    
+
     # Index test documents
     search.index_document(
         "doc1",
         "The quick brown fox jumps over the lazy dog",
-        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100}
+        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100},
     )
     search.index_document(
         "doc2",
         "The lazy cat sleeps all day",
-        {"filename": "doc2.txt", "file_path": "/doc2.txt", "file_size": 100}
+        {"filename": "doc2.txt", "file_path": "/doc2.txt", "file_size": 100},
     )
 
     # Test search functionality
@@ -57,16 +64,303 @@ def test_document_search(temp_storage):
     assert len(results) == 1
     assert results[0]["doc_id"] == "doc1"
 
+
 def test_document_deletion(temp_storage):
     search = DocumentSearch(temp_storage)
     doc_id = "test123"
-    
+
     search.index_document(
         doc_id,
         "Test content",
-        {"filename": "test.txt", "file_path": "/test.txt", "file_size": 100}
+        {"filename": "test.txt", "file_path": "/test.txt", "file_size": 100},
     )
-    
+
     assert doc_id in search.index
     search.delete_document(doc_id)
-    assert doc_id not in search.index 
\ No newline at end of file
+    assert doc_id not in search.index
+
+
+def test_search_ranks_by_relevance(temp_storage):
+    search = DocumentSearch(temp_storage)
+
+    search.index_document(
+        "doc1",
+        "Invoices are due in thirty days. Late invoices accrue interest.",
+        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100},
+    )
+    search.index_document(
+        "doc2",
+        "The invoice template lives in the shared drive alongside contracts and "
+        "many other unrelated documents about the quarterly offsite.",
+        {"filename": "doc2.txt", "file_path": "/doc2.txt", "file_size": 100},
+    )
+
+    results = search.search("invoices interest")
+    assert [r["doc_id"] for r in results] == ["doc1"]
+    assert results[0]["score"] > 0
+
+    results = search.search("Invoices", limit=1)
+    assert len(results) == 1
+    assert results[0]["doc_id"] == "doc1"
+
+
+def test_search_index_survives_reload(temp_storage):
+    search = DocumentSearch(temp_storage)
+    search.index_document(
+        "doc1",
+        "Clause 14.2 covers termination",
+        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100},
+    )
+
+    reloaded = DocumentSearch(temp_storage)
+    results = reloaded.search("termination")
+    assert len(results) == 1
+    assert results[0]["doc_id"] == "doc1"
+
+
+def test_deleted_document_is_not_returned(temp_storage):
+    search = DocumentSearch(temp_storage)
+    search.index_document(
+        "doc1",
+        "Reindexed content",
+        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100},
+    )
+    search.index_document(
+        "doc1",
+        "Replacement text",
+        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100},
+    )
+    assert search.search("reindexed") == []
+
+    search.delete_document("doc1")
+    assert search.search("replacement") == []
+    assert search.inverted_index.postings == {}
+
+
+def test_search_returns_highlighted_snippets(temp_storage):
+    search = DocumentSearch(temp_storage)
+    content = "Preamble. " + "filler " * 50 + "The warranty period is twelve months."
+    search.index_document(
+        "doc1",
+        content,
+        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100},
+    )
+
+    result = search.search("warranty")[0]
+    assert "content" not in result
+    snippet = result["snippets"][0]
+    assert "warranty" in snippet["text"]
+    start, end = snippet["highlights"][0]
+    assert content[start:end] == "warranty"
+    assert content[snippet["start"] : snippet["end"]] == snippet["text"]
+
+
+def test_get_document_after_deletion(temp_storage):
+    search = DocumentSearch(temp_storage)
+    search.index_document(
+        "doc1",
+        "Body text",
+        {"filename": "doc1.txt", "file_path": "/doc1.txt", "file_size": 100},
+    )
+    search.delete_document("doc1")
+    assert search.get_document("doc1") is None
+    assert "doc1" not in search.content_store
+
+
+def test_concurrent_indexing_and_search(temp_storage):
+    search = DocumentSearch(temp_storage)
+    errors = []
+
+    def index_documents():
+        try:
+            for i in range(50):
+                search.index_document(
+                    f"doc{i}",
+                    f"shared term and unique{i}",
+                    {
+                        "filename": f"doc{i}.txt",
+                        "file_path": f"/doc{i}.txt",
+                        "file_size": 10,
+                    },
+                )
+        except Exception as e:
+            errors.append(e)
+
+    def run_searches():
+        try:
+            for _ in range(200):
+                search.search("shared")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=index_documents)]
+    threads += [threading.Thread(target=run_searches) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(search.search("shared", limit=100)) == 50
+
+
+def test_search_many_matches_single_searches(temp_storage):
+    search = DocumentSearch(temp_storage)
+    search.index_document(
+        "doc1", "The quick brown fox jumps over the lazy dog", {"filename": "doc1.txt"}
+    )
+    search.index_document(
+        "doc2", "The lazy cat sleeps all day", {"filename": "doc2.txt"}
+    )
+    search.index_document(
+        "doc3", "A brown cat and a brown dog", {"filename": "doc3.txt"}
+    )
+
+    queries = ["lazy", "brown dog", "fox", "missing", "lazy"]
+    batch = search.search_many(queries, limit=2)
+
+    assert len(batch) == len(queries)
+    for query, results in zip(queries, batch):
+        assert results == search.search(query, limit=2)
+    assert batch[3] == []
+
+
+def test_snapshot_search_matches_writer(temp_storage):
+    writer = DocumentSearch(temp_storage)
+    writer.index_document(
+        "doc1",
+        "The quick brown fox jumps over the lazy dog",
+        {"filename": "doc1.txt", "content_hash": "h1"},
+    )
+    writer.index_document(
+        "doc2", "The lazy cat sleeps all day", {"filename": "doc2.txt"}
+    )
+    writer.index_document(
+        "doc3", "A brown cat and a brown dog", {"filename": "doc3.txt"}
+    )
+
+    reader = SnapshotSearch(temp_storage, poll_interval=0)
+    assert reader.generation is None
+    assert reader.search("lazy") == []
+
+    assert writer.publish_snapshot() == 1
+    assert writer.publish_snapshot() is None  # nothing changed
+
+    for query in ["lazy", "brown dog", "fox", "missing"]:
+        expected = writer.search(query, limit=3)
+        results = reader.search(query, limit=3)
+        assert [r["doc_id"] for r in results] == [r["doc_id"] for r in expected]
+        for result, hit in zip(results, expected):
+            assert result["score"] == pytest.approx(hit["score"])
+            assert result["snippets"] == hit["snippets"]
+            assert result["metadata"] == hit["metadata"]
+    assert reader.find_by_hash("h1") == "doc1"
+    assert reader.find_by_hash("h2") is None
+    assert reader.get_document("doc2") == writer.get_document("doc2")
+    assert reader.get_document("missing") is None
+
+
+def test_snapshot_readers_pick_up_new_generations(temp_storage):
+    writer = DocumentSearch(temp_storage)
+    writer.index_document("doc1", "alpha beta", {"filename": "doc1.txt"})
+    writer.publish_snapshot()
+    reader = SnapshotSearch(temp_storage, poll_interval=0)
+    old = reader.snapshot
+
+    writer.index_document("doc2", "alpha gamma", {"filename": "doc2.txt"})
+    writer.delete_document("doc1")
+    writer.publish_snapshot()
+    writer.index_document("doc3", "alpha delta", {"filename": "doc3.txt"})
+    writer.publish_snapshot()
+
+    assert reader.generation == 3
+    assert {r["doc_id"] for r in reader.search("alpha")} == {"doc2", "doc3"}
+    # Only the newest generations are kept; a reader still on an old one keeps working.
+    snapshots = sorted(
+        path.name for path in (temp_storage / "search_snapshots").glob("*.snap")
+    )
+    assert snapshots == ["0000000002.snap", "0000000003.snap"]
+    assert not old.path.exists()
+    assert [doc_id for doc_id, _ in old.top_k_many(["alpha"], 5)[0]] == ["doc1"]
+
+
+def test_indexing_does_not_wait_for_a_snapshot_write(temp_storage, monkeypatch):
+    from ai_document_assistant.core import search as search_module
+
+    writer = DocumentSearch(temp_storage)
+    writer.index_document("doc1", "alpha beta", {"filename": "doc1.txt"})
+    writing = threading.Event()
+    release = threading.Event()
+    real_publish = search_module.publish
+
+    def slow_publish(*args, **kwargs):
+        writing.set()
+        release.wait(5)
+        return real_publish(*args, **kwargs)
+
+    monkeypatch.setattr(search_module, "publish", slow_publish)
+    publisher = threading.Thread(target=writer.publish_snapshot)
+    publisher.start()
+    assert writing.wait(5)
+
+    indexer = threading.Thread(
+        target=writer.index_document,
+        args=("doc2", "alpha gamma", {"filename": "doc2.txt"}),
+    )
+    indexer.start()
+    indexer.join(1)
+    indexed_while_writing = not indexer.is_alive()
+    release.set()
+    publisher.join(5)
+    indexer.join(5)
+
+    assert indexed_while_writing
+    # The snapshot holds the index as copied; the later change is published next.
+    reader = SnapshotSearch(temp_storage, poll_interval=0)
+    assert [r["doc_id"] for r in reader.search("alpha")] == ["doc1"]
+    assert writer.publish_snapshot() == 2
+    assert writer.publish_snapshot() is None
+    assert {r["doc_id"] for r in reader.search("alpha")} == {"doc1", "doc2"}
+
+
+def test_snapshot_survives_writer_restart(temp_storage):
+    writer = DocumentSearch(temp_storage)
+    writer.index_document("doc1", "persistent words", {"filename": "doc1.txt"})
+    writer.publish_snapshot()
+    writer.close()
+
+    reader = SnapshotSearch(temp_storage)
+    assert [r["doc_id"] for r in reader.search("persistent")] == ["doc1"]
+
+
+def test_only_one_process_holds_the_writer_lock(temp_storage):
+    first = FileLock(temp_storage / "writer.lock")
+    second = FileLock(temp_storage / "writer.lock")
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def test_documents_can_be_indexed_as_they_stream(temp_storage):
+    search = DocumentSearch(temp_storage)
+    pieces = ["Pump manual.", "\n\n", "Replace the seal ", "every year."]
+
+    writer = search.begin_document("doc1", {"filename": "manual.txt"})
+    for piece in pieces:
+        writer.write(piece)
+    assert search.search("seal") == []
+    writer.commit()
+    writer.abort()  # no-op once committed
+
+    assert search.get_document("doc1")["content"] == "".join(pieces)
+    assert search.search("seal")[0]["doc_id"] == "doc1"
+    assert search.index["doc1"]["length"] == len("".join(pieces))
+
+    # An aborted rewrite leaves the stored document as it was
+    writer = search.begin_document("doc1", {"filename": "manual.txt"})
+    writer.write("Nothing about pumps")
+    writer.abort()
+    assert search.get_document("doc1")["content"] == "".join(pieces)
+    assert not any(path.suffix == ".tmp" for path in temp_storage.rglob("*"))
@@ -0,0 +1,85 @@
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.core.search import DocumentSearch
+from ai_document_assistant.core.segment_store import SegmentStore
+
+
+@pytest.fixture
+def temp_storage():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+def test_put_get_delete_survive_reopen(temp_storage):
+    store = SegmentStore(temp_storage)
+    store.put("a", b"first")
+    store.put("b", b"second")
+    store.put("a", b"updated")
+    assert store.delete("b")
+    assert not store.delete("missing")
+    store.close()
+
+    reopened = SegmentStore(temp_storage)
+    assert reopened.get("a") == b"updated"
+    assert reopened.get("b") is None
+    assert reopened.keys() == ["a"]
+    reopened.close()
+
+
+def test_torn_tail_is_truncated(temp_storage):
+    store = SegmentStore(temp_storage)
+    store.put("a", b"kept")
+    store.put("b", b"torn")
+    segment = store._active.path
+    store.close()
+
+    # Simulate a crash in the middle of the last append.
+    data = segment.read_bytes()
+    segment.write_bytes(data[:-2])
+
+    reopened = SegmentStore(temp_storage)
+    assert reopened.get("a") == b"kept"
+    assert "b" not in reopened
+    reopened.put("c", b"after recovery")
+    reopened.close()
+
+    assert SegmentStore(temp_storage).get("c") == b"after recovery"
+
+
+def test_rotation_and_compaction_keep_live_records(temp_storage):
+    store = SegmentStore(
+        temp_storage, max_segment_bytes=64, min_compaction_bytes=1 << 30
+    )
+    for i in range(20):
+        store.put(f"doc{i}", f"value {i}".encode())
+    for i in range(0, 20, 2):
+        store.delete(f"doc{i}")
+    assert len(list(temp_storage.glob("*.log"))) > 1
+
+    store.compact()
+    assert len(list(temp_storage.glob("*.log"))) == 2
+    assert store.get("doc3") == b"value 3"
+    store.close()
+
+    reopened = SegmentStore(temp_storage)
+    assert sorted(reopened.keys()) == sorted(f"doc{i}" for i in range(1, 20, 2))
+    reopened.close()
+
+
+def test_legacy_json_index_is_migrated(temp_storage):
+    legacy = {
+        "doc1": {
+            "content": "Legacy contract text",
+            "metadata": {"filename": "doc1.txt"},
+            "indexed_at": "2024-01-01T00:00:00",
+        }
+    }
+    (temp_storage / "search_index.json").write_text(json.dumps(legacy))
+
+    search = DocumentSearch(temp_storage)
+    assert not (temp_storage / "search_index.json").exists()
+    assert search.search("contract")[0]["doc_id"] == "doc1"
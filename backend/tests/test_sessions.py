@@ -0,0 +1,92 @@
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.core.sessions import SessionStore
+
+
+@pytest.fixture
+def temp_storage():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+def add_turn(store: SessionStore, session_id: str, question: str, answer: str):
+    history = store.get(session_id)
+    history.add_user_message(question)
+    history.add_ai_message(answer)
+    store.save(session_id, history)
+
+
+def test_sessions_are_isolated(temp_storage):
+    store = SessionStore(temp_storage / "sessions.sqlite3")
+    add_turn(store, "a", "Hi from a", "Hello a")
+    add_turn(store, "b", "Hi from b", "Hello b")
+
+    assert [m.content for m in store.get("a").messages] == ["Hi from a", "Hello a"]
+    assert [m.content for m in store.get("b").messages] == ["Hi from b", "Hello b"]
+    store.close()
+
+
+def test_least_recently_used_sessions_spill_to_disk(temp_storage):
+    store = SessionStore(temp_storage / "sessions.sqlite3", max_sessions=2)
+    add_turn(store, "a", "question a", "answer a")
+    add_turn(store, "b", "question b", "answer b")
+    store.get("a")
+    add_turn(store, "c", "question c", "answer c")
+
+    stats = store.stats()
+    assert stats["in_memory"] == 2
+    assert stats["on_disk"] == 1
+
+    # The spilled session comes back intact on its next request
+    assert [m.content for m in store.get("b").messages] == ["question b", "answer b"]
+    store.close()
+
+
+def test_memory_cap_and_idle_timeout(temp_storage):
+    store = SessionStore(
+        temp_storage / "sessions.sqlite3", max_bytes=1000, idle_seconds=0.05
+    )
+    add_turn(store, "a", "x" * 600, "y")
+    add_turn(store, "b", "x" * 600, "y")
+    assert store.stats()["in_memory"] == 1
+
+    time.sleep(0.1)
+    add_turn(store, "c", "short", "reply")
+    assert store.stats()["in_memory"] == 1
+    assert store.stats()["in_memory_bytes"] < 1000
+    store.close()
+
+
+def test_sessions_survive_restart_and_delete(temp_storage):
+    store = SessionStore(temp_storage / "sessions.sqlite3")
+    add_turn(store, "a", "question", "answer")
+    store.close()
+
+    store = SessionStore(temp_storage / "sessions.sqlite3")
+    assert len(store.get("a").messages) == 2
+    assert store.delete("a")
+    assert store.get("a").messages == []
+    store.close()
+
+
+def test_write_through_sessions_are_shared_between_stores(temp_storage):
+    first = SessionStore(temp_storage / "sessions.sqlite3", write_through=True)
+    second = SessionStore(temp_storage / "sessions.sqlite3", write_through=True)
+    add_turn(first, "a", "question 1", "answer 1")
+    add_turn(second, "a", "question 2", "answer 2")
+
+    assert [m.content for m in first.get("a").messages] == [
+        "question 1",
+        "answer 1",
+        "question 2",
+        "answer 2",
+    ]
+    assert first.stats() == {"in_memory": 0, "in_memory_bytes": 0, "on_disk": 1}
+    assert second.delete("a")
+    assert first.get("a").messages == []
+    first.close()
+    second.close()
@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+import io
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.data_processing.upload import (
+    UnsupportedUploadError,
+    UploadTooLargeError,
+    save_upload,
+    sniff_content_type,
+)
+
+
+class FakeUpload:
+    def __init__(self, data: bytes):
+        self.stream = io.BytesIO(data)
+        self.reads = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads += 1
+        return self.stream.read(size)
+
+
+@pytest.fixture
+def temp_storage():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+def test_sniff_content_type():
+    assert sniff_content_type(b"%PDF-1.7\n...", "report.pdf") == "application/pdf"
+    assert sniff_content_type(b"# Title\n", "notes.md") == "text/markdown"
+    assert sniff_content_type("café".encode(), "menu.txt") == "text/plain"
+    # Content and extension disagree
+    assert sniff_content_type(b"%PDF-1.7\n...", "report.txt") is None
+    assert sniff_content_type(b"\x00\x01binary", "data.txt") is None
+
+
+def test_save_upload_streams_and_hashes(temp_storage):
+    data = b"line of text\n" * 10000
+    upload = FakeUpload(data)
+    target = temp_storage / "doc.txt"
+
+    stored = asyncio.run(save_upload(upload, target, "doc.txt", chunk_size=4096))
+
+    assert target.read_bytes() == data
+    assert stored.size == len(data)
+    assert stored.content_hash == hashlib.sha256(data).hexdigest()
+    assert stored.content_type == "text/plain"
+    assert upload.reads > 1
+
+
+def test_save_upload_aborts_when_too_large(temp_storage):
+    upload = FakeUpload(b"x" * 100000)
+    target = temp_storage / "big.txt"
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(
+            save_upload(upload, target, "big.txt", max_size=10000, chunk_size=4096)
+        )
+
+    assert upload.reads <= 3
+    assert list(temp_storage.iterdir()) == []
+
+
+def test_save_upload_rejects_unsupported_content(temp_storage):
+    with pytest.raises(UnsupportedUploadError):
+        asyncio.run(
+            save_upload(FakeUpload(b"PK\x03\x04zip"), temp_storage / "a.txt", "a.txt")
+        )
+    assert list(temp_storage.iterdir()) == []
@@ -0,0 +1,104 @@
+"""Recall@k and queries per second of IVF search against exact search.
+
+Vectors are drawn around random cluster centres, and queries are noisy
+copies of stored vectors. Exact search over the memory-mapped matrix gives
+the ground truth; IVF search is then measured at several nprobe values.
+
+Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/bench_vector_index.py --rows 200000 --dim 384
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain.schema import Document
+
+from ai_document_assistant.data_processing.vector_backends import NumpyBackend
+
+
+def make_vectors(rows: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    return centres[labels] + 0.6 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+
+def run_queries(backend: NumpyBackend, queries: np.ndarray, k: int, **search_kwargs):
+    """Search one query at a time, as similarity_search does."""
+    start = time.perf_counter()
+    results = [backend.search([query], k=k, **search_kwargs)[0] for query in queries]
+    elapsed = time.perf_counter() - start
+    ids = [{doc.metadata["row"] for doc, _ in hits} for hits in results]
+    return ids, len(queries) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = make_vectors(args.rows, args.dim, args.clusters, rng)
+    picks = rng.choice(args.rows, args.queries, replace=False)
+    queries = vectors[picks] + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        backend = NumpyBackend(
+            Path(temp_dir), dtype=args.dtype, ann=True, nlist=args.nlist, ann_min_rows=args.rows + 1
+        )
+        start = time.perf_counter()
+        for offset in range(0, args.rows, 10_000):
+            batch = vectors[offset : offset + 10_000]
+            backend.add(
+                [
+                    Document(page_content="", metadata={"row": offset + i})
+                    for i in range(len(batch))
+                ],
+                batch,
+            )
+        backend.persist()
+        print(
+            f"Stored {args.rows} x {args.dim} {args.dtype} vectors "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        truth, exact_qps = run_queries(backend, queries, args.k, exact=True)
+        print(f"{'exact':<12} recall@{args.k}=1.000  {exact_qps:9.1f} QPS")
+        start = time.perf_counter()
+        backend.search(queries, k=args.k, exact=True)
+        batch_qps = len(queries) / (time.perf_counter() - start)
+        print(
+            f"{'exact batch':<12} recall@{args.k}=1.000  {batch_qps:9.1f} QPS  "
+            f"({batch_qps / exact_qps:.1f}x exact)"
+        )
+
+        start = time.perf_counter()
+        backend.rebuild_index()
+        print(
+            f"Built IVF index with {backend._ivf.nlist} clusters "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        for nprobe in args.nprobe:
+            found, qps = run_queries(backend, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            print(
+                f"{'nprobe=' + str(nprobe):<12} recall@{args.k}={recall:.3f}  {qps:9.1f} QPS  "
+                f"({qps / exact_qps:.1f}x exact)"
+            )
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
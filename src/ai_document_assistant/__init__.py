@@ -2,10 +2,27 @@
 
 __version__ = "0.1.0"
 
-from .core.config import settings
-from .data_processing import DocumentProcessor, VectorStore
-from .chat import ChatManager
-from .ui import main, start, process_file, setup_agent
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core.config import settings
+    from .data_processing import DocumentProcessor, VectorStore
+    from .chat import ChatManager
+    from .ui import main, start, process_file, setup_agent
+
+# Exports are imported on first access, so importing the package, or one of
+# its light modules, does not load LangChain, Chroma, NumPy or Chainlit.
+_LAZY_EXPORTS = {
+    "settings": ".core.config",
+    "DocumentProcessor": ".data_processing",
+    "VectorStore": ".data_processing",
+    "ChatManager": ".chat",
+    "main": ".ui",
+    "start": ".ui",
+    "process_file": ".ui",
+    "setup_agent": ".ui",
+}
 
 __all__ = [
     "settings",
@@ -16,4 +33,27 @@ __all__ = [
     "start",
     "process_file",
     "setup_agent",
-] 
\ No newline at end of file
+]
+
+
+def __getattr__(name: str):
+    """Import an export on first access.
+
+    Args:
+        name: Attribute name
+
+    Returns:
+        The exported object
+
+    Raises:
+        AttributeError: If the name is not an export
+    """
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,246 @@
+"""Answer cache for repeated questions about the same documents."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and collapse its whitespace.
+
+    Args:
+        question: User's question
+
+    Returns:
+        Normalized question
+    """
+    return " ".join(question.lower().split())
+
+
+@dataclass
+class _Entry:
+    answer: str
+    chunk_ids: FrozenSet[str]
+    embedding: Optional[np.ndarray]
+    generation: Optional[int]
+    expires_at: float
+
+
+class AnswerCache:
+    """Two-level answer cache with TTL and LRU bounds.
+
+    The exact level keys on the normalized question, the hash of the
+    retrieved chunk ids and the conversation history the answer was given
+    in. The similarity level matches a new question's embedding against
+    cached ones and accepts the best match above ``similarity_threshold``,
+    which lets a hit skip retrieval as well as the LLM call; since nothing
+    then checks what retrieval would return, it only matches entries cached
+    at the current vector store generation. Entries are dropped when any
+    chunk they were answered from is deleted or re-indexed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.95,
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used are evicted
+            ttl_seconds: Lifetime of an entry
+            similarity_threshold: Minimum cosine similarity for a similarity hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._keys_by_chunk: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._matrix_generation: Optional[int] = None
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(question: str, chunk_ids: Iterable[str], history: str = "") -> str:
+        """Key of the exact level.
+
+        Args:
+            question: User's question
+            chunk_ids: IDs of the chunks retrieved for it
+            history: Conversation history the question was asked in
+
+        Returns:
+            Hex digest of the normalized question, sorted chunk ids and history
+        """
+        digest = hashlib.sha256(normalize_question(question).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update("\0".join(sorted(chunk_ids)).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(hashlib.sha256(history.encode("utf-8")).digest())
+        return digest.hexdigest()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for chunk_id in entry.chunk_ids:
+            keys = self._keys_by_chunk.get(chunk_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_chunk[chunk_id]
+        if entry.embedding is not None:
+            self._matrix = None
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_exact(
+        self, question: str, chunk_ids: Iterable[str], history: str = ""
+    ) -> Optional[str]:
+        """Look up an answer for this question over exactly these chunks.
+
+        Args:
+            question: User's question
+            chunk_ids: IDs of the chunks retrieved for it
+            history: Conversation history the question is asked in
+
+        Returns:
+            Cached answer, or None on a miss
+        """
+        with self._lock:
+            entry = self._live_entry(self.make_key(question, chunk_ids, history))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.exact_hits += 1
+            return entry.answer
+
+    def get_similar(
+        self, embedding: Sequence[float], generation: Optional[int] = None
+    ) -> Optional[str]:
+        """Look up the answer to the most similar cached question.
+
+        Args:
+            embedding: Embedding of the new question
+            generation: Current vector store generation; only answers cached
+                at this generation match
+
+        Returns:
+            Cached answer if the best match clears the threshold, else None
+        """
+        query = _unit(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix_generation != generation:
+                self._matrix_keys = [
+                    k
+                    for k, e in self._entries.items()
+                    if e.embedding is not None and e.generation == generation
+                ]
+                self._matrix = (
+                    np.stack([self._entries[k].embedding for k in self._matrix_keys])
+                    if self._matrix_keys
+                    else None
+                )
+                self._matrix_generation = generation
+            if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                return None
+
+            scores = self._matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            entry = self._live_entry(self._matrix_keys[best])
+            if entry is None:
+                return None
+            self.similar_hits += 1
+            return entry.answer
+
+    def put(
+        self,
+        question: str,
+        chunk_ids: Iterable[str],
+        answer: str,
+        embedding: Optional[Sequence[float]] = None,
+        history: str = "",
+        generation: Optional[int] = None,
+    ) -> None:
+        """Cache an answer.
+
+        Args:
+            question: User's question
+            chunk_ids: IDs of the chunks the answer was generated from
+            answer: Generated answer
+            embedding: Optional question embedding for the similarity level
+            history: Conversation history the question was asked in
+            generation: Vector store generation the chunks were retrieved at
+        """
+        chunk_ids = frozenset(chunk_ids)
+        key = self.make_key(question, chunk_ids, history)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(
+                answer=answer,
+                chunk_ids=chunk_ids,
+                embedding=_unit(embedding) if embedding is not None else None,
+                generation=generation,
+                expires_at=time.monotonic() + self.ttl_seconds,
+            )
+            for chunk_id in chunk_ids:
+                self._keys_by_chunk.setdefault(chunk_id, set()).add(key)
+            if embedding is not None:
+                self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_chunks(self, chunk_ids: Optional[Iterable[str]]) -> None:
+        """Drop every answer generated from any of the given chunks.
+
+        Args:
+            chunk_ids: Deleted or re-indexed chunk IDs; None clears the cache
+        """
+        with self._lock:
+            if chunk_ids is None:
+                self._entries.clear()
+                self._keys_by_chunk.clear()
+                self._matrix = None
+                return
+            for chunk_id in chunk_ids:
+                for key in list(self._keys_by_chunk.get(chunk_id, ())):
+                    self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters.
+
+        Returns:
+            Counters and the current number of entries
+        """
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
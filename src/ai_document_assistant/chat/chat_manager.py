@@ -1,36 +1,76 @@
 """Chat manager module for handling conversations with the AI."""
-from typing import List, Optional
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
 
 from langchain.chat_models import ChatOpenAI
+from langchain.chat_models.base import BaseChatModel
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import Document
 
 from ..core.config import settings
+from ..data_processing.embedding_cache import content_hash
 from ..data_processing.vector_store import VectorStore
 from ..utils.helpers import logger
+from .answer_cache import AnswerCache
+from .context_builder import ContextBuilder, load_token_counter
+
+
+@dataclass
+class _Lookup:
+    """Result of looking a question up in the answer cache."""
+
+    answer: Optional[str]
+    documents: List[Document]
+    chunk_ids: List[str]
+    history: str
+    embedding: Optional[List[float]] = None
+    generation: Optional[int] = None
 
 
 class ChatManager:
     """Manages chat interactions with the AI."""
     
-    def __init__(self, vector_store: VectorStore):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        llm: Optional[BaseChatModel] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        cache_answers: bool = True,
+        context_builder: Optional[ContextBuilder] = None,
+    ):
         """Initialize the chat manager.
         
         Args:
             vector_store: Vector store for document retrieval
+            llm: Chat model to use; defaults to ChatOpenAI from settings
+            answer_cache: Answer cache to use; defaults to a new AnswerCache
+            cache_answers: Whether to cache answers at all
+            context_builder: Token budgeting for context and history; defaults to
+                one sized from settings
         """
         self.vector_store = vector_store
-        self.llm = ChatOpenAI(
+        self.answer_cache = (answer_cache or AnswerCache()) if cache_answers else None
+        if self.answer_cache is not None:
+            vector_store.add_change_listener(self.answer_cache.invalidate_chunks)
+        self.llm = llm or ChatOpenAI(
             model_name=settings.MODEL_NAME,
             temperature=settings.TEMPERATURE,
             max_tokens=settings.MAX_TOKENS,
+            streaming=True,
         )
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
             return_messages=True,
             max_history_length=settings.MAX_HISTORY_LENGTH,
         )
+        self.context_builder = context_builder or ContextBuilder(
+            count_tokens=load_token_counter(settings.MODEL_NAME),
+            max_history_messages=settings.MAX_HISTORY_LENGTH,
+        )
+        self.history_summary = ""
         
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a helpful AI assistant that answers questions about documents.
@@ -60,19 +100,106 @@ class ChatManager:
     def format_context(self, documents: List[Document]) -> str:
         """Format documents into context string.
         
+        Duplicate and overlapping chunks are trimmed, and chunks are kept in
+        relevance order until the context token budget is full.
+        
         Args:
-            documents: List of documents
+            documents: List of documents, most relevant first
             
         Returns:
             Formatted context string
         """
         context = []
-        for doc in documents:
+        for doc in self.context_builder.select_documents(documents):
             content = doc.page_content
             source = doc.metadata.get("source", "Unknown")
             context.append(f"From {source}:\n{content}")
         return "\n\n".join(context)
     
+    @staticmethod
+    def chunk_ids(documents: List[Document]) -> List[str]:
+        """Identify retrieved chunks by ID, or by content hash when they have none.
+        
+        The vector store records each chunk's ID in its ``chunk_id`` metadata,
+        which is what it reports when chunks are replaced or deleted.
+        
+        Args:
+            documents: Retrieved documents
+            
+        Returns:
+            One identifier per document
+        """
+        return [
+            doc.metadata.get("chunk_id") or content_hash(doc.page_content)
+            for doc in documents
+        ]
+    
+    def format_history(self) -> str:
+        """Format the rolling summary and recent messages within the history budget.
+        
+        Returns:
+            Chat history string for the prompt
+        """
+        return self.context_builder.format_history(
+            self.history_summary, self.memory.chat_memory.messages
+        )
+    
+    def _remember(self, question: str, answer: str) -> None:
+        """Add a turn to memory and fold messages past the window into the summary.
+        
+        Args:
+            question: User's question
+            answer: AI's response
+        """
+        chat_memory = self.memory.chat_memory
+        chat_memory.add_user_message(question)
+        chat_memory.add_ai_message(answer)
+        folded, kept = self.context_builder.split_history(chat_memory.messages)
+        if folded:
+            self.history_summary = self.context_builder.fold_summary(
+                self.history_summary, folded
+            )
+            chat_memory.messages = kept
+    
+    def _lookup(self, question: str) -> _Lookup:
+        """Find a cached answer, retrieving context only when the similarity level misses.
+        
+        The similarity level is only consulted at the start of a conversation:
+        a follow-up question means something different in each conversation.
+        
+        Args:
+            question: User's question
+            
+        Returns:
+            The cached answer or None, with what is needed to generate and cache one
+        """
+        history = self.format_history()
+        generation = self.vector_store.generation
+        embedding = None
+        if self.answer_cache is not None and not history:
+            embedding = self.vector_store.embeddings.embed_query(question)
+            answer = self.answer_cache.get_similar(embedding, generation)
+            if answer is not None:
+                return _Lookup(answer, [], [], history, embedding, generation)
+        
+        documents = self.get_relevant_documents(question)
+        chunk_ids = self.chunk_ids(documents)
+        answer = None
+        if self.answer_cache is not None:
+            answer = self.answer_cache.get_exact(question, chunk_ids, history)
+        return _Lookup(answer, documents, chunk_ids, history, embedding, generation)
+    
+    def _cache_answer(self, question: str, lookup: _Lookup, answer: str) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                question,
+                lookup.chunk_ids,
+                answer,
+                lookup.embedding,
+                history=lookup.history,
+                generation=lookup.generation,
+            )
+    
     def get_response(self, question: str) -> str:
         """Get AI response to user question.
         
@@ -83,29 +210,78 @@ class ChatManager:
             AI's response
         """
         try:
-            # Get relevant documents
-            documents = self.get_relevant_documents(question)
-            context = self.format_context(documents)
+            # Get a cached answer or the relevant documents
+            lookup = self._lookup(question)
+            answer = lookup.answer
+            
+            if answer is None:
+                context = self.format_context(lookup.documents)
+                
+                # Generate response
+                chain = self.prompt | self.llm
+                response = chain.invoke({
+                    "context": context,
+                    "chat_history": lookup.history,
+                    "question": question,
+                })
+                answer = response.content
+                self._cache_answer(question, lookup, answer)
+            
+            # Update memory
+            self._remember(question, answer)
+            
+            return answer
+            
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            raise
+    
+    async def astream_response(self, question: str) -> AsyncIterator[str]:
+        """Stream the AI response to a user question token by token.
+        
+        Args:
+            question: User's question
+            
+        Yields:
+            Response tokens as the LLM produces them
+        """
+        try:
+            start = time.perf_counter()
+            # Cache lookup and retrieval are synchronous, so keep them off the event loop
+            lookup = await asyncio.to_thread(self._lookup, question)
+            if lookup.answer is not None:
+                yield lookup.answer
+                self._remember(question, lookup.answer)
+                return
+            
+            context = self.format_context(lookup.documents)
             
-            # Generate response
             chain = self.prompt | self.llm
-            response = chain.invoke({
+            answer = []
+            async for chunk in chain.astream({
                 "context": context,
-                "chat_history": self.memory.chat_memory.messages,
+                "chat_history": lookup.history,
                 "question": question,
-            })
+            }):
+                if not chunk.content:
+                    continue
+                if not answer:
+                    logger.info(f"Time to first token: {time.perf_counter() - start:.3f}s")
+                answer.append(chunk.content)
+                yield chunk.content
             
-            # Update memory
-            self.memory.chat_memory.add_user_message(question)
-            self.memory.chat_memory.add_ai_message(response.content)
+            answer = "".join(answer)
+            self._cache_answer(question, lookup, answer)
             
-            return response.content
+            # Update memory
+            self._remember(question, answer)
             
         except Exception as e:
-            logger.error(f"Error generating response: {str(e)}")
+            logger.error(f"Error streaming response: {str(e)}")
             raise
     
     def clear_history(self) -> None:
         """Clear chat history."""
         self.memory.clear()
+        self.history_summary = ""
         logger.info("Cleared chat history") 
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""Token-budgeted assembly of retrieved context and chat history."""
+
+import re
+from typing import Callable, List, Tuple
+
+from langchain.schema import BaseMessage, Document, HumanMessage
+
+from ..data_processing.embedding_cache import content_hash
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def approximate_token_count(text: str) -> int:
+    """Count words and punctuation marks as a stand-in for model tokens.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def load_token_counter(model_name: str) -> Callable[[str], int]:
+    """Return a local token counter for a model.
+
+    Uses tiktoken when it is installed and has the encoding available, and
+    falls back to ``approximate_token_count`` otherwise.
+
+    Args:
+        model_name: Chat model name
+
+    Returns:
+        Function from text to token count
+    """
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return approximate_token_count
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def _first_sentence(text: str, max_words: int) -> str:
+    sentence = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    words = sentence.split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words]) + "..."
+    return " ".join(words)
+
+
+class ContextBuilder:
+    """Fills fixed token budgets with retrieved chunks and recent history."""
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int] = approximate_token_count,
+        max_context_tokens: int = 3000,
+        max_history_tokens: int = 1000,
+        max_summary_tokens: int = 300,
+        max_history_messages: int = 10,
+        max_overlap: int = 400,
+    ):
+        """Initialize the builder.
+
+        Args:
+            count_tokens: Local token counter
+            max_context_tokens: Budget for retrieved chunks
+            max_history_tokens: Budget for verbatim recent messages
+            max_summary_tokens: Budget for the summary of older turns
+            max_history_messages: Messages kept verbatim before older ones are folded
+            max_overlap: Longest shared boundary trimmed between chunks
+        """
+        self.count_tokens = count_tokens
+        self.max_context_tokens = max_context_tokens
+        self.max_history_tokens = max_history_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.max_history_messages = max_history_messages
+        self.max_overlap = max_overlap
+
+    def _trim_overlap(self, kept: str, text: str) -> str:
+        """Remove the part of text that repeats the boundary of an already kept chunk."""
+        if text in kept:
+            return ""
+        probe_size = min(32, len(text))
+        probe = text[:probe_size]
+        start = max(0, len(kept) - self.max_overlap)
+        pos = kept.find(probe, start)
+        while pos != -1:
+            if text.startswith(kept[pos:]):
+                return text[len(kept) - pos :]
+            pos = kept.find(probe, pos + 1)
+
+        # The chunk may instead precede the kept one.
+        head = kept[:probe_size]
+        pos = text.find(head, max(0, len(text) - self.max_overlap))
+        while pos != -1:
+            if kept.startswith(text[pos:]):
+                return text[:pos]
+            pos = text.find(head, pos + 1)
+        return text
+
+    def select_documents(self, documents: List[Document]) -> List[Document]:
+        """Deduplicate chunks and keep the most relevant ones that fit the budget.
+
+        Args:
+            documents: Retrieved chunks, most relevant first
+
+        Returns:
+            Chunks to use as context, with overlapping boundaries trimmed
+        """
+        selected: List[Document] = []
+        seen = set()
+        kept_by_source = {}
+        used = 0
+        for doc in documents:
+            key = doc.metadata.get("chunk_id") or content_hash(doc.page_content)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            source = doc.metadata.get("source", "Unknown")
+            text = doc.page_content
+            for kept in kept_by_source.get(source, []):
+                text = self._trim_overlap(kept, text)
+                if not text.strip():
+                    break
+            if not text.strip():
+                continue
+
+            tokens = self.count_tokens(f"From {source}:\n{text}")
+            if used + tokens > self.max_context_tokens:
+                continue
+            used += tokens
+            kept_by_source.setdefault(source, []).append(doc.page_content)
+            selected.append(Document(page_content=text, metadata=doc.metadata))
+        return selected
+
+    def fold_summary(self, summary: str, messages: List[BaseMessage]) -> str:
+        """Fold messages leaving the window into the rolling summary.
+
+        Each turn is reduced to the first sentence of the question and the
+        answer, and the oldest lines are dropped to stay within budget.
+
+        Args:
+            summary: Current summary
+            messages: Messages being removed from the verbatim history
+
+        Returns:
+            Updated summary
+        """
+        lines = summary.splitlines() if summary else []
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                lines.append(f"- User asked: {_first_sentence(message.content, 25)}")
+            else:
+                lines.append(f"  Assistant: {_first_sentence(message.content, 40)}")
+        while lines and self.count_tokens("\n".join(lines)) > self.max_summary_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def format_history(self, summary: str, messages: List[BaseMessage]) -> str:
+        """Render the summary plus as many recent messages as fit the budget.
+
+        Args:
+            summary: Rolling summary of older turns
+            messages: Verbatim recent messages, oldest first
+
+        Returns:
+            History text for the prompt
+        """
+        rendered: List[str] = []
+        used = 0
+        for message in reversed(messages):
+            role = "User" if isinstance(message, HumanMessage) else "Assistant"
+            line = f"{role}: {message.content}"
+            tokens = self.count_tokens(line)
+            if used + tokens > self.max_history_tokens:
+                break
+            used += tokens
+            rendered.append(line)
+        rendered.reverse()
+        if summary:
+            rendered.insert(0, f"Summary of earlier conversation:\n{summary}")
+        return "\n".join(rendered)
+
+    def split_history(
+        self, messages: List[BaseMessage]
+    ) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        """Split history into messages to fold and messages to keep verbatim.
+
+        Args:
+            messages: Full history, oldest first
+
+        Returns:
+            Messages past the window and messages within it
+        """
+        if len(messages) <= self.max_history_messages:
+            return [], messages
+        cut = len(messages) - self.max_history_messages
+        return messages[:cut], messages[cut:]
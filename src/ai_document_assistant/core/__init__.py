@@ -0,0 +1 @@
+"""Core configuration for the AI Document Assistant."""
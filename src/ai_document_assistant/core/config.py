@@ -0,0 +1,58 @@
+"""Settings of the AI Document Assistant, read from the environment and ``.env``."""
+
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
+
+
+def _file_types(value: str) -> List[str]:
+    """Parse a comma-separated list of file suffixes.
+
+    Args:
+        value: Suffixes such as ``".txt,.pdf"``; a missing leading dot is added
+
+    Returns:
+        List[str]: Lower-case suffixes
+    """
+    suffixes = []
+    for suffix in value.split(","):
+        suffix = suffix.strip().lower()
+        if suffix:
+            suffixes.append(suffix if suffix.startswith(".") else f".{suffix}")
+    return suffixes
+
+
+class Settings:
+    """Application settings.
+
+    Every value can be overridden by an environment variable of the same name.
+    """
+
+    def __init__(self) -> None:
+        self.OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+        self.LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+
+        # File processing
+        self.MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))
+        self.SUPPORTED_FILE_TYPES: List[str] = _file_types(
+            os.getenv("SUPPORTED_FILE_TYPES", ".txt,.pdf,.doc,.docx,.md")
+        )
+
+        # Chat
+        self.MODEL_NAME: str = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
+        self.TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.7"))
+        self.MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", "2048"))
+        self.MAX_HISTORY_LENGTH: int = int(os.getenv("MAX_HISTORY_LENGTH", "10"))
+
+        # Directories
+        self.DATA_DIR: Path = Path(os.getenv("DATA_DIR", str(BASE_DIR / "data")))
+        self.CACHE_DIR: Path = Path(os.getenv("CACHE_DIR", str(BASE_DIR / "cache")))
+
+
+settings = Settings()
@@ -1,6 +1,51 @@
 """Data processing module for the AI Document Assistant."""
 
-from .document_processor import DocumentProcessor
-from .vector_store import VectorStore
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["DocumentProcessor", "VectorStore"] 
\ No newline at end of file
+if TYPE_CHECKING:
+    from .chunking import Chunker
+    from .dedup import DedupIndex
+    from .document_processor import DocumentProcessor, FileStatus
+    from .sync import DocumentSync, SyncReport
+    from .vector_backends import ChromaBackend, NumpyBackend, VectorBackend
+    from .vector_store import VectorStore
+
+# Submodule of each export, imported on first access
+_LAZY_EXPORTS = {
+    "ChromaBackend": ".vector_backends",
+    "Chunker": ".chunking",
+    "DedupIndex": ".dedup",
+    "DocumentProcessor": ".document_processor",
+    "DocumentSync": ".sync",
+    "FileStatus": ".document_processor",
+    "NumpyBackend": ".vector_backends",
+    "SyncReport": ".sync",
+    "VectorBackend": ".vector_backends",
+    "VectorStore": ".vector_store",
+}
+
+__all__ = [
+    "ChromaBackend",
+    "Chunker",
+    "DedupIndex",
+    "DocumentProcessor",
+    "DocumentSync",
+    "FileStatus",
+    "NumpyBackend",
+    "SyncReport",
+    "VectorBackend",
+    "VectorStore",
+]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
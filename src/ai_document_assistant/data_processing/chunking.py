@@ -0,0 +1,238 @@
+# Copy of backend/src/ai_document_assistant/data_processing/chunking.py, formatted
+# for this package. Both packages import as ai_document_assistant, so neither can
+# import the other; tests/test_chunking.py fails when the copies differ in anything
+# but formatting and comments.
+import bisect
+import re
+from collections.abc import Iterable, Sequence
+from typing import Any, Callable, Optional
+
+from langchain.schema import Document
+
+Span = tuple[int, int]
+
+_MARKDOWN_HEADING = re.compile(r"#{1,6}\s")
+_SENTENCE_ENDS = (". ", "! ", "? ")
+# Characters read past a chunk's size window: a Markdown heading marker and the
+# space after it
+_LOOKAHEAD = 8
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def approximate_token_offsets(text: str) -> list[int]:
+    """Start offsets of words and punctuation marks, as stand-ins for tokens."""
+    return [match.start() for match in _TOKEN_PATTERN.finditer(text)]
+
+
+class _TiktokenOffsets:
+    """Token start offsets from a tiktoken encoding, loaded again after pickling."""
+
+    def __init__(self, encoding_name: str):
+        self.encoding_name = encoding_name
+        self._encoding = None
+
+    def __getstate__(self):
+        return {"encoding_name": self.encoding_name, "_encoding": None}
+
+    def __call__(self, text: str) -> list[int]:
+        if self._encoding is None:
+            import tiktoken
+
+            self._encoding = tiktoken.get_encoding(self.encoding_name)
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return self._encoding.decode_with_offsets(tokens)[1]
+
+
+def load_token_offsets(model_name: str) -> Callable[[str], list[int]]:
+    """Token start offsets for a model's tokenizer; approximated without tiktoken."""
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return approximate_token_offsets
+    return _TiktokenOffsets(encoding.name)
+
+
+class Chunker:
+    """Splits text into overlapping chunks in one pass, returning offset spans.
+
+    Each chunk ends at the last heading, paragraph break, line break or
+    sentence end inside its size window, in that order of preference, as long
+    as the chunk stays at least ``min_chunk_ratio`` full; otherwise at the last
+    space, and only then mid-word. Breaks are looked up with ``str.rfind`` over
+    the window, so the text is scanned once plus the overlap, with no
+    recursion and no intermediate strings. Sizes are in characters or, with
+    ``token_offsets``, in tokens.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        token_offsets: Optional[Callable[[str], Sequence[int]]] = None,
+        split_on_headings: bool = False,
+        min_chunk_ratio: float = 0.5,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.token_offsets = token_offsets
+        self.split_on_headings = split_on_headings
+        self.min_chunk_ratio = min_chunk_ratio
+
+    @staticmethod
+    def _last_heading(text: str, headings: list[int], lower: int, upper: int) -> int:
+        """Start of the last heading in (lower, upper), or -1."""
+        best = -1
+        i = bisect.bisect_left(headings, upper) - 1
+        if i >= 0 and headings[i] > lower:
+            best = headings[i]
+        position = text.rfind("\n#", lower, upper - 1)
+        while position >= 0 and position + 1 > best:
+            if _MARKDOWN_HEADING.match(text, position + 1):
+                return position + 1
+            position = text.rfind("\n#", lower, position)
+        return best
+
+    @staticmethod
+    def _first_heading(text: str, headings: list[int], lower: int, upper: int) -> int:
+        """Start of the first heading in (lower, upper), or -1."""
+        best = -1
+        i = bisect.bisect_right(headings, lower)
+        if i < len(headings) and headings[i] < upper:
+            best = headings[i]
+        position = text.find("\n#", lower, upper - 1)
+        while position >= 0 and (best < 0 or position + 1 < best):
+            if _MARKDOWN_HEADING.match(text, position + 1):
+                return position + 1
+            position = text.find("\n#", position + 1, upper - 1)
+        return best
+
+    def _find_break(
+        self,
+        text: str,
+        headings: Optional[list[int]],
+        start: int,
+        lower: int,
+        limit: int,
+    ) -> tuple[int, bool]:
+        """Where the chunk starting at ``start`` ends, and whether a heading follows."""
+        if headings is not None:
+            heading = self._last_heading(text, headings, lower, limit + 1)
+            if heading >= 0:
+                return heading, True
+        for separator in ("\n\n", "\n"):
+            position = text.rfind(separator, lower, limit)
+            if position >= 0:
+                return position, False
+        position = max(text.rfind(end, lower, limit) for end in _SENTENCE_ENDS)
+        if position >= 0:
+            return position + 1, False
+        position = max(text.rfind(" ", start + 1, limit), text.rfind("\n", start + 1, limit))
+        if position >= 0:
+            return position, False
+        return limit, False
+
+    def split(self, text: str, heading_offsets: Iterable[int] = ()) -> list[Span]:
+        """(start, end) offsets of each chunk.
+
+        Headings at ``heading_offsets`` are preferred breaks.
+        """
+        return self._split(text, heading_offsets, complete=True)[0]
+
+    def split_prefix(
+        self, text: str, heading_offsets: Iterable[int] = ()
+    ) -> tuple[list[Span], int]:
+        """Spans of the leading chunks that more text appended could not change.
+
+        Returns the spans and the offset the next chunk starts at, from which
+        the rest of the text, with whatever follows it, is split next. Split
+        that way, character-sized chunks come out as ``split`` cuts the whole
+        text; with token sizes a break can move by a token where pieces meet.
+        """
+        return self._split(text, heading_offsets, complete=False)
+
+    def _split(
+        self, text: str, heading_offsets: Iterable[int], complete: bool
+    ) -> tuple[list[Span], int]:
+        token_starts = self.token_offsets(text) if self.token_offsets is not None else None
+
+        def position_at(units: int) -> int:
+            """Offset where the given number of characters or tokens is reached."""
+            if token_starts is None:
+                return min(units, len(text))
+            return token_starts[units] if units < len(token_starts) else len(text)
+
+        # None when the text has no headings, to skip looking for them per chunk.
+        headings: Optional[list[int]] = sorted(heading_offsets)
+        if not headings and "\n#" not in text:
+            headings = None
+        chunk_size, overlap = self.chunk_size, self.chunk_overlap
+        min_size = int(chunk_size * self.min_chunk_ratio)
+        length = len(text.rstrip())
+        spans: list[Span] = []
+        start = len(text) - len(text.lstrip())
+        while start < length:
+            start_units = start if token_starts is None else bisect.bisect_left(token_starts, start)
+            window_end = position_at(start_units + chunk_size)
+            if not complete and window_end + _LOOKAHEAD >= length:
+                # More text could change where this chunk ends
+                break
+            limit = min(window_end, length)
+            heading = -1
+            if self.split_on_headings and headings is not None:
+                heading = self._first_heading(text, headings, start, limit + 1)
+            if heading >= 0:
+                cut, before_heading = heading, True
+            elif limit >= length:
+                spans.append((start, length))
+                break
+            else:
+                lower = max(position_at(start_units + min_size), start + 1)
+                cut, before_heading = self._find_break(text, headings, start, lower, limit)
+
+            end = cut
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            next_start = cut
+            if overlap and not before_heading:
+                end_units = end if token_starts is None else bisect.bisect_left(token_starts, end)
+                overlap_start = position_at(max(end_units - overlap, start_units + 1))
+                space = text.find(" ", overlap_start - 1, end)
+                if 0 <= space < next_start:
+                    next_start = space + 1
+            while next_start < length and text[next_start].isspace():
+                next_start += 1
+            if end > start:
+                spans.append((start, end))
+            start = max(next_start, start + 1)
+        return spans, start
+
+    def split_text(self, text: str) -> list[str]:
+        """Split text into chunk strings."""
+        return [text[start:end] for start, end in self.split(text)]
+
+    def create_documents(self, texts: list[str], metadatas: list[dict[str, Any]]) -> list[Document]:
+        """Chunk documents carrying their text's metadata plus start and end offsets."""
+        chunks = []
+        for text, metadata in zip(texts, metadatas):
+            for start, end in self.split(text):
+                chunks.append(
+                    Document(
+                        page_content=text[start:end],
+                        metadata={**metadata, "start": start, "end": end},
+                    )
+                )
+        return chunks
+
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        """Chunk documents with their document's metadata and start and end offsets."""
+        return self.create_documents(
+            [document.page_content for document in documents],
+            [document.metadata for document in documents],
+        )
@@ -0,0 +1,336 @@
+"""Near-duplicate chunk detection with MinHash signatures and LSH banding."""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from ..utils.helpers import logger
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _lsh_bands(threshold: float, num_perm: int) -> int:
+    """Pick the band count whose LSH threshold sits just below ``threshold``.
+
+    Pairs with Jaccard similarity ``s`` share at least one band with
+    probability ``1 - (1 - s**r)**b``, which rises steeply around
+    ``(1/b)**(1/r)``. Keeping that point below the threshold favours recall;
+    candidates are then checked against their full signatures.
+    """
+    best = num_perm
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - 0.05:
+            best = bands
+    return best
+
+
+class DedupIndex:
+    """Persistent MinHash index for finding near-duplicate chunks.
+
+    Each chunk is reduced to a MinHash signature over its word shingles,
+    whose agreement estimates the Jaccard similarity of two chunks. The
+    signature is cut into bands and every band is hashed into an indexed
+    SQLite table, so a lookup only compares the chunks sharing a band with
+    the new one instead of the whole corpus. Chunks found to duplicate a
+    stored chunk are linked to it, with their text and metadata kept, so
+    they can take its place if it is deleted.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        """Open or create the index.
+
+        Args:
+            path: SQLite database file
+            threshold: Estimated Jaccard similarity above which chunks are duplicates
+            num_perm: Number of hash functions in a signature
+            shingle_size: Words per shingle
+            seed: Seed of the hash functions; changing it invalidates the index
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands = _lsh_bands(threshold, num_perm)
+        self.rows = num_perm // self.bands
+        # Multiply-shift hashing: odd 64-bit multipliers, wrapping, top 32 bits kept
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * 2 + 1
+        self._b = rng.randint(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                chunk_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket);
+            CREATE INDEX IF NOT EXISTS bands_chunk ON bands (chunk_id);
+            CREATE TABLE IF NOT EXISTS links (
+                chunk_id TEXT PRIMARY KEY,
+                canonical_id TEXT NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS links_canonical ON links (canonical_id);
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """)
+        self._check_settings()
+
+    def _check_settings(self) -> None:
+        """Reset the index if it was built with different signature parameters."""
+        current = json.dumps(
+            {
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "shingle_size": self.shingle_size,
+                "seed": self.seed,
+            }
+        )
+        row = self._conn.execute("SELECT value FROM settings WHERE key = 'params'").fetchone()
+        if row is not None and row[0] != current:
+            logger.warning("Dedup index parameters changed; starting a new index")
+            self._conn.executescript(
+                "DELETE FROM signatures; DELETE FROM bands; DELETE FROM links;"
+            )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES ('params', ?)", (current,)
+        )
+        self._conn.commit()
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text.
+
+        Args:
+            text: Chunk text
+
+        Returns:
+            ``num_perm`` unsigned 32-bit minimum hash values
+        """
+        words = _WORD_PATTERN.findall(unicodedata.normalize("NFKC", text).lower())
+        size = self.shingle_size
+        if len(words) <= size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        permuted = (self._a * hashes[None, :] + self._b) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _buckets(self, signature: np.ndarray) -> List[int]:
+        """Hash each band of a signature to a signed 64-bit bucket key."""
+        data = signature.tobytes()
+        width = self.rows * 4
+        return [
+            int.from_bytes(
+                hashlib.blake2b(data[i * width : (i + 1) * width], digest_size=8).digest(),
+                "big",
+                signed=True,
+            )
+            for i in range(self.bands)
+        ]
+
+    def find_duplicates(
+        self, signatures: Sequence[np.ndarray], ids: Sequence[str]
+    ) -> List[Optional[str]]:
+        """Find the chunk each new chunk duplicates, if any.
+
+        Chunks are checked against the index and against the earlier chunks
+        of the same batch. Nothing is written; call ``add`` and ``link`` once
+        the kept chunks are stored.
+
+        Args:
+            signatures: Signatures of the new chunks
+            ids: IDs of the new chunks; a chunk never duplicates its own ID
+
+        Returns:
+            For each chunk, the ID of the chunk it duplicates, or None
+        """
+        results: List[Optional[str]] = []
+        batch_buckets: Dict[Tuple[int, int], List[int]] = {}
+        with self._lock:
+            for position, (signature, chunk_id) in enumerate(zip(signatures, ids)):
+                buckets = self._buckets(signature)
+                candidates: Dict[str, Optional[np.ndarray]] = {}
+                for band, bucket in enumerate(buckets):
+                    for earlier in batch_buckets.get((band, bucket), ()):
+                        candidates.setdefault(ids[earlier], signatures[earlier])
+                    rows = self._conn.execute(
+                        "SELECT chunk_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+                    ).fetchall()
+                    for (candidate,) in rows:
+                        candidates.setdefault(candidate, None)
+                candidates.pop(chunk_id, None)
+
+                duplicate = None
+                best = self.threshold
+                for candidate, candidate_signature in candidates.items():
+                    if candidate_signature is None:
+                        row = self._conn.execute(
+                            "SELECT signature FROM signatures WHERE chunk_id = ?", (candidate,)
+                        ).fetchone()
+                        if row is None:
+                            continue
+                        candidate_signature = np.frombuffer(row[0], dtype=np.uint32)
+                    similarity = float(np.mean(candidate_signature == signature))
+                    if similarity >= best:
+                        duplicate, best = candidate, similarity
+                results.append(duplicate)
+                if duplicate is None:
+                    for band, bucket in enumerate(buckets):
+                        batch_buckets.setdefault((band, bucket), []).append(position)
+        return results
+
+    def add(self, ids: Sequence[str], signatures: Sequence[np.ndarray]) -> None:
+        """Index stored chunks, replacing earlier entries under the same IDs.
+
+        Args:
+            ids: Chunk IDs
+            signatures: Their signatures
+        """
+        if not ids:
+            return
+        with self._lock:
+            self._delete_rows(ids)
+            self._conn.executemany(
+                "INSERT INTO signatures (chunk_id, signature) VALUES (?, ?)",
+                [(chunk_id, signature.tobytes()) for chunk_id, signature in zip(ids, signatures)],
+            )
+            self._conn.executemany(
+                "INSERT INTO bands (band, bucket, chunk_id) VALUES (?, ?, ?)",
+                [
+                    (band, bucket, chunk_id)
+                    for chunk_id, signature in zip(ids, signatures)
+                    for band, bucket in enumerate(self._buckets(signature))
+                ],
+            )
+            self._conn.commit()
+
+    def link(self, duplicates: Sequence[Tuple[str, str, Document]]) -> None:
+        """Record chunks that were dropped as duplicates of stored chunks.
+
+        Args:
+            duplicates: ``(chunk_id, canonical_id, document)`` for each dropped chunk
+        """
+        if not duplicates:
+            return
+        with self._lock:
+            self._delete_rows([chunk_id for chunk_id, _, _ in duplicates])
+            self._conn.executemany(
+                "INSERT INTO links (chunk_id, canonical_id, content, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (chunk_id, canonical_id, doc.page_content, json.dumps(doc.metadata))
+                    for chunk_id, canonical_id, doc in duplicates
+                ],
+            )
+            self._conn.commit()
+
+    def _delete_rows(self, ids: Sequence[str]) -> None:
+        """Delete signatures, bands and links of chunks; the caller holds the lock."""
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start : start + 500])
+            marks = ",".join("?" * len(batch))
+            for table in ("signatures", "bands", "links"):
+                self._conn.execute(f"DELETE FROM {table} WHERE chunk_id IN ({marks})", batch)
+
+    def remove(self, ids: Sequence[str]) -> Tuple[List[str], List[Document]]:
+        """Forget chunks and release the duplicates linked to them.
+
+        Args:
+            ids: IDs of deleted chunks
+
+        Returns:
+            IDs and documents of duplicates whose stored chunk was deleted,
+            which should be added again so their content stays searchable
+        """
+        if not ids:
+            return [], []
+        deleted = set(ids)
+        orphan_ids: List[str] = []
+        orphans: List[Document] = []
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = list(ids[start : start + 500])
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    "SELECT chunk_id, content, metadata FROM links "
+                    f"WHERE canonical_id IN ({marks})",
+                    batch,
+                ).fetchall()
+                for chunk_id, content, metadata in rows:
+                    if chunk_id not in deleted:
+                        orphan_ids.append(chunk_id)
+                        orphans.append(
+                            Document(page_content=content, metadata=json.loads(metadata))
+                        )
+            self._delete_rows(list(ids) + orphan_ids)
+            self._conn.commit()
+        return orphan_ids, orphans
+
+    def canonical_id(self, chunk_id: str) -> Optional[str]:
+        """ID of the stored chunk a dropped chunk was linked to.
+
+        Args:
+            chunk_id: Chunk ID
+
+        Returns:
+            The stored chunk's ID, or None if the chunk was not linked
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT canonical_id FROM links WHERE chunk_id = ?", (chunk_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def clear(self) -> None:
+        """Delete every signature and link."""
+        with self._lock:
+            self._conn.executescript(
+                "DELETE FROM signatures; DELETE FROM bands; DELETE FROM links;"
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -1,38 +1,66 @@
 """Document processing module for handling different file types."""
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from langchain_community.document_loaders import (
     PyPDFLoader,
     TextLoader,
     UnstructuredWordDocumentLoader,
 )
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
 
 from ..core.config import settings
 from ..utils.helpers import validate_file, get_file_info, logger
+from .chunking import Chunker
+
+if TYPE_CHECKING:
+    from .vector_store import VectorStore
+
+
+@dataclass
+class FileStatus:
+    """Outcome of ingesting a single file."""
+
+    path: Path
+    ok: bool = True
+    chunks: int = 0
+    error: Optional[str] = None
+
+
+_worker_processor: Optional["DocumentProcessor"] = None
+
+
+def _load_chunks_in_worker(file_path: Path, chunker: Chunker) -> List[Document]:
+    """Process-pool entry point: load and split one file in a worker process."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor(chunker)
+    return _worker_processor.load_chunks(file_path)
 
 
 class DocumentProcessor:
     """Process and split documents into chunks."""
     
-    def __init__(self):
-        """Initialize the document processor."""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""],
-        )
+    def __init__(self, chunker: Optional[Chunker] = None):
+        """Initialize the document processor.
+        
+        Args:
+            chunker: Chunker splitting loaded documents; defaults to
+                1000-character chunks overlapping by 200
+        """
+        self.chunker = chunker or Chunker(chunk_size=1000, chunk_overlap=200)
     
-    def load_document(self, file_path: Path) -> List[str]:
-        """Load and process a document based on its file type.
+    def load_chunks(self, file_path: Path) -> List[Document]:
+        """Load a document based on its file type and split it into chunks.
         
         Args:
             file_path: Path to the document file
             
         Returns:
-            List of document chunks
+            List of chunk documents carrying the file info in their metadata
             
         Raises:
             FileNotFoundError: If the file doesn't exist
@@ -52,7 +80,7 @@ class DocumentProcessor:
                 
             # Load and split the document
             documents = loader.load()
-            chunks = self.text_splitter.split_documents(documents)
+            chunks = self.chunker.split_documents(documents)
             
             # Add file info to metadata
             file_info = get_file_info(file_path)
@@ -60,12 +88,27 @@ class DocumentProcessor:
                 chunk.metadata.update(file_info)
             
             logger.info(f"Successfully processed document: {file_path}")
-            return [chunk.page_content for chunk in chunks]
+            return chunks
             
         except Exception as e:
             logger.error(f"Error processing document {file_path}: {str(e)}")
             raise
     
+    def load_document(self, file_path: Path) -> List[str]:
+        """Load and process a document based on its file type.
+        
+        Args:
+            file_path: Path to the document file
+            
+        Returns:
+            List of document chunks
+            
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the file type is not supported or file is too large
+        """
+        return [chunk.page_content for chunk in self.load_chunks(file_path)]
+    
     def process_documents(self, file_paths: List[Path]) -> List[str]:
         """Process multiple documents and combine their chunks.
         
@@ -90,4 +133,124 @@ class DocumentProcessor:
         if not all_chunks:
             raise ValueError("No valid documents were processed")
             
-        return all_chunks 
\ No newline at end of file
+        return all_chunks 
+    
+    def iter_chunks(
+        self,
+        file_paths: Iterable[Path],
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ) -> Iterator[Tuple[FileStatus, List[Document]]]:
+        """Load and split files across a process pool, yielding as each finishes.
+        
+        At most ``max_pending`` files are submitted to the pool at a time, so
+        memory stays bounded no matter how many paths are given. Results are
+        yielded in completion order, not input order.
+        
+        Args:
+            file_paths: Paths to document files
+            max_workers: Number of parse processes (defaults to the CPU count)
+            max_pending: Maximum files in flight (defaults to twice the workers)
+            
+        Yields:
+            The status of each file with its chunks (empty when it failed)
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        max_pending = max_pending or 2 * max_workers
+        paths = iter(file_paths)
+        pending: Dict[Future, Path] = {}
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            def submit_next() -> None:
+                for file_path in paths:
+                    future = executor.submit(_load_chunks_in_worker, file_path, self.chunker)
+                    pending[future] = file_path
+                    return
+            
+            for _ in range(max_pending):
+                submit_next()
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = pending.pop(future)
+                    submit_next()
+                    try:
+                        chunks = future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to process {file_path}: {str(e)}")
+                        yield FileStatus(path=file_path, ok=False, error=str(e)), []
+                        continue
+                    yield FileStatus(path=file_path, chunks=len(chunks)), chunks
+    
+    def ingest(
+        self,
+        file_paths: Iterable[Path],
+        vector_store: "VectorStore",
+        batch_size: int = 64,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ) -> List[FileStatus]:
+        """Stream files through parse workers into the vector store in batches.
+        
+        Parsing runs in the process pool while this process embeds and inserts
+        the chunks already produced, batching them into ``batch_size`` calls to
+        ``VectorStore.add_documents``. The store is flushed at the end, so a
+        file reported ok has its chunks written.
+        
+        Args:
+            file_paths: Paths to document files
+            vector_store: Vector store receiving the chunks
+            batch_size: Number of chunks per insert
+            max_workers: Number of parse processes (defaults to the CPU count)
+            max_pending: Maximum files in flight (defaults to twice the workers)
+            
+        Returns:
+            One status per file; a file whose parse or insert failed has ``ok`` False
+        """
+        statuses: List[FileStatus] = []
+        batch: List[Document] = []
+        batch_files: List[FileStatus] = []
+        # Files whose chunks may still be in the vector store's write buffer
+        unflushed: List[FileStatus] = []
+        
+        def fail(files: List[FileStatus], error: Exception) -> None:
+            for status in files:
+                status.ok = False
+                status.error = str(error)
+            files.clear()
+        
+        def flush() -> None:
+            if not batch:
+                return
+            for status in batch_files:
+                if not unflushed or unflushed[-1] is not status:
+                    unflushed.append(status)
+            try:
+                vector_store.add_documents(batch)
+            except Exception as e:
+                fail(unflushed, e)
+            if not vector_store.pending_writes:
+                unflushed.clear()
+            batch.clear()
+            batch_files.clear()
+        
+        for status, chunks in self.iter_chunks(file_paths, max_workers, max_pending):
+            statuses.append(status)
+            if not status.ok:
+                continue
+            for chunk in chunks:
+                if not batch_files or batch_files[-1] is not status:
+                    batch_files.append(status)
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    flush()
+        flush()
+        try:
+            vector_store.flush()
+        except Exception as e:
+            fail(unflushed, e)
+        
+        failed = sum(1 for status in statuses if not status.ok)
+        logger.info(f"Ingested {len(statuses) - failed} files, {failed} failed")
+        return statuses
@@ -0,0 +1,371 @@
+"""Persistent embedding cache keyed by embedding model and chunk content."""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain.embeddings.base import Embeddings
+from langchain_community.embeddings import (
+    DeterministicFakeEmbedding,
+    FakeEmbeddings,
+    OpenAIEmbeddings,
+)
+
+from ..utils.helpers import logger
+
+# Models whose embed_query embeds the text as a one-item document batch, so a
+# batch of queries can go to embed_documents in one request
+_SYMMETRIC_EMBEDDINGS: Tuple[type, ...] = (
+    DeterministicFakeEmbedding,
+    FakeEmbeddings,
+    OpenAIEmbeddings,
+)
+try:
+    from langchain_openai import OpenAIEmbeddings as _OpenAIEmbeddings
+
+    _SYMMETRIC_EMBEDDINGS += (_OpenAIEmbeddings,)
+except ImportError:
+    pass
+
+
+def content_hash(text: str) -> str:
+    """Hash text after normalizing Unicode and collapsing whitespace.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Hex SHA-256 digest of the normalized text
+    """
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def embeds_queries_as_documents(embeddings: Embeddings) -> bool:
+    """Whether a model embeds queries exactly as it embeds documents.
+
+    Args:
+        embeddings: Embedding model
+
+    Returns:
+        True for models known to be symmetric, such as OpenAIEmbeddings
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.symmetric_queries
+    return isinstance(embeddings, _SYMMETRIC_EMBEDDINGS)
+
+
+def embed_query_batch(
+    embeddings: Embeddings, texts: List[str], symmetric: Optional[bool] = None
+) -> List[List[float]]:
+    """Embed a batch of queries together instead of one request per query.
+
+    Symmetric models get a single ``embed_documents`` call. Others keep their
+    query embeddings: their ``aembed_query`` calls are awaited together.
+
+    Args:
+        embeddings: Embedding model
+        texts: Query texts
+        symmetric: Whether the model embeds queries as documents; detected
+            from the model type when None
+
+    Returns:
+        One query vector per input text
+    """
+    if not texts:
+        return []
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(texts)
+    if symmetric is None:
+        symmetric = embeds_queries_as_documents(embeddings)
+    if symmetric:
+        return embeddings.embed_documents(texts)
+
+    async def gather() -> List[List[float]]:
+        return list(await asyncio.gather(*(embeddings.aembed_query(text) for text in texts)))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather())
+    # Called from inside an event loop: run the batch on a loop of its own
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, gather()).result()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with a size bound and LRU eviction.
+
+    Lookups record when entries were used in memory; the times are written
+    with the next insert, every ``touch_batch`` hits, or on ``flush``/``close``,
+    so a cache hit does not write to the database.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 200_000, touch_batch: int = 1000):
+        """Open or create the cache.
+
+        Args:
+            path: SQLite database file
+            max_entries: Entries kept before the least recently used are evicted
+            touch_batch: Hits recorded in memory before their use times are written
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self._lock = threading.Lock()
+        # (model, hash) -> last use not yet written to the database
+        self._touched: Dict[Tuple[str, str], int] = {}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, hash)
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """Look up embeddings and mark them as recently used.
+
+        The use times are kept in memory and written in batches.
+
+        Args:
+            model: Embedding model name
+            hashes: Content hashes to look up
+
+        Returns:
+            Mapping of the hashes found to their vectors
+        """
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit.
+            for start in range(0, len(unique), 500):
+                batch = unique[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    "SELECT hash, vector FROM embeddings "
+                    f"WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for hash_, blob in rows:
+                    found[hash_] = array("f", blob).tolist()
+            if found:
+                now = time.time_ns()
+                for hash_ in found:
+                    self._touched[(model, hash_)] = now
+                if len(self._touched) >= self.touch_batch:
+                    self._write_touches()
+                    self._conn.commit()
+        return found
+
+    def _write_touches(self) -> None:
+        """Write the recorded use times; the caller holds the lock and commits."""
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+            [(used, model, hash_) for (model, hash_), used in self._touched.items()],
+        )
+        self._touched = {}
+
+    def put_many(self, model: str, entries: Dict[str, Sequence[float]]) -> None:
+        """Store embeddings, evicting the least recently used past the size bound.
+
+        Args:
+            model: Embedding model name
+            entries: Mapping of content hash to vector
+        """
+        if not entries:
+            return
+        now = time.time_ns()
+        with self._lock:
+            # Evict by up-to-date use times
+            self._write_touches()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (model, hash_, array("f", vector).tobytes(), now)
+                    for hash_, vector in entries.items()
+                ],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    """DELETE FROM embeddings WHERE rowid IN (
+                        SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?
+                    )""",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def flush(self) -> None:
+        """Write the use times recorded since the last write."""
+        with self._lock:
+            self._write_touches()
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Write pending use times and close the database connection."""
+        with self._lock:
+            self._write_touches()
+            self._conn.commit()
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends uncached chunks to the underlying model.
+
+    Works with any LangChain ``Embeddings``, including a local deterministic fake
+    such as ``DeterministicFakeEmbedding`` for tests. Document embeddings are
+    cached on disk; query embeddings only in a small in-memory LRU, since
+    queries rarely repeat across runs.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model_name: Optional[str] = None,
+        max_queries: int = 1024,
+        symmetric_queries: Optional[bool] = None,
+    ):
+        """Wrap an embedding model.
+
+        Args:
+            embeddings: Underlying embedding model
+            cache: Cache to read from and write to
+            model_name: Cache namespace; defaults to the model's ``model`` attribute
+            max_queries: Query embeddings kept in memory
+            symmetric_queries: Whether the model embeds queries as documents,
+                so ``embed_queries`` can batch them through ``embed_documents``;
+                detected from the model type when None
+        """
+        self.embeddings = embeddings
+        if symmetric_queries is None:
+            symmetric_queries = embeds_queries_as_documents(embeddings)
+        self.symmetric_queries = symmetric_queries
+        self.cache = cache
+        self.model_name = model_name or str(
+            getattr(embeddings, "model", None) or type(embeddings).__name__
+        )
+        self.max_queries = max_queries
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._queries_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, reusing cached vectors and embedding each new text once.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One vector per input text
+        """
+        hashes = [content_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, hashes)
+
+        missing: Dict[str, str] = {}
+        for hash_, text in zip(hashes, texts):
+            if hash_ not in vectors and hash_ not in missing:
+                missing[hash_] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, new_vectors))
+            self.cache.put_many(self.model_name, computed)
+            vectors.update(computed)
+            logger.info(
+                f"Embedded {len(missing)} new chunks, {len(texts) - len(missing)} from cache"
+            )
+
+        return [vectors[hash_] for hash_ in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing the vector of a recent identical query.
+
+        Some models embed queries differently from documents, so query
+        vectors are never shared with the document cache.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Query vector
+        """
+        hash_ = content_hash(text)
+        with self._queries_lock:
+            vector = self._queries.get(hash_)
+            if vector is not None:
+                self._queries.move_to_end(hash_)
+                self.hits += 1
+                return vector
+        self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        with self._queries_lock:
+            self._queries[hash_] = vector
+            while len(self._queries) > self.max_queries:
+                self._queries.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of queries, sending the uncached ones in one request.
+
+        Recent queries come from the in-memory LRU, as in ``embed_query``;
+        the rest are embedded together with ``embed_query_batch``.
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            One query vector per input text
+        """
+        hashes = [content_hash(text) for text in texts]
+        vectors: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        with self._queries_lock:
+            for hash_, text in zip(hashes, texts):
+                vector = self._queries.get(hash_)
+                if vector is not None:
+                    self._queries.move_to_end(hash_)
+                    vectors[hash_] = vector
+                elif hash_ not in missing:
+                    missing[hash_] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = embed_query_batch(
+                self.embeddings, list(missing.values()), symmetric=self.symmetric_queries
+            )
+            computed = dict(zip(missing, new_vectors))
+            vectors.update(computed)
+            with self._queries_lock:
+                self._queries.update(computed)
+                while len(self._queries) > self.max_queries:
+                    self._queries.popitem(last=False)
+
+        return [vectors[hash_] for hash_ in hashes]
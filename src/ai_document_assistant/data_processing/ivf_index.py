@@ -0,0 +1,164 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index over embedding rows."""
+
+from typing import List, Optional
+
+import numpy as np
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    nlist: int,
+    iterations: int = 10,
+    seed: int = 0,
+    block_rows: int = 65536,
+) -> np.ndarray:
+    """Cluster unit vectors with spherical k-means.
+
+    Args:
+        vectors: Unit-normalized float32 training vectors
+        nlist: Number of clusters
+        iterations: Lloyd iterations
+        seed: Random seed for the initial centroids
+        block_rows: Rows assigned at a time
+
+    Returns:
+        Unit-normalized centroids, one row per cluster
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_to_centroids(vectors, centroids, block_rows)
+        counts = np.bincount(assignments, minlength=nlist)
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(vectors[order], starts[~empty], axis=0)
+        if empty.any():
+            # Restart empty clusters from random training vectors.
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms == 0, 1, norms)
+    return centroids.astype(np.float32)
+
+
+def assign_to_centroids(
+    vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 65536
+) -> np.ndarray:
+    """Index of the most similar centroid for each vector.
+
+    Args:
+        vectors: Unit-normalized vectors
+        centroids: Unit-normalized centroids
+        block_rows: Rows scored at a time
+
+    Returns:
+        int32 cluster index per vector
+    """
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start : start + block_rows], dtype=np.float32)
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFIndex:
+    """Cluster centroids plus the rows assigned to each cluster.
+
+    A query is compared with the centroids and only the rows of the
+    ``nprobe`` closest clusters are scored exactly, trading recall for speed.
+    Rows are referenced by position, so deleted rows stay in their lists and
+    are masked out by the caller until the next rebuild.
+    """
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, trained_rows: int):
+        """Create the index.
+
+        Args:
+            centroids: Unit-normalized centroids
+            assignments: Cluster of each row, in row order
+            trained_rows: Number of rows when the centroids were trained
+        """
+        self.centroids = centroids
+        self.trained_rows = trained_rows
+        self._assignments = np.array(assignments, dtype=np.int32)
+        self._size = len(assignments)
+        self._lists: Optional[List[np.ndarray]] = None
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def assignments(self) -> np.ndarray:
+        """Cluster of each row, in row order."""
+        return self._assignments[: self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Cluster of each of a batch of unit vectors.
+
+        Args:
+            vectors: Unit-normalized vectors
+
+        Returns:
+            int32 cluster indexes
+        """
+        return assign_to_centroids(vectors, self.centroids)
+
+    def extend(self, assignments: np.ndarray) -> None:
+        """Append the clusters of newly added rows.
+
+        Args:
+            assignments: Clusters of the new rows, in row order
+        """
+        first_row = self._size
+        needed = self._size + len(assignments)
+        if needed > len(self._assignments):
+            grown = np.empty(max(needed, 2 * len(self._assignments), 1024), dtype=np.int32)
+            grown[: self._size] = self.assignments
+            self._assignments = grown
+        self._assignments[self._size : needed] = assignments
+        self._size = needed
+
+        if self._lists is not None:
+            rows = np.arange(first_row, needed)
+            for cluster in np.unique(assignments):
+                self._lists[cluster] = np.concatenate(
+                    [self._lists[cluster], rows[assignments == cluster]]
+                )
+
+    def lists(self) -> List[np.ndarray]:
+        """Row numbers of each cluster, built from the assignments on first use."""
+        if self._lists is None:
+            assignments = self.assignments
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(self.nlist + 1))
+            self._lists = [order[bounds[i] : bounds[i + 1]] for i in range(self.nlist)]
+        return self._lists
+
+    def candidates(self, queries: np.ndarray, nprobe: int) -> List[np.ndarray]:
+        """Rows in the ``nprobe`` clusters closest to each query.
+
+        Args:
+            queries: Unit-normalized query vectors
+            nprobe: Clusters searched per query
+
+        Returns:
+            Candidate row numbers for each query
+        """
+        nprobe = min(nprobe, self.nlist)
+        scores = queries @ self.centroids.T
+        probed = np.argpartition(-scores, nprobe - 1, axis=1)[:, :nprobe]
+        lists = self.lists()
+        return [np.concatenate([lists[c] for c in clusters]) for clusters in probed]
+
+    def imbalance(self) -> float:
+        """Size of the largest cluster relative to the mean size."""
+        if not self._size:
+            return 0.0
+        counts = np.bincount(self.assignments, minlength=self.nlist)
+        return float(counts.max() / counts.mean())
@@ -0,0 +1,233 @@
+"""Incremental synchronization of source files with the vector store."""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from ..core.config import settings
+from ..utils.helpers import logger
+from .document_processor import DocumentProcessor, FileStatus
+from .vector_store import VectorStore
+
+
+def file_hash(file_path: Path, block_size: int = 1024 * 1024) -> str:
+    """Compute the SHA-256 of a file without reading it into memory at once.
+
+    Args:
+        file_path: Path to the file
+        block_size: Bytes read per step
+
+    Returns:
+        Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class SyncReport:
+    """What a sync changed, by source path."""
+
+    added: List[Path] = field(default_factory=list)
+    modified: List[Path] = field(default_factory=list)
+    unchanged: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+    failed: List[FileStatus] = field(default_factory=list)
+
+
+class IngestManifest:
+    """Record of each ingested file: mtime, size, content hash and chunk ids."""
+
+    def __init__(self, path: Path):
+        """Load the manifest if it exists.
+
+        Args:
+            path: JSON file holding the manifest
+        """
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class DocumentSync:
+    """Bring the vector store in line with a set of source files.
+
+    Unchanged files are skipped on (mtime, size) alone, or on their content
+    hash when only the timestamp moved. Modified files have their old chunks
+    replaced, and files that disappeared have their chunks purged.
+    """
+
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        vector_store: VectorStore,
+        manifest_path: Optional[Path] = None,
+        save_every: int = 50,
+    ):
+        """Initialize the sync.
+
+        Args:
+            processor: Processor used to parse and split changed files
+            vector_store: Vector store holding the chunks
+            manifest_path: Manifest file; defaults to CACHE_DIR/ingest_manifest.json
+            save_every: Files processed between manifest checkpoints
+        """
+        self.processor = processor
+        self.vector_store = vector_store
+        self.manifest = IngestManifest(manifest_path or settings.CACHE_DIR / "ingest_manifest.json")
+        self.save_every = save_every
+
+    @staticmethod
+    def chunk_ids(file_path: Path, content_hash: str, count: int) -> List[str]:
+        """Deterministic IDs for the chunks of one version of a file.
+
+        Args:
+            file_path: Source file
+            content_hash: Hash of the file contents
+            count: Number of chunks
+
+        Returns:
+            One ID per chunk
+        """
+        prefix = hashlib.sha1(str(file_path).encode("utf-8")).hexdigest()[:16]
+        return [f"{prefix}-{content_hash[:16]}-{i}" for i in range(count)]
+
+    def _checkpoint(self) -> None:
+        """Save the manifest once the chunks it records are written to the store."""
+        self.vector_store.flush()
+        self.manifest.save()
+
+    def sync_directory(self, directory: Path, max_workers: Optional[int] = None) -> SyncReport:
+        """Sync every supported file under a directory.
+
+        Args:
+            directory: Root of the document tree
+            max_workers: Number of parse processes
+
+        Returns:
+            Report of the changes made
+        """
+        file_paths = [
+            path
+            for path in directory.rglob("*")
+            if path.is_file() and path.suffix.lower() in settings.SUPPORTED_FILE_TYPES
+        ]
+        return self.sync(file_paths, max_workers=max_workers)
+
+    def sync(
+        self,
+        file_paths: Iterable[Path],
+        prune: bool = True,
+        max_workers: Optional[int] = None,
+    ) -> SyncReport:
+        """Sync the given files with the vector store.
+
+        Args:
+            file_paths: Current set of source files
+            prune: Purge chunks of manifest entries not in ``file_paths``
+            max_workers: Number of parse processes
+
+        Returns:
+            Report of the changes made
+        """
+        report = SyncReport()
+        entries = self.manifest.entries
+        seen = set()
+        changed: Dict[str, dict] = {}
+
+        for file_path in file_paths:
+            file_path = file_path.resolve()
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            key = str(file_path)
+            seen.add(key)
+            entry = entries.get(key)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                report.unchanged.append(file_path)
+                continue
+
+            content_hash = file_hash(file_path)
+            if entry and entry["hash"] == content_hash:
+                entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+                report.unchanged.append(file_path)
+                continue
+
+            changed[key] = {
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "hash": content_hash,
+            }
+
+        processed = 0
+        for status, chunks in self.processor.iter_chunks(
+            [Path(key) for key in changed], max_workers=max_workers
+        ):
+            key = str(status.path)
+            old_entry = entries.get(key)
+            if not status.ok:
+                report.failed.append(status)
+                continue
+            try:
+                if old_entry and old_entry["chunk_ids"]:
+                    self.vector_store.delete_documents(old_entry["chunk_ids"])
+                    del entries[key]
+                new_entry = changed[key]
+                ids = self.chunk_ids(status.path, new_entry["hash"], len(chunks))
+                for chunk, chunk_id in zip(chunks, ids):
+                    chunk.metadata["chunk_id"] = chunk_id
+                    chunk.metadata["source_path"] = key
+                if chunks:
+                    self.vector_store.add_documents(chunks, ids=ids)
+                new_entry["chunk_ids"] = ids
+                entries[key] = new_entry
+            except Exception as e:
+                logger.error(f"Failed to sync {status.path}: {str(e)}")
+                status.ok = False
+                status.error = str(e)
+                report.failed.append(status)
+                continue
+
+            (report.modified if old_entry else report.added).append(status.path)
+            processed += 1
+            if processed % self.save_every == 0:
+                self._checkpoint()
+
+        if prune:
+            for key in [key for key in entries if key not in seen]:
+                chunk_ids = entries[key]["chunk_ids"]
+                try:
+                    if chunk_ids:
+                        self.vector_store.delete_documents(chunk_ids)
+                except Exception as e:
+                    logger.error(f"Failed to purge chunks of {key}: {str(e)}")
+                    continue
+                del entries[key]
+                report.removed.append(Path(key))
+
+        self._checkpoint()
+        logger.info(
+            f"Sync: {len(report.added)} added, {len(report.modified)} modified, "
+            f"{len(report.removed)} removed, {len(report.unchanged)} unchanged, "
+            f"{len(report.failed)} failed"
+        )
+        return report
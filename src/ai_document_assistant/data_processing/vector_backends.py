@@ -0,0 +1,867 @@
+"""Storage backends behind VectorStore."""
+
+import json
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from langchain.schema import Document
+from langchain_community.vectorstores import Chroma
+
+from ..utils.helpers import logger
+from .ivf_index import IVFIndex, assign_to_centroids, train_centroids
+
+SearchResults = List[List[Tuple[Document, float]]]
+
+
+class VectorBackend(ABC):
+    """Stores embedded chunks and answers nearest-neighbour queries.
+
+    VectorStore embeds texts itself and hands backends the vectors, so a
+    backend never calls the embedding model.
+    """
+
+    @abstractmethod
+    def add(
+        self,
+        documents: List[Document],
+        embeddings: Sequence[Sequence[float]],
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add or replace documents with their embeddings.
+
+        Args:
+            documents: Documents to store
+            embeddings: One embedding per document
+            ids: Optional IDs; documents with an existing ID replace it
+
+        Returns:
+            IDs of the stored documents
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[dict] = None,
+    ) -> SearchResults:
+        """Find the nearest documents for a batch of query embeddings.
+
+        Args:
+            embeddings: Query embeddings
+            k: Results per query
+            filter: Metadata equality filter
+
+        Returns:
+            For each query, (document, score) pairs with higher scores more similar
+        """
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        """Delete documents by ID.
+
+        Args:
+            ids: IDs to delete
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete every document."""
+
+    def existing(self, ids: List[str]) -> Set[str]:
+        """Return which of the IDs are stored.
+
+        Backends that cannot tell report all of them.
+
+        Args:
+            ids: IDs to look up
+
+        Returns:
+            The stored IDs
+        """
+        return set(ids)
+
+    def persist(self) -> None:
+        """Make the writes so far durable."""
+
+    def close(self) -> None:
+        """Release files and connections."""
+
+
+class ChromaBackend(VectorBackend):
+    """Backend over a persistent Chroma collection."""
+
+    def __init__(self, persist_directory: Path):
+        """Open the collection.
+
+        Args:
+            persist_directory: Chroma persistence directory
+        """
+        self.persist_directory = persist_directory
+        self.store = Chroma(persist_directory=str(persist_directory))
+
+    def add(self, documents, embeddings, ids=None):
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        # Chroma rejects empty metadata dicts, so those go in without metadata.
+        groups: Dict[bool, List[int]] = {True: [], False: []}
+        for i, doc in enumerate(documents):
+            groups[bool(doc.metadata)].append(i)
+        for has_metadata, indexes in groups.items():
+            if not indexes:
+                continue
+            self.store._collection.upsert(
+                ids=[ids[i] for i in indexes],
+                embeddings=[list(embeddings[i]) for i in indexes],
+                documents=[documents[i].page_content for i in indexes],
+                metadatas=[documents[i].metadata for i in indexes] if has_metadata else None,
+            )
+        return ids
+
+    def search(self, embeddings, k=4, filter=None):
+        if not len(embeddings):
+            return []
+        # One query call for the whole batch instead of one per embedding.
+        results = self.store._collection.query(
+            query_embeddings=[list(embedding) for embedding in embeddings],
+            n_results=k,
+            where=filter,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            [
+                (Document(page_content=text, metadata=metadata or {}), -distance)
+                for text, metadata, distance in zip(texts, metadatas, distances)
+            ]
+            for texts, metadatas, distances in zip(
+                results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+
+    def delete(self, ids):
+        self.store.delete(ids=ids)
+
+    def existing(self, ids):
+        if not ids:
+            return set()
+        return set(self.store._collection.get(ids=list(ids), include=[])["ids"])
+
+    def clear(self):
+        self.store.delete_collection()
+        self.store = Chroma(persist_directory=str(self.persist_directory))
+
+    def persist(self):
+        self.store.persist()
+
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+class NumpyBackend(VectorBackend):
+    """In-process backend over a memory-mapped embedding matrix.
+
+    Rows are unit-normalized embeddings appended to a flat binary file and read
+    through a read-only memory map, so opening the index does not load the
+    matrix and processes on the same host share its pages. The text and
+    metadata of each row are appended as one record to a data file, with the
+    end offset of every record in a flat offsets file. Both are memory-mapped
+    the same way, and a row's record is only decoded when a search returns
+    it, so opening the index reads neither. IDs and deletes go to a small
+    JSON-lines log, the one file read on open, and ``meta.json`` records how
+    much of every file is committed, so a torn write is cut off on the next
+    open. Deletes are tombstones until ``compact`` rewrites the files.
+
+    Embeddings can be stored as float32, float16, or int8 with one float32
+    scale per row. Queries are scored block by block and the top k is kept
+    with ``argpartition``. Metadata filters are answered from per-value
+    bitmaps built on first use and extended as rows are added.
+
+    With ``ann`` set, an IVF index is trained in a background thread once
+    the store holds ``ann_min_rows`` rows, and searches then score only the
+    rows of the ``nprobe`` clusters nearest each query. New rows join their
+    nearest cluster right away and deleted rows are masked out. Once the
+    rows added and deleted since training exceed ``rebuild_drift`` times the
+    trained size, or one cluster grows far past the mean, the index is
+    retrained in the background while searches keep using the old one.
+    """
+
+    block_rows = 65536
+    max_imbalance = 10.0
+
+    def __init__(
+        self,
+        directory: Path,
+        dtype: str = "float32",
+        compact_ratio: float = 0.5,
+        ann: bool = False,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        ann_min_rows: int = 10_000,
+        rebuild_drift: float = 0.5,
+    ):
+        """Open or create the index.
+
+        Args:
+            directory: Directory holding the index files
+            dtype: Storage type of the embeddings: float32, float16 or int8
+            compact_ratio: Share of deleted rows that triggers compaction on persist
+            ann: Whether to build an IVF index for approximate search
+            nlist: Number of IVF clusters; defaults to 4 * sqrt(rows)
+            nprobe: Clusters searched per query unless a search overrides it
+            ann_min_rows: Rows below which search stays exact
+            rebuild_drift: Changed share of rows that triggers a rebuild
+        """
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.directory = directory
+        self.compact_ratio = compact_ratio
+        self.ann = ann
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ann_min_rows = ann_min_rows
+        self.rebuild_drift = rebuild_drift
+        self._lock = threading.RLock()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        directory.mkdir(parents=True, exist_ok=True)
+        self._meta_path = directory / "meta.json"
+
+        meta = {"dim": None, "dtype": dtype, "rows": 0, "ids_bytes": 0, "generation": 0}
+        if self._meta_path.exists():
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        self.dtype = meta["dtype"]
+        self.dim: Optional[int] = meta["dim"]
+        self._load(meta)
+        self._maybe_rebuild()
+
+    def _paths(self, generation: int) -> Tuple[Path, Path, Path, Path, Path]:
+        """Vector, scale, ID log, record offset and record files of one generation."""
+        return (
+            self.directory / f"vectors.{generation}.bin",
+            self.directory / f"scales.{generation}.bin",
+            self.directory / f"ids.{generation}.jsonl",
+            self.directory / f"offsets.{generation}.bin",
+            self.directory / f"records.{generation}.bin",
+        )
+
+    def _ivf_paths(self, generation: int, version: int) -> Tuple[Path, Path]:
+        """Centroid and assignment files of one IVF build."""
+        return (
+            self.directory / f"ivf.{generation}.{version}.centroids.npy",
+            self.directory / f"ivf.{generation}.{version}.assign.bin",
+        )
+
+    @property
+    def _quantized(self) -> bool:
+        return self.dtype == "int8"
+
+    def _load(self, meta: Dict[str, Any]) -> None:
+        """Read the ID log and cut every file back to its committed length."""
+        rows, ids_bytes = meta["rows"], meta["ids_bytes"]
+        self._generation = meta["generation"]
+        self._closed = False
+        (
+            self._vectors_path,
+            self._scales_path,
+            self._ids_path,
+            self._offsets_path,
+            self._records_path,
+        ) = self._paths(self._generation)
+        itemsize = np.dtype(_DTYPES[self.dtype]).itemsize
+        for path, length in [
+            (self._vectors_path, rows * (self.dim or 0) * itemsize),
+            (self._scales_path, rows * 4 if self._quantized else 0),
+            (self._ids_path, ids_bytes),
+            (self._offsets_path, rows * 8),
+        ]:
+            with open(path, "ab") as f:
+                f.truncate(length)
+        self._records_end = 0
+        if rows:
+            with open(self._offsets_path, "rb") as f:
+                f.seek((rows - 1) * 8)
+                self._records_end = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        with open(self._records_path, "ab") as f:
+            f.truncate(self._records_end)
+
+        self._ids: List[Optional[str]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._alive = np.zeros(max(rows, 1024), dtype=bool)
+        with open(self._ids_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get("deleted") is not None:
+                    self._kill(entry["deleted"])
+                    continue
+                self._append_row(entry["id"])
+
+        self._vectors_file = open(self._vectors_path, "ab")
+        self._scales_file = open(self._scales_path, "ab")
+        self._ids_file = open(self._ids_path, "a", encoding="utf-8")
+        self._offsets_file = open(self._offsets_path, "ab")
+        self._records_file = open(self._records_path, "ab")
+        self._offsets: Optional[np.ndarray] = None
+        self._records: Optional[np.ndarray] = None
+        self._bitmaps: Dict[Tuple[str, str], Tuple[np.ndarray, int]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._load_ivf(meta.get("ivf") if self.ann else None)
+
+    def _load_ivf(self, ivf_meta: Optional[Dict[str, Any]]) -> None:
+        """Open the committed IVF build, assigning any rows it does not cover."""
+        self._ivf: Optional[IVFIndex] = None
+        self._ivf_file = None
+        self._ivf_version = ivf_meta["version"] if ivf_meta else 0
+        self._ivf_deleted = ivf_meta["deleted"] if ivf_meta else 0
+        self._stale_ivf_paths: List[Path] = []
+        if ivf_meta is None:
+            return
+        centroids_path, assign_path = self._ivf_paths(self._generation, self._ivf_version)
+        with open(assign_path, "ab") as f:
+            f.truncate(ivf_meta["rows"] * 4)
+        self._ivf = IVFIndex(
+            np.load(centroids_path),
+            np.fromfile(assign_path, dtype=np.int32),
+            ivf_meta["trained_rows"],
+        )
+        self._ivf_file = open(assign_path, "ab")
+        self._assign_new_rows()
+
+    def _assign_new_rows(self) -> None:
+        """Assign rows added since the IVF index last covered the store."""
+        start = len(self._ivf)
+        if start == len(self._ids):
+            return
+        matrix, scales = self._snapshot()
+        assignments = assign_to_centroids(
+            self._decode(matrix, scales, start, len(self._ids)), self._ivf.centroids
+        )
+        self._ivf.extend(assignments)
+        self._ivf_file.write(assignments.tobytes())
+
+    @staticmethod
+    def _decode(
+        matrix: np.ndarray, scales: Optional[np.ndarray], start: int, end: int
+    ) -> np.ndarray:
+        """Rows start:end as float32 vectors."""
+        block = np.asarray(matrix[start:end], dtype=np.float32)
+        if scales is not None:
+            block *= scales[start:end, None]
+        return block
+
+    def _append_row(self, doc_id: str) -> None:
+        row = len(self._ids)
+        if doc_id in self._row_by_id:
+            self._kill(doc_id)
+        if row == len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros(len(self._alive), dtype=bool)])
+        self._ids.append(doc_id)
+        self._row_by_id[doc_id] = row
+        self._alive[row] = True
+
+    def _kill(self, doc_id: str) -> bool:
+        row = self._row_by_id.pop(doc_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self._ids[row] = None
+        return True
+
+    def __len__(self) -> int:
+        return len(self._row_by_id)
+
+    def existing(self, ids):
+        with self._lock:
+            return {doc_id for doc_id in ids if doc_id in self._row_by_id}
+
+    def _encode(self, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Convert unit vectors to the storage type."""
+        if not self._quantized:
+            return matrix.astype(_DTYPES[self.dtype]), None
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1
+        quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def add(self, documents, embeddings, ids=None):
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        if not documents:
+            return ids
+        normalized = _normalize(embeddings)
+        vectors, scales = self._encode(normalized)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Expected embeddings of dimension {self.dim}, got {vectors.shape[1]}"
+                )
+            self._vectors_file.write(vectors.tobytes())
+            if scales is not None:
+                self._scales_file.write(scales.tobytes())
+            records = [_encode_record(doc) for doc in documents]
+            ends = self._records_end + np.cumsum(
+                [len(record) for record in records], dtype=np.uint64
+            )
+            self._records_file.write(b"".join(records))
+            self._offsets_file.write(ends.tobytes())
+            self._records_end = int(ends[-1])
+            for doc_id in ids:
+                self._append_row(doc_id)
+            self._ids_file.write("".join(json.dumps({"id": doc_id}) + "\n" for doc_id in ids))
+            self._matrix = None
+            if self._ivf is not None:
+                assignments = self._ivf.assign(normalized)
+                self._ivf.extend(assignments)
+                self._ivf_file.write(assignments.tobytes())
+            self._maybe_rebuild()
+        return ids
+
+    def delete(self, ids):
+        with self._lock:
+            lines = [json.dumps({"deleted": doc_id}) for doc_id in ids if self._kill(doc_id)]
+            if lines:
+                self._ids_file.write("\n".join(lines) + "\n")
+                self._ivf_deleted += len(lines)
+                self._maybe_rebuild()
+
+    def _maybe_rebuild(self) -> None:
+        """Start a background IVF build when there is none yet or it has drifted."""
+        if not self.ann or (self._rebuild_thread is not None and self._rebuild_thread.is_alive()):
+            return
+        if self._ivf is None:
+            needed = len(self) >= self.ann_min_rows
+        else:
+            changed = len(self._ids) - self._ivf.trained_rows + self._ivf_deleted
+            needed = (
+                changed > self.rebuild_drift * max(self._ivf.trained_rows, 1)
+                or self._ivf.imbalance() > self.max_imbalance
+            )
+        if needed:
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild, name="ivf-rebuild", daemon=True
+            )
+            self._rebuild_thread.start()
+
+    def rebuild_index(self) -> None:
+        """Train the IVF index now, in the calling thread."""
+        self._rebuild()
+
+    def wait_for_index(self, timeout: Optional[float] = None) -> None:
+        """Wait for a background IVF build to finish."""
+        thread = self._rebuild_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _rebuild(self) -> None:
+        """Train centroids on a sample of live rows and assign every row.
+
+        The slow part runs without the lock over the rows present at the
+        start; rows added meanwhile are assigned before the new build
+        replaces the old one. It is committed by the next ``persist``.
+        """
+        try:
+            with self._lock:
+                matrix, scales = self._snapshot()
+                rows = len(self._ids)
+                live = np.flatnonzero(self._alive[:rows])
+                generation = self._generation
+            if matrix is None or not len(live):
+                return
+
+            nlist = self.nlist or int(np.clip(4 * np.sqrt(len(live)), 16, 65536))
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(live, min(len(live), nlist * 64), replace=False))
+            training = np.asarray(matrix[sample], dtype=np.float32)
+            if scales is not None:
+                training *= scales[sample, None]
+            centroids = train_centroids(_normalize(training), nlist)
+            assignments = np.empty(rows, dtype=np.int32)
+            for start in range(0, rows, self.block_rows):
+                end = min(start + self.block_rows, rows)
+                assignments[start:end] = assign_to_centroids(
+                    self._decode(matrix, scales, start, end), centroids
+                )
+
+            with self._lock:
+                if self._closed or self._generation != generation:
+                    # Closed, compacted or cleared meanwhile; row numbers no longer match.
+                    return
+                version = self._ivf_version + 1
+                centroids_path, assign_path = self._ivf_paths(generation, version)
+                with open(centroids_path, "wb") as f:
+                    np.save(f, centroids)
+                    f.flush()
+                    os.fsync(f.fileno())
+                ivf_file = open(assign_path, "wb")
+                ivf_file.write(assignments.tobytes())
+                if self._ivf_file is not None:
+                    self._ivf_file.close()
+                    self._stale_ivf_paths.extend(self._ivf_paths(generation, self._ivf_version))
+                self._ivf = IVFIndex(centroids, assignments, rows)
+                self._ivf_file = ivf_file
+                self._ivf_version = version
+                self._ivf_deleted = 0
+                self._assign_new_rows()
+            logger.info(f"Built IVF index with {len(centroids)} clusters over {rows} rows")
+        except Exception as e:
+            logger.error(f"Error building IVF index: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            old_paths = list(self._paths(self._generation)) + self._stale_ivf_paths
+            if self._ivf is not None:
+                old_paths.extend(self._ivf_paths(self._generation, self._ivf_version))
+            self.close()
+            self.dim = None
+            self._load(
+                {
+                    "dim": None,
+                    "dtype": self.dtype,
+                    "rows": 0,
+                    "ids_bytes": 0,
+                    "generation": self._generation + 1,
+                }
+            )
+            self._write_meta()
+            for path in old_paths:
+                path.unlink(missing_ok=True)
+
+    def persist(self):
+        with self._lock:
+            for f in self._files():
+                if f is None:
+                    continue
+                f.flush()
+                os.fsync(f.fileno())
+            rows = len(self._ids)
+            if rows - len(self) > max(1024, rows * self.compact_ratio):
+                self.compact()
+                return
+            self._write_meta()
+
+    def _write_meta(self) -> None:
+        meta = {
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "rows": len(self._ids),
+            "ids_bytes": self._ids_file.tell(),
+            "generation": self._generation,
+            "ivf": self._ivf_meta(),
+        }
+        tmp_path = self._meta_path.with_name(self._meta_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._meta_path)
+        for path in self._stale_ivf_paths:
+            path.unlink(missing_ok=True)
+        self._stale_ivf_paths = []
+
+    def _ivf_meta(self) -> Optional[Dict[str, Any]]:
+        if self._ivf is None:
+            return None
+        return {
+            "version": self._ivf_version,
+            "rows": len(self._ivf),
+            "trained_rows": self._ivf.trained_rows,
+            "deleted": self._ivf_deleted,
+        }
+
+    def compact(self) -> None:
+        """Rewrite the index without deleted rows.
+
+        The live rows go to the files of the next generation, which only
+        replace the current ones once ``meta.json`` points at them.
+        """
+        with self._lock:
+            live = np.flatnonzero(self._alive[: len(self._ids)])
+            matrix, scales = self._snapshot()
+            offsets, records = self._record_maps()
+            generation = self._generation + 1
+            vectors_path, scales_path, ids_path, offsets_path, records_path = self._paths(
+                generation
+            )
+
+            with open(vectors_path, "wb") as f:
+                for start in range(0, len(live), self.block_rows):
+                    f.write(
+                        np.ascontiguousarray(
+                            matrix[live[start : start + self.block_rows]]
+                        ).tobytes()
+                    )
+                f.flush()
+                os.fsync(f.fileno())
+            with open(scales_path, "wb") as f:
+                if scales is not None:
+                    f.write(np.ascontiguousarray(scales[live]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(ids_path, "w", encoding="utf-8") as f:
+                for row in live:
+                    f.write(json.dumps({"id": self._ids[row]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                ids_bytes = f.tell()
+            ends = np.empty(len(live), dtype=np.uint64)
+            with open(records_path, "wb") as f:
+                for i, row in enumerate(live):
+                    f.write(_read_record(offsets, records, row))
+                    ends[i] = f.tell()
+                f.flush()
+                os.fsync(f.fileno())
+            with open(offsets_path, "wb") as f:
+                f.write(ends.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            ivf_meta = None
+            if self._ivf is not None:
+                # Live rows keep their clusters under their new row numbers.
+                self._assign_new_rows()
+                centroids_path, assign_path = self._ivf_paths(generation, self._ivf_version)
+                for path, data in [
+                    (centroids_path, None),
+                    (assign_path, self._ivf.assignments[live]),
+                ]:
+                    with open(path, "wb") as f:
+                        if data is None:
+                            np.save(f, self._ivf.centroids)
+                        else:
+                            f.write(data.tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                added = len(self._ids) - self._ivf.trained_rows
+                ivf_meta = dict(
+                    self._ivf_meta(), rows=len(live), trained_rows=max(len(live) - added, 0)
+                )
+
+            old_paths = list(self._paths(self._generation))
+            if self._ivf is not None:
+                old_paths.extend(self._ivf_paths(self._generation, self._ivf_version))
+            old_paths.extend(self._stale_ivf_paths)
+            self.close()
+            self._load(
+                {
+                    "dim": self.dim,
+                    "dtype": self.dtype,
+                    "rows": len(live),
+                    "ids_bytes": ids_bytes,
+                    "generation": generation,
+                    "ivf": ivf_meta,
+                }
+            )
+            self._write_meta()
+            for path in old_paths:
+                path.unlink(missing_ok=True)
+            logger.info(f"Compacted vector index to {len(live)} rows")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._matrix = None
+            self._scales = None
+            self._offsets = None
+            self._records = None
+            for f in self._files():
+                if f is not None:
+                    f.close()
+
+    def _files(self) -> list:
+        return [
+            self._vectors_file,
+            self._scales_file,
+            self._ids_file,
+            self._offsets_file,
+            self._records_file,
+            self._ivf_file,
+        ]
+
+    def _snapshot(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Memory-map the rows written so far."""
+        rows = len(self._ids)
+        if self._matrix is None or len(self._matrix) != rows:
+            if rows == 0 or self.dim is None:
+                return None, None
+            self._vectors_file.flush()
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=_DTYPES[self.dtype], mode="r", shape=(rows, self.dim)
+            )
+            if self._quantized:
+                self._scales_file.flush()
+                self._scales = np.memmap(
+                    self._scales_path, dtype=np.float32, mode="r", shape=(rows,)
+                )
+        return self._matrix, self._scales
+
+    def _record_maps(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Memory-map the record offsets and records written so far."""
+        rows = len(self._ids)
+        if self._offsets is None or len(self._offsets) != rows:
+            if rows == 0:
+                return None, None
+            self._offsets_file.flush()
+            self._records_file.flush()
+            self._offsets = np.memmap(self._offsets_path, dtype=np.uint64, mode="r", shape=(rows,))
+            self._records = np.memmap(
+                self._records_path, dtype=np.uint8, mode="r", shape=(self._records_end,)
+            )
+        return self._offsets, self._records
+
+    def _bitmap(self, field: str, value: Any) -> np.ndarray:
+        """Rows whose metadata has field == value, extended to cover new rows."""
+        key = (field, json.dumps(value, sort_keys=True))
+        rows = len(self._ids)
+        bitmap, covered = self._bitmaps.get(key, (np.zeros(0, dtype=bool), 0))
+        if covered < rows:
+            offsets, records = self._record_maps()
+            ends = offsets[covered:rows].tolist()
+            starts = [int(offsets[covered - 1]) if covered else 0] + ends[:-1]
+            view = memoryview(records)
+            new_bits = np.fromiter(
+                (
+                    alive and _decode_metadata(view[start:end]).get(field) == value
+                    for alive, start, end in zip(self._alive[covered:rows].tolist(), starts, ends)
+                ),
+                dtype=bool,
+                count=rows - covered,
+            )
+            bitmap = np.concatenate([bitmap, new_bits])
+            self._bitmaps[key] = (bitmap, rows)
+        return bitmap[:rows]
+
+    def _mask(self, filter: Optional[dict]) -> np.ndarray:
+        """Live rows matching every condition of a filter.
+
+        A condition is either a value to match or ``{"$in": [values]}``.
+        """
+        mask = self._alive[: len(self._ids)].copy()
+        for field, condition in (filter or {}).items():
+            if isinstance(condition, dict) and "$in" in condition:
+                allowed = np.zeros_like(mask)
+                for value in condition["$in"]:
+                    allowed |= self._bitmap(field, value)
+                mask &= allowed
+            else:
+                mask &= self._bitmap(field, condition)
+        return mask
+
+    def search(self, embeddings, k=4, filter=None, nprobe=None, exact=False):
+        """Find the nearest documents for a batch of query embeddings.
+
+        Args:
+            embeddings: Query embeddings
+            k: Results per query
+            filter: Metadata filter; see ``_mask``
+            nprobe: IVF clusters searched per query; defaults to ``self.nprobe``
+            exact: Score every row even when an IVF index is available
+
+        Returns:
+            For each query, (document, cosine similarity) pairs, best first
+        """
+        queries = _normalize(embeddings)
+        with self._lock:
+            matrix, scales = self._snapshot()
+            mask = self._mask(filter)
+            offsets, records = self._record_maps()
+            candidates = None
+            if self._ivf is not None and not exact and matrix is not None:
+                candidates = self._ivf.candidates(queries, nprobe or self.nprobe)
+        if matrix is None or k <= 0 or not mask.any():
+            return [[] for _ in queries]
+
+        if candidates is not None:
+            best_rows, best_scores = self._score_candidates(
+                queries, candidates, matrix, scales, mask, k
+            )
+        else:
+            best_rows, best_scores = self._score_all(queries, matrix, scales, mask, k)
+
+        order = np.argsort(-best_scores, axis=1)
+        results: SearchResults = []
+        for query_rows, query_scores, query_order in zip(best_rows, best_scores, order):
+            hits = []
+            for i in query_order:
+                if not np.isfinite(query_scores[i]):
+                    break
+                record = _read_record(offsets, records, int(query_rows[i]))
+                hits.append((_decode_record(record), float(query_scores[i])))
+            results.append(hits)
+        return results
+
+    def _score_candidates(self, queries, candidates, matrix, scales, mask, k):
+        """Top k of each query among its own candidate rows."""
+        best_rows = np.zeros((len(queries), k), dtype=np.int64)
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, (query, rows) in enumerate(zip(queries, candidates)):
+            rows = rows[rows < len(matrix)]
+            rows = np.sort(rows[mask[rows]])
+            if not len(rows):
+                continue
+            scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+            if scales is not None:
+                scores *= scales[rows]
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[top], scores[top]
+            best_rows[i, : len(rows)] = rows
+            best_scores[i, : len(rows)] = scores
+        return best_rows, best_scores
+
+    def _score_all(self, queries, matrix, scales, mask, k):
+        """Top k of each query over every row, scored block by block."""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(matrix), self.block_rows):
+            end = min(start + self.block_rows, len(matrix))
+            block_mask = mask[start:end]
+            if not block_mask.any():
+                continue
+            scores = queries @ np.asarray(matrix[start:end], dtype=np.float32).T
+            if scales is not None:
+                scores *= scales[start:end]
+            scores[:, ~block_mask] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+        return best_rows, best_scores
+
+
+def _encode_record(doc: Document) -> bytes:
+    """A row's record: metadata JSON length, metadata JSON, then the text."""
+    metadata = json.dumps(doc.metadata).encode("utf-8")
+    return len(metadata).to_bytes(4, "little") + metadata + doc.page_content.encode("utf-8")
+
+
+def _read_record(offsets: np.ndarray, records: np.ndarray, row: int) -> bytes:
+    start = int(offsets[row - 1]) if row else 0
+    return records[start : int(offsets[row])].tobytes()
+
+
+def _decode_metadata(record: Union[bytes, memoryview]) -> Dict[str, Any]:
+    length = int.from_bytes(record[:4], "little")
+    return json.loads(bytes(record[4 : 4 + length]))
+
+
+def _decode_record(record: bytes) -> Document:
+    length = int.from_bytes(record[:4], "little")
+    return Document(
+        page_content=record[4 + length :].decode("utf-8"),
+        metadata=json.loads(record[4 : 4 + length]),
+    )
+
+
+def _normalize(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    """Embeddings as a float32 matrix of unit rows."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
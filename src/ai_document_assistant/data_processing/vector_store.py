@@ -1,44 +1,320 @@
 """Vector store module for document embeddings and retrieval."""
+import atexit
+import threading
+import time
+import uuid
+import weakref
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Set, Union
 
 from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain.embeddings.base import Embeddings
 from langchain.schema import Document
 
 from ..core.config import settings
 from ..utils.helpers import ensure_directories, logger
+from .dedup import DedupIndex
+from .embedding_cache import CachedEmbeddings, EmbeddingCache, embed_query_batch
+from .vector_backends import ChromaBackend, NumpyBackend, VectorBackend
+
+
+# Stores not closed yet; flushed at interpreter exit without being kept alive
+_open_stores: "weakref.WeakSet[VectorStore]" = weakref.WeakSet()
+
+
+def _close_open_stores() -> None:
+    for store in list(_open_stores):
+        try:
+            store.close()
+        except Exception as e:
+            logger.error(f"Error closing vector store at exit: {str(e)}")
+
+
+atexit.register(_close_open_stores)
 
 
 class VectorStore:
     """Vector store for document embeddings and retrieval."""
     
-    def __init__(self):
-        """Initialize the vector store."""
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        cache_embeddings: bool = True,
+        embedding_cache_size: int = 200_000,
+        backend: Union[str, VectorBackend] = "chroma",
+        dtype: str = "float32",
+        ann: bool = False,
+        nprobe: int = 8,
+        dedup: Union[bool, DedupIndex] = False,
+        dedup_threshold: float = 0.85,
+        flush_size: int = 1000,
+        flush_interval: float = 5.0,
+    ):
+        """Initialize the vector store.
+        
+        Args:
+            embeddings: Embedding model; defaults to OpenAIEmbeddings
+            cache_embeddings: Whether to reuse embeddings of chunks seen before
+            embedding_cache_size: Maximum number of cached embeddings
+            backend: "chroma", "numpy" for the built-in memory-mapped index,
+                or a VectorBackend instance
+            dtype: Storage type of the "numpy" backend: float32, float16 or int8
+            ann: Whether the "numpy" backend builds an IVF index for approximate search
+            nprobe: IVF clusters searched per query by default
+            dedup: Whether to drop near-duplicate chunks instead of storing
+                them, or a DedupIndex to use. A dropped chunk is only found
+                through the chunk it duplicates, with that chunk's metadata,
+                so metadata filters such as ``source`` miss it; leave this
+                off when searches filter on metadata
+            dedup_threshold: Estimated Jaccard similarity of word shingles
+                above which a chunk counts as a duplicate
+            flush_size: Buffered chunk writes that trigger a flush; 1 writes
+                every call through
+            flush_interval: Seconds after which buffered writes are flushed
+                in the background
+        """
         ensure_directories()
-        self.embeddings = OpenAIEmbeddings()
-        self.persist_directory = settings.CACHE_DIR / "chroma"
-        self.vector_store = Chroma(
-            persist_directory=str(self.persist_directory),
-            embedding_function=self.embeddings,
-        )
-    
-    def add_documents(self, documents: List[Document]) -> None:
+        self.embeddings = embeddings or OpenAIEmbeddings()
+        self._embedding_cache: Optional[EmbeddingCache] = None
+        if cache_embeddings:
+            self._embedding_cache = EmbeddingCache(
+                settings.CACHE_DIR / "embeddings.sqlite3",
+                max_entries=embedding_cache_size,
+            )
+            self.embeddings = CachedEmbeddings(self.embeddings, self._embedding_cache)
+        if backend == "chroma":
+            backend = ChromaBackend(settings.CACHE_DIR / "chroma")
+        elif backend == "numpy":
+            backend = NumpyBackend(
+                settings.CACHE_DIR / "vectors", dtype=dtype, ann=ann, nprobe=nprobe
+            )
+        elif isinstance(backend, str):
+            raise ValueError(f"Unknown vector backend: {backend}")
+        self.backend: VectorBackend = backend
+        if dedup is True:
+            dedup = DedupIndex(settings.CACHE_DIR / "dedup.sqlite3", threshold=dedup_threshold)
+        self.dedup: Optional[DedupIndex] = dedup if isinstance(dedup, DedupIndex) else None
+        self._change_listeners: List[Callable[[Optional[List[str]]], None]] = []
+        # Bumped by every add, delete and clear, so callers can tell the contents changed
+        self.generation = 0
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # Write-behind buffer: adds by ID in arrival order, and IDs to delete
+        # from the backend. Deletes are applied before adds when flushing.
+        self._pending_adds: Dict[str, Document] = {}
+        self._pending_deletes: Set[str] = set()
+        # The write lock guards the buffer; the flush lock is held while a
+        # flush embeds and writes, so writers only wait to swap the buffer out.
+        # A thread holding the write lock never takes the flush lock.
+        self._write_lock = threading.RLock()
+        self._flush_lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+        # Writes swapped out by the flush in progress
+        self._in_flight = 0
+        _open_stores.add(self)
+    
+    def add_change_listener(self, listener: Callable[[Optional[List[str]]], None]) -> None:
+        """Register a callback for chunks that are replaced or deleted.
+        
+        Deletes are reported when they are made, and replaced chunks when
+        the replacement is flushed; chunks added under new IDs are not
+        reported.
+        
+        Args:
+            listener: Called with the affected IDs, or None when the store is cleared
+        """
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, ids: Optional[List[str]]) -> None:
+        for listener in self._change_listeners:
+            listener(ids)
+    
+    def add_documents(
+        self, documents: List[Document], ids: Optional[List[str]] = None
+    ) -> None:
         """Add documents to the vector store.
         
+        Documents are buffered and written with other pending writes, in one
+        embedding call and one persist, once ``flush_size`` writes are pending
+        or ``flush_interval`` seconds have passed. Searches flush first, so
+        they always see the documents added before them.
+        
+        Each document is stored with its ID in its ``chunk_id`` metadata.
+        
+        With deduplication on, chunks that nearly duplicate a stored chunk,
+        or an earlier chunk of the same flush, are not embedded or stored but
+        linked to that chunk, and take its place if it is deleted.
+        
         Args:
             documents: List of documents to add
+            ids: Optional IDs for the documents, used to delete them later
+        """
+        if not documents:
+            return
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        with self._write_lock:
+            for doc, doc_id in zip(documents, ids):
+                # A later write of an ID replaces the pending one
+                self._pending_adds.pop(doc_id, None)
+                self._pending_adds[doc_id] = Document(
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, "chunk_id": doc_id},
+                )
+            self.generation += 1
+            full = self._writes_buffered()
+        if full:
+            self.flush()
+    
+    def delete_documents(self, ids: List[str]) -> None:
+        """Delete documents from the vector store.
+        
+        Deletes are buffered like adds; see add_documents.
+        
+        Args:
+            ids: List of document IDs to delete
         """
+        if not ids:
+            return
+        with self._write_lock:
+            for doc_id in ids:
+                self._pending_adds.pop(doc_id, None)
+            self._pending_deletes.update(ids)
+            self.generation += 1
+            self._notify_change(ids)
+            full = self._writes_buffered()
+        if full:
+            self.flush()
+    
+    @property
+    def pending_writes(self) -> int:
+        """Number of adds and deletes not yet written to the backend, counting those in flight."""
+        with self._write_lock:
+            return len(self._pending_adds) + len(self._pending_deletes) + self._in_flight
+    
+    def _writes_buffered(self) -> bool:
+        """Whether the buffer is full; otherwise make sure the timer flushes it.
+        
+        The caller holds the write lock, and flushes after releasing it.
+        """
+        if len(self._pending_adds) + len(self._pending_deletes) >= self.flush_size:
+            return True
+        if self._flush_timer is None:
+            self._start_flush_timer()
+        return False
+    
+    def _start_flush_timer(self) -> None:
+        self._flush_timer = threading.Timer(self.flush_interval, self._flush_in_background)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+    
+    def _flush_in_background(self) -> None:
         try:
-            self.vector_store.add_documents(documents)
-            self.vector_store.persist()
-            logger.info(f"Added {len(documents)} documents to vector store")
-        except Exception as e:
-            logger.error(f"Error adding documents to vector store: {str(e)}")
-            raise
+            self.flush()
+        except Exception:
+            # Logged by flush; the writes stay buffered for the next attempt
+            with self._write_lock:
+                if self.pending_writes and self._flush_timer is None:
+                    self._start_flush_timer()
+    
+    def flush(self) -> None:
+        """Write buffered adds and deletes to the backend and persist it.
+        
+        All pending adds are embedded in one call and the backend is
+        persisted once. The buffer is swapped out first, so writes made while
+        the chunks are embedded go to the next flush instead of waiting. If
+        writing fails, the writes not yet applied are put back, behind any
+        made since, and the error is raised.
+        """
+        with self._flush_lock:
+            with self._write_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._pending_adds and not self._pending_deletes:
+                    return
+                adds, self._pending_adds = self._pending_adds, {}
+                deletes, self._pending_deletes = self._pending_deletes, set()
+                self._in_flight = len(adds) + len(deletes)
+            deleted = len(deletes)
+            start = time.perf_counter()
+            try:
+                if deletes:
+                    self.backend.delete(list(deletes))
+                    if self.dedup is not None:
+                        orphan_ids, orphans = self.dedup.remove(list(deletes))
+                        # Duplicates of the deleted chunks are now the only copy
+                        released = [
+                            (doc_id, doc) for doc_id, doc in zip(orphan_ids, orphans)
+                            if doc_id not in adds
+                        ]
+                        adds.update(released)
+                        if released:
+                            with self._write_lock:
+                                self.generation += 1
+                    deletes = set()
+                stored, linked = self._write_adds(adds)
+                adds = {}
+                self.backend.persist()
+            except Exception as e:
+                logger.error(f"Error flushing vector store writes: {str(e)}")
+                self._requeue(adds, deletes)
+                raise
+            finally:
+                with self._write_lock:
+                    self._in_flight = 0
+            logger.info(
+                f"Flushed vector store: {deleted} deleted, "
+                f"{stored} added"
+                + (f", {linked} near-duplicates linked" if linked else "")
+                + f" in {time.perf_counter() - start:.2f}s"
+            )
+    
+    def _requeue(self, adds: Dict[str, Document], deletes: Set[str]) -> None:
+        """Put writes a failed flush did not apply back in front of those made since."""
+        with self._write_lock:
+            for doc_id in self._pending_deletes:
+                adds.pop(doc_id, None)
+            adds.update(self._pending_adds)
+            self._pending_adds = adds
+            self._pending_deletes = deletes | self._pending_deletes
+    
+    def _write_adds(self, adds: Dict[str, Document]):
+        """Embed and store documents; returns the numbers stored and linked as duplicates."""
+        if not adds:
+            return 0, 0
+        ids = list(adds)
+        documents = list(adds.values())
+        # Only chunks that replace a stored one change what searches returned before
+        replaced = self.backend.existing(ids)
+        duplicates = []
+        if self.dedup is not None:
+            signatures = [self.dedup.signature(doc.page_content) for doc in documents]
+            canonical = self.dedup.find_duplicates(signatures, ids)
+            kept = [i for i, canonical_id in enumerate(canonical) if canonical_id is None]
+            duplicates = [
+                (ids[i], canonical[i], documents[i])
+                for i in range(len(documents)) if canonical[i] is not None
+            ]
+            documents = [documents[i] for i in kept]
+            ids = [ids[i] for i in kept]
+            # A replacement dropped as a duplicate must not leave the old version behind
+            stale = [doc_id for doc_id, _, _ in duplicates if doc_id in replaced]
+            if stale:
+                self.backend.delete(stale)
+        if documents:
+            embeddings = self.embeddings.embed_documents(
+                [doc.page_content for doc in documents]
+            )
+            self.backend.add(documents, embeddings, ids=ids)
+        if self.dedup is not None:
+            self.dedup.add(ids, [signatures[i] for i in kept])
+            self.dedup.link(duplicates)
+        if replaced:
+            self._notify_change([doc_id for doc_id in adds if doc_id in replaced])
+        return len(documents), len(duplicates)
     
     def similarity_search(
-        self, query: str, k: int = 4, filter: Optional[dict] = None
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **search_kwargs
     ) -> List[Document]:
         """Search for similar documents.
         
@@ -46,44 +322,81 @@ class VectorStore:
             query: Search query
             k: Number of results to return
             filter: Optional filter criteria
+            **search_kwargs: Backend options, such as ``nprobe`` or ``exact``
+                for the numpy backend
             
         Returns:
             List of similar documents
         """
+        self.flush()
         try:
-            results = self.vector_store.similarity_search(
-                query=query,
-                k=k,
-                filter=filter,
-            )
-            return results
+            embedding = self.embeddings.embed_query(query)
+            results = self.backend.search([embedding], k=k, filter=filter, **search_kwargs)[0]
+            return [doc for doc, _ in results]
         except Exception as e:
             logger.error(f"Error searching vector store: {str(e)}")
             raise
     
-    def delete_documents(self, ids: List[str]) -> None:
-        """Delete documents from the vector store.
+    def similarity_search_many(
+        self, queries: List[str], k: int = 4, filter: Optional[dict] = None, **search_kwargs
+    ) -> List[List[Document]]:
+        """Search for the documents similar to each of a batch of queries.
+        
+        Each query is embedded as a query, as in similarity_search, but the
+        batch goes to the model in one request and the backend scores the
+        queries together, so the per-search overhead of similarity_search is
+        paid once.
         
         Args:
-            ids: List of document IDs to delete
+            queries: Search queries
+            k: Number of results per query
+            filter: Optional filter criteria
+            **search_kwargs: Backend options, as for similarity_search
+            
+        Returns:
+            For each query, the list of similar documents
         """
+        if not queries:
+            return []
+        self.flush()
         try:
-            self.vector_store.delete(ids=ids)
-            self.vector_store.persist()
-            logger.info(f"Deleted {len(ids)} documents from vector store")
+            embeddings = embed_query_batch(self.embeddings, queries)
+            results = self.backend.search(embeddings, k=k, filter=filter, **search_kwargs)
+            return [[doc for doc, _ in hits] for hits in results]
         except Exception as e:
-            logger.error(f"Error deleting documents from vector store: {str(e)}")
+            logger.error(f"Error searching vector store: {str(e)}")
             raise
     
     def clear(self) -> None:
-        """Clear all documents from the vector store."""
+        """Clear all documents from the vector store, including buffered writes."""
         try:
-            self.vector_store.delete_collection()
-            self.vector_store = Chroma(
-                persist_directory=str(self.persist_directory),
-                embedding_function=self.embeddings,
-            )
+            with self._flush_lock, self._write_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                self._pending_adds = {}
+                self._pending_deletes = set()
+                self.backend.clear()
+                if self.dedup is not None:
+                    self.dedup.clear()
+                self.generation += 1
+            self._notify_change(None)
             logger.info("Cleared vector store")
         except Exception as e:
             logger.error(f"Error clearing vector store: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+    
+    def close(self) -> None:
+        """Flush buffered writes and release the backend.
+        
+        Runs at interpreter exit for stores that were not closed.
+        """
+        _open_stores.discard(self)
+        try:
+            self.flush()
+        finally:
+            self.backend.close()
+            if self.dedup is not None:
+                self.dedup.close()
+            if self._embedding_cache is not None:
+                self._embedding_cache.close()
@@ -0,0 +1,15 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.core.config import settings
+
+
+@pytest.fixture
+def temp_storage(monkeypatch):
+    """A temporary directory that also holds the data and cache directories."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        monkeypatch.setattr(settings, "DATA_DIR", Path(temp_dir) / "data")
+        monkeypatch.setattr(settings, "CACHE_DIR", Path(temp_dir) / "cache")
+        yield Path(temp_dir)
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from ai_document_assistant.chat.answer_cache import AnswerCache, normalize_question
+from ai_document_assistant.chat.chat_manager import ChatManager
+from ai_document_assistant.chat.context_builder import ContextBuilder
+from ai_document_assistant.data_processing.vector_store import VectorStore
+
+
+@pytest.fixture
+def store(temp_storage):
+    vector_store = VectorStore(
+        embeddings=DeterministicFakeEmbedding(size=16),
+        cache_embeddings=False,
+        backend="numpy",
+    )
+    yield vector_store
+    vector_store.close()
+
+
+def make_manager(store, responses):
+    llm = FakeListChatModel(responses=responses)
+    return ChatManager(store, llm=llm, context_builder=ContextBuilder())
+
+
+def test_normalize_question():
+    assert normalize_question("  What IS\nthe warranty? ") == "what is the warranty?"
+
+
+def test_exact_level_keys_on_history():
+    cache = AnswerCache()
+    cache.put("What about it?", ["c1"], "answer in context", history="User: the warranty")
+
+    assert cache.get_exact("what about it?", ["c1"]) is None
+    assert cache.get_exact("what about it?", ["c1"], "User: the warranty") == "answer in context"
+    assert cache.get_exact("what about it?", ["c2"], "User: the warranty") is None
+
+
+def test_similarity_level_only_matches_the_current_generation():
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put("q", ["c1"], "cached", embedding=[1.0, 0.0], generation=3)
+
+    assert cache.get_similar([0.99, 0.05], generation=3) == "cached"
+    assert cache.get_similar([0.99, 0.05], generation=4) is None
+    assert cache.get_similar([0.0, 1.0], generation=3) is None
+    # The entry itself is still good for the exact level
+    assert cache.get_exact("q", ["c1"]) == "cached"
+
+
+def test_invalidation_ttl_and_size_bound():
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", ["c1", "c2"], "A")
+    cache.put("b", ["c2"], "B")
+    cache.put("c", ["c3"], "C")
+    assert cache.get_exact("a", ["c1", "c2"]) is None  # evicted
+
+    cache.invalidate_chunks(["c2"])
+    assert cache.get_exact("b", ["c2"]) is None
+    assert cache.get_exact("c", ["c3"]) == "C"
+
+    cache.invalidate_chunks(None)
+    assert cache.stats()["entries"] == 0
+
+    short = AnswerCache(ttl_seconds=0.01)
+    short.put("a", ["c1"], "A")
+    time.sleep(0.02)
+    assert short.get_exact("a", ["c1"]) is None
+
+
+def test_repeated_question_is_answered_from_cache(store):
+    store.add_documents([Document(page_content="The warranty lasts twelve months.")], ids=["w"])
+    manager = make_manager(store, ["Twelve months.", "Something else."])
+
+    assert manager.get_response("How long is the warranty?") == "Twelve months."
+    manager.clear_history()
+    assert manager.get_response("How long is the warranty?") == "Twelve months."
+    assert manager.answer_cache.stats()["similar_hits"] == 1
+
+
+def test_questions_asked_mid_conversation_are_not_served_from_another(store):
+    store.add_documents([Document(page_content="The warranty lasts twelve months.")], ids=["w"])
+    manager = make_manager(store, ["first", "second", "third"])
+
+    assert manager.get_response("How long is the warranty?") == "first"
+    manager.clear_history()
+    assert manager.get_response("Tell me about the product") == "second"
+    assert manager.get_response("How long is the warranty?") == "third"
+    assert manager.answer_cache.stats()["similar_hits"] == 0
+
+
+def test_store_changes_invalidate_answers(store):
+    store.add_documents([Document(page_content="The warranty lasts twelve months.")], ids=["w"])
+    manager = make_manager(store, ["Twelve months.", "Still twelve months.", "Two years."])
+
+    assert manager.get_response("How long is the warranty?") == "Twelve months."
+    manager.clear_history()
+
+    # A new document may change what retrieval returns, so a similarity hit,
+    # which skips retrieval, no longer applies.
+    store.add_documents([Document(page_content="Shipping is free.")], ids=["s"])
+    assert manager.get_response("How long is the warranty?") == "Still twelve months."
+    manager.clear_history()
+
+    # Re-indexing or deleting a chunk drops the answers generated from it
+    store.add_documents([Document(page_content="The warranty lasts two years.")], ids=["w"])
+    assert manager.get_response("How long is the warranty?") == "Two years."
+    assert manager.answer_cache.stats()["entries"] == 1
+    store.delete_documents(["s"])
+    assert manager.answer_cache.stats()["entries"] == 0
+
+
+def test_retrieved_chunks_carry_their_store_ids(store):
+    store.add_documents([Document(page_content="alpha")], ids=["a"])
+    (doc,) = store.similarity_search("alpha", k=1)
+    assert doc.metadata["chunk_id"] == "a"
+    assert ChatManager.chunk_ids([doc]) == ["a"]
@@ -0,0 +1,26 @@
+import ast
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.data_processing import chunking
+
+BACKEND_CHUNKING = (
+    Path(__file__).resolve().parents[1]
+    / "backend"
+    / "src"
+    / "ai_document_assistant"
+    / "data_processing"
+    / "chunking.py"
+)
+
+
+def test_chunker_matches_backend_copy():
+    if not BACKEND_CHUNKING.exists():
+        pytest.skip("backend sources are not checked out")
+    ours = ast.dump(ast.parse(Path(chunking.__file__).read_text(encoding="utf-8")))
+    theirs = ast.dump(ast.parse(BACKEND_CHUNKING.read_text(encoding="utf-8")))
+    assert ours == theirs, (
+        "data_processing/chunking.py differs from the backend copy; "
+        "apply the same change to both"
+    )
@@ -0,0 +1,104 @@
+from langchain.schema import AIMessage, Document, HumanMessage
+
+from ai_document_assistant.chat.context_builder import (
+    ContextBuilder,
+    approximate_token_count,
+    load_token_counter,
+)
+
+
+def doc(text, source="a.txt", **metadata):
+    return Document(page_content=text, metadata={"source": source, **metadata})
+
+
+def test_approximate_token_count():
+    assert approximate_token_count("Hello, world!") == 4
+    assert approximate_token_count("") == 0
+
+
+def test_load_token_counter_returns_a_counter():
+    count = load_token_counter("gpt-3.5-turbo")
+    assert count("one two three") >= 3
+
+
+def test_context_keeps_most_relevant_chunks_within_budget():
+    builder = ContextBuilder(max_context_tokens=20)
+    documents = [doc(f"chunk {i} " + "word " * 5, chunk_id=str(i)) for i in range(5)]
+
+    selected = builder.select_documents(documents)
+
+    # Each chunk costs 12 tokens with its "From a.txt:" header
+    assert [d.metadata["chunk_id"] for d in selected] == ["0"]
+    for d in selected:
+        assert builder.count_tokens(f"From a.txt:\n{d.page_content}") <= 20
+
+
+def test_smaller_chunks_further_down_still_fit():
+    builder = ContextBuilder(max_context_tokens=30)
+    documents = [
+        doc("long " * 40, chunk_id="long"),
+        doc("short one", chunk_id="s1"),
+        doc("short two", chunk_id="s2"),
+    ]
+    assert [d.metadata["chunk_id"] for d in builder.select_documents(documents)] == ["s1", "s2"]
+
+
+def test_duplicate_and_overlapping_chunks_are_trimmed():
+    builder = ContextBuilder()
+    text = (
+        "The warranty lasts twelve months from the date of purchase. "
+        "It covers parts and labour but not batteries or accidental damage."
+    )
+    first = text[:80]
+    second = text[30:]
+    documents = [
+        doc(first, chunk_id="1"),
+        doc(first, chunk_id="1"),
+        doc(second, chunk_id="2"),
+        doc(first, source="b.txt", chunk_id="3"),
+    ]
+
+    selected = builder.select_documents(documents)
+
+    assert [d.metadata["chunk_id"] for d in selected] == ["1", "2", "3"]
+    assert selected[0].page_content + selected[1].page_content == text[:80] + text[80:]
+    # Overlap is only trimmed between chunks of the same source
+    assert selected[2].page_content == first
+
+
+def test_history_keeps_recent_messages_within_budget():
+    builder = ContextBuilder(max_history_tokens=10)
+    messages = [
+        HumanMessage(content="first question here"),
+        AIMessage(content="first answer here"),
+        HumanMessage(content="second question"),
+        AIMessage(content="second answer"),
+    ]
+
+    history = builder.format_history("", messages)
+
+    assert history == "User: second question\nAssistant: second answer"
+    assert builder.format_history("- User asked: hi", []) == (
+        "Summary of earlier conversation:\n- User asked: hi"
+    )
+
+
+def test_old_messages_fold_into_a_bounded_summary():
+    builder = ContextBuilder(max_history_messages=2, max_summary_tokens=20)
+    messages = [
+        HumanMessage(content="What is covered? I bought it last week."),
+        AIMessage(content="Parts and labour are covered. Batteries are not."),
+        HumanMessage(content="How long?"),
+        AIMessage(content="Twelve months."),
+    ]
+
+    folded, kept = builder.split_history(messages)
+    assert folded == messages[:2] and kept == messages[2:]
+    assert builder.split_history(kept) == ([], kept)
+
+    summary = builder.fold_summary("", folded)
+    assert summary == ("- User asked: What is covered?\n  Assistant: Parts and labour are covered.")
+
+    summary = builder.fold_summary(summary, folded * 3)
+    assert builder.count_tokens(summary) <= 20
+    assert summary.endswith("Assistant: Parts and labour are covered.")
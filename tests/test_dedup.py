@@ -0,0 +1,109 @@
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.schema import Document
+
+from ai_document_assistant.data_processing.dedup import DedupIndex
+from ai_document_assistant.data_processing.vector_store import VectorStore
+
+BASE = (
+    "The pump seal must be replaced every twelve months or after two thousand "
+    "hours of operation, whichever comes first, using the kit listed in the "
+    "parts table at the end of this manual."
+)
+NEAR = BASE.replace("twelve months", "twelve  Months")
+OTHER = "Shipping is free for orders over fifty euros within the European Union."
+
+
+class CharacterEmbeddings(Embeddings):
+    def _vector(self, text):
+        counts = np.zeros(26, dtype=np.float32)
+        for char in text.lower():
+            if "a" <= char <= "z":
+                counts[ord(char) - ord("a")] += 1
+        return counts.tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def test_signatures_estimate_similarity(temp_storage):
+    index = DedupIndex(temp_storage / "dedup.sqlite3")
+    base, near, other = (index.signature(text) for text in (BASE, NEAR, OTHER))
+
+    assert base.shape == (128,) and base.dtype == np.uint32
+    assert np.array_equal(base, near)  # case and whitespace are ignored
+    assert np.mean(base == other) < 0.1
+    edited = index.signature(BASE.replace("end of this manual", "back of the manual"))
+    assert 0.5 < np.mean(base == edited) < 1.0
+
+
+def test_duplicates_are_found_in_the_index_and_the_batch(temp_storage):
+    index = DedupIndex(temp_storage / "dedup.sqlite3")
+    index.add(["a"], [index.signature(BASE)])
+
+    signatures = [index.signature(text) for text in (NEAR, OTHER, OTHER)]
+    assert index.find_duplicates(signatures, ["b", "c", "d"]) == ["a", None, "c"]
+    # A chunk never duplicates its own ID
+    assert index.find_duplicates([index.signature(BASE)], ["a"]) == [None]
+
+
+def test_removing_a_chunk_releases_its_duplicates(temp_storage):
+    index = DedupIndex(temp_storage / "dedup.sqlite3")
+    index.add(["a"], [index.signature(BASE)])
+    index.link([("b", "a", Document(page_content=NEAR, metadata={"source": "b.txt"}))])
+    assert index.canonical_id("b") == "a"
+
+    orphan_ids, orphans = index.remove(["a"])
+
+    assert orphan_ids == ["b"]
+    assert orphans[0].metadata == {"source": "b.txt"}
+    assert index.canonical_id("b") is None and len(index) == 0
+    index.close()
+
+    # Changing signature parameters starts a new index
+    index = DedupIndex(temp_storage / "dedup.sqlite3")
+    index.add(["a"], [index.signature(BASE)])
+    index.close()
+    assert len(DedupIndex(temp_storage / "dedup.sqlite3", num_perm=64)) == 0
+
+
+def test_vector_store_keeps_duplicates_unless_asked(temp_storage):
+    store = VectorStore(embeddings=CharacterEmbeddings(), cache_embeddings=False, backend="numpy")
+    store.add_documents(
+        [
+            Document(page_content=BASE, metadata={"source": "a.txt"}),
+            Document(page_content=NEAR, metadata={"source": "b.txt"}),
+        ],
+        ids=["a", "b"],
+    )
+
+    assert store.dedup is None
+    hits = store.similarity_search(BASE, k=2, filter={"source": "b.txt"})
+    assert [doc.metadata["chunk_id"] for doc in hits] == ["b"]
+    store.close()
+
+
+def test_vector_store_dedup_links_and_restores_duplicates(temp_storage):
+    store = VectorStore(
+        embeddings=CharacterEmbeddings(), cache_embeddings=False, backend="numpy", dedup=True
+    )
+    store.add_documents(
+        [
+            Document(page_content=BASE, metadata={"source": "a.txt"}),
+            Document(page_content=NEAR, metadata={"source": "b.txt"}),
+            Document(page_content=OTHER, metadata={"source": "c.txt"}),
+        ],
+        ids=["a", "b", "c"],
+    )
+    store.flush()
+    assert len(store.backend) == 2
+    assert store.dedup.canonical_id("b") == "a"
+
+    store.delete_documents(["a"])
+    hits = store.similarity_search(BASE, k=1)
+    assert [doc.metadata["chunk_id"] for doc in hits] == ["b"]
+    assert hits[0].metadata["source"] == "b.txt"
+    store.close()
@@ -0,0 +1,73 @@
+from langchain.embeddings.base import Embeddings
+
+from ai_document_assistant.data_processing.document_processor import DocumentProcessor
+from ai_document_assistant.data_processing.vector_store import VectorStore
+
+
+class FlakyEmbeddings(Embeddings):
+    """Deterministic embeddings that fail while ``failing`` is set."""
+
+    def __init__(self, failing=False):
+        self.failing = failing
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError("embedding service unavailable")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+def write_files(directory, count):
+    paths = []
+    for i in range(count):
+        path = directory / f"doc{i}.txt"
+        path.write_text(f"Document {i} talks about topic {i}. " * 20)
+        paths.append(path)
+    return paths
+
+
+def make_store(embeddings):
+    # A large buffer, so only ingest's final flush writes
+    return VectorStore(
+        embeddings=embeddings,
+        cache_embeddings=False,
+        backend="numpy",
+        flush_size=10_000,
+        flush_interval=60,
+    )
+
+
+def test_ingest_flushes_the_write_buffer(temp_storage):
+    paths = write_files(temp_storage, 3)
+    embeddings = FlakyEmbeddings()
+    store = make_store(embeddings)
+
+    statuses = DocumentProcessor().ingest(paths, store, batch_size=2, max_workers=2)
+
+    assert all(status.ok and status.chunks for status in statuses)
+    assert store.pending_writes == 0
+    assert len(store.backend) == sum(status.chunks for status in statuses)
+    assert embeddings.calls == 1
+    store.close()
+
+
+def test_ingest_marks_files_failed_when_the_flush_fails(temp_storage):
+    paths = write_files(temp_storage, 3) + [temp_storage / "missing.txt"]
+    embeddings = FlakyEmbeddings(failing=True)
+    store = make_store(embeddings)
+
+    statuses = DocumentProcessor().ingest(paths, store, batch_size=2, max_workers=2)
+
+    by_name = {status.path.name: status for status in statuses}
+    assert not any(status.ok for status in statuses)
+    assert all(by_name[path.name].error == "embedding service unavailable" for path in paths[:3])
+    assert by_name["missing.txt"].error != "embedding service unavailable"
+    # The writes stay buffered for a later flush
+    assert store.pending_writes == len(store._pending_adds) > 0
+    embeddings.failing = False
+    store.close()
+    assert len(store.backend) == sum(status.chunks for status in statuses)
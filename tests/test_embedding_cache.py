@@ -0,0 +1,145 @@
+import sqlite3
+
+from langchain.embeddings.base import Embeddings
+
+from ai_document_assistant.data_processing.embedding_cache import (
+    CachedEmbeddings,
+    EmbeddingCache,
+    content_hash,
+    embed_query_batch,
+)
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embedder that records what it was asked to embed."""
+
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+
+    def _vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+    def embed_documents(self, texts):
+        self.documents.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [-x for x in self._vector(text)]
+
+
+def last_used(path, hash_):
+    with sqlite3.connect(str(path)) as conn:
+        return conn.execute("SELECT last_used FROM embeddings WHERE hash = ?", (hash_,)).fetchone()[
+            0
+        ]
+
+
+def test_content_hash_ignores_whitespace_and_unicode_form():
+    assert content_hash("café  au\nlait") == content_hash("café au lait")
+    assert content_hash("a b") != content_hash("a c")
+
+
+def test_documents_are_embedded_once(temp_storage):
+    fake = CountingEmbeddings()
+    cache = EmbeddingCache(temp_storage / "embeddings.sqlite3")
+    embeddings = CachedEmbeddings(fake, cache, model_name="fake")
+
+    first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    second = embeddings.embed_documents(["beta", "gamma"])
+
+    assert fake.documents == [["alpha", "beta"], ["gamma"]]
+    assert first[0] == first[2] == fake._vector("alpha")
+    assert second[0] == first[1]
+    assert (embeddings.hits, embeddings.misses) == (2, 3)
+    cache.close()
+
+    # Vectors survive a restart
+    reopened = CachedEmbeddings(
+        fake, EmbeddingCache(temp_storage / "embeddings.sqlite3"), model_name="fake"
+    )
+    assert reopened.embed_documents(["gamma"]) == [fake._vector("gamma")]
+    assert len(fake.documents) == 2
+
+
+def test_models_do_not_share_vectors(temp_storage):
+    fake = CountingEmbeddings()
+    cache = EmbeddingCache(temp_storage / "embeddings.sqlite3")
+    CachedEmbeddings(fake, cache, model_name="a").embed_documents(["text"])
+    CachedEmbeddings(fake, cache, model_name="b").embed_documents(["text"])
+    assert len(fake.documents) == 2
+
+
+def test_queries_are_cached_in_memory_only(temp_storage):
+    fake = CountingEmbeddings()
+    cache = EmbeddingCache(temp_storage / "embeddings.sqlite3")
+    embeddings = CachedEmbeddings(fake, cache, model_name="fake", max_queries=2)
+
+    assert embeddings.embed_query("one") == fake.embed_query("one")
+    fake.queries.clear()
+    embeddings.embed_query("one")
+    embeddings.embed_query("two")
+    embeddings.embed_query("three")  # evicts "one"
+    embeddings.embed_query("one")
+
+    assert fake.queries == ["two", "three", "one"]
+    assert len(cache) == 0
+
+
+def test_query_batches_embed_uncached_queries_in_one_call(temp_storage):
+    fake = CountingEmbeddings()
+    cache = EmbeddingCache(temp_storage / "embeddings.sqlite3")
+    embeddings = CachedEmbeddings(fake, cache, model_name="fake", symmetric_queries=True)
+
+    embeddings.embed_query("one")
+    vectors = embeddings.embed_queries(["one", "two", "three", "two"])
+
+    assert fake.queries == ["one"]
+    assert fake.documents == [["two", "three"]]
+    assert vectors[0] == fake.embed_query("one")
+    assert vectors[1] == vectors[3] == fake._vector("two")
+    assert (embeddings.hits, embeddings.misses) == (2, 3)
+    assert len(cache) == 0
+
+
+def test_asymmetric_query_batches_keep_query_embeddings(temp_storage):
+    fake = CountingEmbeddings()
+    cache = EmbeddingCache(temp_storage / "embeddings.sqlite3")
+    embeddings = CachedEmbeddings(fake, cache, model_name="fake")
+
+    vectors = embeddings.embed_queries(["one", "two"])
+
+    assert not embeddings.symmetric_queries
+    assert fake.documents == []
+    assert sorted(fake.queries) == ["one", "two"]
+    assert vectors == [[-x for x in fake._vector(text)] for text in ["one", "two"]]
+    assert embed_query_batch(fake, ["one"]) == vectors[:1]
+
+
+def test_hits_are_written_in_batches(temp_storage):
+    path = temp_storage / "embeddings.sqlite3"
+    cache = EmbeddingCache(path, touch_batch=3)
+    cache.put_many("m", {"a": [1.0], "b": [2.0], "c": [3.0]})
+    stored = last_used(path, "a")
+
+    cache.get_many("m", ["a"])
+    assert last_used(path, "a") == stored
+
+    cache.get_many("m", ["b", "c"])
+    assert last_used(path, "a") > stored
+
+    cache.get_many("m", ["b"])
+    before_close = last_used(path, "b")
+    cache.close()
+    assert last_used(path, "b") > before_close
+
+
+def test_eviction_uses_unwritten_hits(temp_storage):
+    cache = EmbeddingCache(temp_storage / "embeddings.sqlite3", max_entries=2)
+    cache.put_many("m", {"old": [1.0]})
+    cache.put_many("m", {"newer": [2.0]})
+    cache.get_many("m", ["old"])  # only recorded in memory
+    cache.put_many("m", {"newest": [3.0]})
+
+    assert set(cache.get_many("m", ["old", "newer", "newest"])) == {"old", "newest"}
@@ -0,0 +1,96 @@
+import numpy as np
+from langchain.schema import Document
+
+from ai_document_assistant.data_processing.ivf_index import (
+    IVFIndex,
+    assign_to_centroids,
+    train_centroids,
+)
+from ai_document_assistant.data_processing.vector_backends import NumpyBackend
+
+
+def clustered(rows, dim=16, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = np.eye(dim, dtype=np.float32)[:clusters]
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centres[labels] + 0.05 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True), labels
+
+
+def test_training_recovers_separated_clusters():
+    vectors, labels = clustered(2000)
+    centroids = train_centroids(vectors, nlist=16)
+
+    assignments = assign_to_centroids(vectors, centroids, block_rows=300)
+
+    assert centroids.shape == (16, 16)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+    # Each trained cluster holds vectors of one true cluster
+    for cluster in np.unique(assignments):
+        counts = np.bincount(labels[assignments == cluster], minlength=8)
+        assert counts.max() >= 0.95 * counts.sum()
+
+
+def test_candidates_come_from_the_probed_clusters():
+    vectors, _ = clustered(500)
+    centroids = train_centroids(vectors, nlist=8)
+    index = IVFIndex(centroids, assign_to_centroids(vectors, centroids), trained_rows=500)
+
+    (candidates,) = index.candidates(vectors[:1], nprobe=1)
+    assert 0 in candidates
+    assert set(index.assignments[candidates]) == {index.assignments[0]}
+    assert sum(len(rows) for rows in index.lists()) == 500
+
+    new_vectors, _ = clustered(10, seed=1)
+    index.extend(index.assign(new_vectors))
+    assert len(index) == 510
+    assert sum(len(rows) for rows in index.lists()) == 510
+    (candidates,) = index.candidates(new_vectors[:1], nprobe=1)
+    assert 500 in candidates
+    assert index.imbalance() >= 1.0
+
+
+def test_backend_ivf_search_matches_exact_search(temp_storage):
+    vectors, _ = clustered(3000)
+    backend = NumpyBackend(temp_storage, ann=True, ann_min_rows=10**9, nlist=16, nprobe=4)
+    documents = [Document(page_content=str(i)) for i in range(len(vectors))]
+    backend.add(documents, vectors, ids=[str(i) for i in range(len(vectors))])
+    backend.rebuild_index()
+    assert backend._ivf is not None
+
+    queries = vectors[:50] + 0.01
+    approximate = backend.search(queries, k=5)
+    exact = backend.search(queries, k=5, exact=True)
+    hits = sum(
+        len({d.page_content for d, _ in a} & {d.page_content for d, _ in e})
+        for a, e in zip(approximate, exact)
+    )
+    assert hits / (5 * len(queries)) >= 0.9
+
+    # Rows added after training join their nearest cluster; deleted rows drop out
+    backend.add([Document(page_content="new")], vectors[:1], ids=["new"])
+    backend.delete(["0"])
+    top = [doc.page_content for doc, _ in backend.search(vectors[:1], k=2)[0]]
+    assert "new" in top and "0" not in top
+    backend.persist()
+    backend.close()
+
+    reopened = NumpyBackend(temp_storage, ann=True, ann_min_rows=10**9, nprobe=4)
+    assert reopened._ivf is not None and len(reopened._ivf) == len(vectors) + 1
+    assert reopened.search(vectors[:1], k=1)[0][0][0].page_content == "new"
+    reopened.close()
+
+
+def test_index_is_built_in_the_background_once_large_enough(temp_storage):
+    vectors, _ = clustered(600)
+    backend = NumpyBackend(temp_storage, ann=True, ann_min_rows=500, nlist=8)
+    backend.add([Document(page_content="a")] * 400, vectors[:400], ids=[str(i) for i in range(400)])
+    backend.wait_for_index()
+    assert backend._ivf is None
+
+    backend.add(
+        [Document(page_content="b")] * 200, vectors[400:], ids=[str(i) for i in range(400, 600)]
+    )
+    backend.wait_for_index(timeout=30)
+    assert backend._ivf is not None and backend._ivf.nlist == 8
+    backend.close()
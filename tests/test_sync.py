@@ -0,0 +1,113 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from ai_document_assistant.data_processing.chunking import Chunker
+from ai_document_assistant.data_processing.document_processor import DocumentProcessor
+from ai_document_assistant.data_processing.sync import DocumentSync, IngestManifest
+
+
+class RecordingStore:
+    """Vector store stand-in that keeps chunks by ID."""
+
+    def __init__(self):
+        self.chunks = {}
+        self.deleted = []
+        self.flushes = 0
+
+    def add_documents(self, documents, ids=None):
+        self.chunks.update(zip(ids, documents))
+
+    def delete_documents(self, ids):
+        self.deleted.extend(ids)
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+
+    def flush(self):
+        self.flushes += 1
+
+
+@pytest.fixture
+def sync_setup(temp_storage):
+    docs = temp_storage / "docs"
+    docs.mkdir()
+    store = RecordingStore()
+    processor = DocumentProcessor(Chunker(chunk_size=40, chunk_overlap=0))
+    sync = DocumentSync(processor, store, manifest_path=temp_storage / "manifest.json")
+    return docs, store, sync
+
+
+def test_new_files_are_added_and_recorded(sync_setup, temp_storage):
+    docs, store, sync = sync_setup
+    (docs / "a.txt").write_text("alpha " * 20)
+    (docs / "b.txt").write_text("beta gamma")
+
+    report = sync.sync_directory(docs, max_workers=1)
+
+    assert sorted(path.name for path in report.added) == ["a.txt", "b.txt"]
+    manifest = json.loads((temp_storage / "manifest.json").read_text())
+    ids = [chunk_id for entry in manifest.values() for chunk_id in entry["chunk_ids"]]
+    assert sorted(ids) == sorted(store.chunks)
+    assert len(manifest[str((docs / "a.txt").resolve())]["chunk_ids"]) > 1
+    assert all(doc.metadata["chunk_id"] == chunk_id for chunk_id, doc in store.chunks.items())
+    assert store.flushes >= 1
+
+
+def test_unchanged_files_are_skipped(sync_setup):
+    docs, store, sync = sync_setup
+    path = docs / "a.txt"
+    path.write_text("alpha beta")
+    sync.sync_directory(docs, max_workers=1)
+    ids = dict(store.chunks)
+
+    assert sync.sync_directory(docs, max_workers=1).unchanged == [path.resolve()]
+
+    # Only the timestamp moved: the content hash shows nothing changed
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    report = sync.sync_directory(docs, max_workers=1)
+    assert report.unchanged == [path.resolve()] and not report.modified
+    assert store.chunks == ids and store.deleted == []
+
+
+def test_modified_files_replace_their_chunks(sync_setup):
+    docs, store, sync = sync_setup
+    path = docs / "a.txt"
+    path.write_text("first version")
+    sync.sync_directory(docs, max_workers=1)
+    old_ids = set(store.chunks)
+
+    path.write_text("second version, which is longer")
+    report = sync.sync_directory(docs, max_workers=1)
+
+    assert report.modified == [path.resolve()]
+    assert set(store.deleted) == old_ids
+    assert not old_ids & set(store.chunks)
+    assert [doc.page_content for doc in store.chunks.values()] == [
+        "second version, which is longer"
+    ]
+
+
+def test_deleted_files_are_purged(sync_setup, temp_storage):
+    docs, store, sync = sync_setup
+    (docs / "a.txt").write_text("keep me")
+    (docs / "b.txt").write_text("remove me")
+    sync.sync_directory(docs, max_workers=1)
+
+    (docs / "b.txt").unlink()
+    report = sync.sync_directory(docs, max_workers=1)
+
+    assert report.removed == [(docs / "b.txt").resolve()]
+    assert [doc.page_content for doc in store.chunks.values()] == ["keep me"]
+    manifest = IngestManifest(temp_storage / "manifest.json")
+    assert list(manifest.entries) == [str((docs / "a.txt").resolve())]
+
+
+def test_chunk_ids_depend_on_path_and_content():
+    ids = DocumentSync.chunk_ids(Path("/a.txt"), "0" * 64, 2)
+    assert ids == DocumentSync.chunk_ids(Path("/a.txt"), "0" * 64, 2)
+    assert len(set(ids)) == 2
+    assert ids[0] != DocumentSync.chunk_ids(Path("/b.txt"), "0" * 64, 1)[0]
+    assert ids[0] != DocumentSync.chunk_ids(Path("/a.txt"), "1" * 64, 1)[0]
@@ -0,0 +1,124 @@
+import json
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+from ai_document_assistant.data_processing.vector_backends import NumpyBackend
+
+
+def unit(i, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i % dim] = 1.0
+    vector[(i + 1) % dim] = 0.1
+    return vector.tolist()
+
+
+def docs(n, source="a.txt"):
+    return [
+        Document(page_content=f"text {i} é", metadata={"source": source, "i": i}) for i in range(n)
+    ]
+
+
+def contents(results):
+    return [[doc.page_content for doc, _ in hits] for hits in results]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_search_returns_nearest_rows(temp_storage, dtype):
+    backend = NumpyBackend(temp_storage, dtype=dtype)
+    backend.add(docs(5), [unit(i) for i in range(5)], ids=[f"d{i}" for i in range(5)])
+
+    results = backend.search([unit(2), unit(4)], k=2)
+
+    assert [hits[0][0].page_content for hits in results] == ["text 2 é", "text 4 é"]
+    assert all(len(hits) == 2 and hits[0][1] > hits[1][1] for hits in results)
+    assert results[0][0][1] == pytest.approx(1.0, abs=0.02)
+    assert results[0][0][0].metadata == {"source": "a.txt", "i": 2}
+    backend.close()
+
+
+def test_replace_delete_and_filter(temp_storage):
+    backend = NumpyBackend(temp_storage)
+    backend.add(docs(3), [unit(i) for i in range(3)], ids=["a", "b", "c"])
+    backend.add(docs(2, source="b.txt"), [unit(5), unit(6)], ids=["d", "e"])
+
+    backend.add(
+        [Document(page_content="new b", metadata={"source": "b.txt"})], [unit(1)], ids=["b"]
+    )
+    backend.delete(["c", "missing"])
+
+    assert len(backend) == 4
+    assert contents(backend.search([unit(1)], k=1)) == [["new b"]]
+    assert contents(backend.search([unit(2)], k=5, filter={"source": "a.txt"})) == [["text 0 é"]]
+    in_results = backend.search([unit(5)], k=5, filter={"source": {"$in": ["b.txt"]}})
+    assert sorted(contents(in_results)[0]) == ["new b", "text 0 é", "text 1 é"]
+    assert backend.search([unit(0)], k=3, filter={"source": "none"}) == [[]]
+    backend.close()
+
+
+def test_reopen_reads_only_committed_rows(temp_storage):
+    backend = NumpyBackend(temp_storage)
+    backend.add(docs(3), [unit(i) for i in range(3)], ids=["a", "b", "c"])
+    backend.delete(["b"])
+    backend.persist()
+    # Written but never persisted: cut off on the next open
+    backend.add([Document(page_content="torn")], [unit(7)], ids=["t"])
+    backend.close()
+
+    reopened = NumpyBackend(temp_storage)
+    assert len(reopened) == 2
+    assert contents(reopened.search([unit(7)], k=5))[0] == ["text 0 é", "text 2 é"]
+
+    # Records are appended after the committed ones
+    reopened.add([Document(page_content="after")], [unit(7)], ids=["n"])
+    assert contents(reopened.search([unit(7)], k=1)) == [["after"]]
+    reopened.close()
+
+
+def test_open_does_not_decode_records(temp_storage):
+    backend = NumpyBackend(temp_storage)
+    backend.add(docs(3), [unit(i) for i in range(3)], ids=["a", "b", "c"])
+    backend.persist()
+    backend.close()
+
+    meta = json.loads((temp_storage / "meta.json").read_text())
+    ids_log = (temp_storage / f"ids.{meta['generation']}.jsonl").read_text()
+    assert "text" not in ids_log
+
+    reopened = NumpyBackend(temp_storage)
+    assert not hasattr(reopened, "_texts")
+    assert reopened._records is None  # mapped on first search
+    assert contents(reopened.search([unit(0)], k=1)) == [["text 0 é"]]
+    reopened.close()
+
+
+def test_compact_drops_deleted_rows(temp_storage):
+    backend = NumpyBackend(temp_storage, compact_ratio=0.0)
+    n = 1200
+    backend.add(docs(n), [unit(i) for i in range(n)], ids=[str(i) for i in range(n)])
+    backend.delete([str(i) for i in range(n) if i % 8])
+    backend.persist()  # more than 1024 deleted rows: compacts
+
+    files = sorted(path.name for path in temp_storage.iterdir())
+    assert all(".1." in name for name in files if name != "meta.json")
+    assert len(backend._ids) == len(backend) == n // 8
+    hits = backend.search([unit(0)], k=3, filter={"i": 8})
+    assert contents(hits) == [["text 8 é"]]
+    backend.close()
+
+    reopened = NumpyBackend(temp_storage)
+    assert len(reopened) == n // 8
+    assert contents(reopened.search([unit(0)], k=1, filter={"i": 1096})) == [["text 1096 é"]]
+    reopened.close()
+
+
+def test_clear(temp_storage):
+    backend = NumpyBackend(temp_storage)
+    backend.add(docs(2), [unit(0), unit(1)], ids=["a", "b"])
+    backend.clear()
+    assert len(backend) == 0
+    assert backend.search([unit(0)], k=2) == [[]]
+    backend.add(docs(1), [unit(3, dim=4)], ids=["a"])
+    assert contents(backend.search([unit(3, dim=4)], k=2)) == [["text 0 é"]]
+    backend.close()
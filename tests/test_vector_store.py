@@ -0,0 +1,231 @@
+import gc
+import threading
+import weakref
+
+import pytest
+from langchain.embeddings.base import Embeddings
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from ai_document_assistant.data_processing.vector_store import VectorStore
+
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per keyword; queries embed differently from documents."""
+
+    keywords = ["warranty", "shipping", "battery", "refund"]
+
+    def __init__(self):
+        self.document_calls = []
+        self.query_calls = []
+
+    def _vector(self, text):
+        return [float(word in text.lower()) for word in self.keywords] + [0.01]
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        # Queries ask about the keyword they name last
+        last = max(self.keywords, key=lambda word: text.lower().rfind(word))
+        return [float(word == last) for word in self.keywords] + [0.01]
+
+
+class CountingFakeEmbedding(DeterministicFakeEmbedding):
+    """Symmetric fake model that counts the requests sent to it."""
+
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return super().embed_query(text)
+
+
+class BlockingEmbeddings(KeywordEmbeddings):
+    """Holds embed_documents until released, failing on request."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.failures = 0
+
+    def embed_documents(self, texts):
+        self.started.set()
+        self.release.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("embedding service unavailable")
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def embeddings():
+    return KeywordEmbeddings()
+
+
+def make_store(embeddings, **kwargs):
+    return VectorStore(embeddings=embeddings, cache_embeddings=False, backend="numpy", **kwargs)
+
+
+def test_batched_search_embeds_queries_as_queries(temp_storage, embeddings):
+    store = make_store(embeddings)
+    store.add_documents(
+        [Document(page_content=text) for text in ["Warranty terms", "Shipping costs"]],
+        ids=["w", "s"],
+    )
+    queries = ["warranty or shipping?", "shipping or warranty?"]
+
+    batched = store.similarity_search_many(queries, k=1)
+
+    assert [[doc.page_content for doc in hits] for hits in batched] == [
+        ["Shipping costs"],
+        ["Warranty terms"],
+    ]
+    assert batched == [store.similarity_search(query, k=1) for query in queries]
+    assert embeddings.document_calls == [["Warranty terms", "Shipping costs"]]
+    assert store.similarity_search_many([]) == []
+    store.close()
+
+
+@pytest.mark.parametrize("cache_embeddings", [False, True])
+def test_batched_search_makes_one_model_call(temp_storage, cache_embeddings):
+    fake = CountingFakeEmbedding(size=8, calls=[])
+    store = VectorStore(embeddings=fake, cache_embeddings=cache_embeddings, backend="numpy")
+    store.add_documents([Document(page_content=f"chunk {i}") for i in range(5)])
+    store.flush()
+    fake.calls.clear()
+
+    store.similarity_search_many(["one", "two", "three"], k=2)
+    assert fake.calls == [["one", "two", "three"]]
+
+    fake.calls.clear()
+    store.similarity_search_many(["two", "four", "five"], k=2)
+    assert fake.calls == ([["four", "five"]] if cache_embeddings else [["two", "four", "five"]])
+    store.close()
+
+
+def test_writes_are_buffered_until_flush_size(temp_storage, embeddings):
+    store = make_store(embeddings, flush_size=3, flush_interval=60)
+    store.add_documents([Document(page_content="Warranty terms")], ids=["w"])
+    store.add_documents([Document(page_content="Shipping costs")], ids=["s"])
+
+    assert store.pending_writes == 2 and embeddings.document_calls == []
+
+    store.add_documents([Document(page_content="Battery life")], ids=["b"])
+
+    assert store.pending_writes == 0
+    assert embeddings.document_calls == [["Warranty terms", "Shipping costs", "Battery life"]]
+    store.close()
+
+
+def test_searches_see_buffered_writes(temp_storage, embeddings):
+    store = make_store(embeddings, flush_interval=60)
+    store.add_documents([Document(page_content="Battery life")], ids=["b"])
+
+    assert [doc.page_content for doc in store.similarity_search("battery", k=1)] == ["Battery life"]
+    assert store.pending_writes == 0
+    store.close()
+
+
+def test_timer_flushes_buffered_writes(temp_storage, embeddings):
+    store = make_store(embeddings, flush_interval=0.05)
+    store.add_documents([Document(page_content="Refund policy")], ids=["r"])
+
+    timer = store._flush_timer
+    timer.join(5)
+
+    assert store.pending_writes == 0
+    assert embeddings.document_calls == [["Refund policy"]]
+    store.close()
+
+
+def test_writes_do_not_wait_for_embedding(temp_storage):
+    embeddings = BlockingEmbeddings()
+    store = make_store(embeddings, flush_interval=60)
+    store.add_documents([Document(page_content="Warranty terms")], ids=["w"])
+    embeddings.release.clear()
+    flusher = threading.Thread(target=store.flush)
+    flusher.start()
+    assert embeddings.started.wait(5)
+
+    writer = threading.Thread(
+        target=store.add_documents,
+        args=([Document(page_content="Shipping costs")],),
+        kwargs={"ids": ["s"]},
+    )
+    writer.start()
+    writer.join(1)
+    finished_while_embedding = not writer.is_alive()
+    embeddings.release.set()
+    flusher.join(5)
+    writer.join(5)
+
+    assert finished_while_embedding
+    assert store.pending_writes == 1
+    store.flush()
+    assert len(store.backend) == 2
+    store.close()
+
+
+def test_failed_flush_keeps_writes_behind_newer_ones(temp_storage):
+    embeddings = BlockingEmbeddings()
+    store = make_store(embeddings, flush_interval=60)
+    store.add_documents(
+        [Document(page_content="Warranty terms"), Document(page_content="Shipping costs")],
+        ids=["w", "s"],
+    )
+    embeddings.failures = 1
+
+    with pytest.raises(RuntimeError):
+        store.flush()
+
+    assert store.pending_writes == 2
+    store.add_documents([Document(page_content="Shipping is free")], ids=["s"])
+    store.delete_documents(["w"])
+    store.flush()
+
+    assert store.pending_writes == 0
+    assert [doc.page_content for doc in store.similarity_search("shipping", k=4)] == [
+        "Shipping is free"
+    ]
+    store.close()
+
+
+def test_listeners_hear_replaced_and_deleted_ids_only(temp_storage, embeddings):
+    store = make_store(embeddings, flush_interval=60)
+    changes = []
+    store.add_change_listener(changes.append)
+    store.add_documents([Document(page_content="Warranty terms")], ids=["w"])
+    store.flush()
+
+    assert changes == []
+
+    store.add_documents(
+        [Document(page_content="Warranty extended"), Document(page_content="Battery life")],
+        ids=["w", "b"],
+    )
+    assert changes == []
+    store.flush()
+    store.delete_documents(["b"])
+    store.clear()
+
+    assert changes == [["w"], ["b"], None]
+    store.close()
+
+
+def test_unclosed_stores_can_be_collected(temp_storage, embeddings):
+    store = make_store(embeddings)
+    ref = weakref.ref(store)
+
+    del store
+    gc.collect()
+
+    assert ref() is None